@@ -160,3 +160,27 @@ SERVER_EMAIL = 'noreply.financepin@gmail.com'
 # Portal Token Configuration
 # Note: Tokens are now set to not expire (valid indefinitely)
 PORTAL_TOKEN_EXPIRATION_DAYS = int(os.getenv('PORTAL_TOKEN_EXPIRATION_DAYS', '3650'))  # Default: 10 years (effectively no expiration)
+
+DOCUMENT_RENDER_WORKERS = int(os.getenv('DOCUMENT_RENDER_WORKERS', '2'))  # Process pool size for the render_documents worker
+DOCUMENT_RENDER_JOB_TIMEOUT_SECONDS = int(os.getenv('DOCUMENT_RENDER_JOB_TIMEOUT_SECONDS', '600'))  # Processing jobs older than this are picked up again
+
+# Reports page runs (compute_reports worker)
+REPORT_RUN_TTL_SECONDS = int(os.getenv('REPORT_RUN_TTL_SECONDS', '900'))  # How long a completed run is served to other viewers
+REPORT_RUN_TIMEOUT_SECONDS = int(os.getenv('REPORT_RUN_TIMEOUT_SECONDS', '600'))  # Processing runs older than this are marked failed
+REPORT_SECTION_WORKERS = int(os.getenv('REPORT_SECTION_WORKERS', '4'))  # Sections computed concurrently per run (one DB connection each)
+
+# Uploaded files (process_import_jobs worker)
+IMPORT_JOB_CHUNK_SIZE = int(os.getenv('IMPORT_JOB_CHUNK_SIZE', '500'))  # Products per chunk (one bulk_create of row outcomes each)
+IMPORT_JOB_TIMEOUT_SECONDS = int(os.getenv('IMPORT_JOB_TIMEOUT_SECONDS', '900'))  # Processing jobs older than this are picked up again
+PACKAGING_DRAFT_TTL_SECONDS = int(os.getenv('PACKAGING_DRAFT_TTL_SECONDS', '86400'))  # Unsaved define-rules drafts are deleted after this long
+
+# Foodics sales sync (sync_foodics worker)
+FOODICS_API_BASE_URL = os.getenv('FOODICS_API_BASE_URL', 'https://api.foodics.com/v5')
+FOODICS_API_TOKEN = os.getenv('FOODICS_API_TOKEN', '')
+FOODICS_SYNC_CONCURRENCY = int(os.getenv('FOODICS_SYNC_CONCURRENCY', '4'))  # Open connections / pages fetched at once
+FOODICS_SYNC_INITIAL_DAYS = int(os.getenv('FOODICS_SYNC_INITIAL_DAYS', '7'))  # Business days pulled on the first sync
+FOODICS_SYNC_TIMEOUT_SECONDS = int(os.getenv('FOODICS_SYNC_TIMEOUT_SECONDS', '30'))  # Per HTTP request
+
+# Par-level draft requests (generate_par_requests, nightly)
+PAR_LEVEL_LOOKBACK_DAYS = int(os.getenv('PAR_LEVEL_LOOKBACK_DAYS', '28'))  # Days of consumption averaged for the daily rate
+PAR_LEVEL_COVER_DAYS = int(os.getenv('PAR_LEVEL_COVER_DAYS', '7'))  # Days of consumption a branch should hold (par = daily rate x this)
@@ -31,23 +31,31 @@ urlpatterns = [
     path("punch-ids/<int:punch_id_id>/edit/", views.punch_id_edit, name="punch_id_edit"),
     path("punch-ids/<int:punch_id_id>/delete/", views.punch_id_delete, name="punch_id_delete"),
     path("inventory/", views.inventory, name="inventory"),
+    path("inventory/ledger/", views.stock_ledger, name="stock_ledger"),
+    path("api/stock/as-of/", views.stock_as_of, name="stock_as_of"),
     path("inventory/add/", views.add_item, name="add_item"),
     path("inventory/edit/<str:code>/", views.edit_item, name="edit_item"),
     path("inventory/delete/<str:code>/", views.delete_item, name="delete_item"),
     path("inventory/photo/<int:photo_id>/delete/", views.delete_item_photo, name="delete_item_photo"),
     path("invoice/<int:order_id>/", views.view_invoice, name="view_invoice"),
     path("invoice/<int:order_id>/sign/", views.submit_invoice_signature, name="submit_invoice_signature"),
+    path("invoice/<int:order_id>/signature.png", views.invoice_signature_image, name="invoice_signature_image"),
     path("invoice/token/<str:token>/", views.view_invoice_by_token, name="view_invoice_by_token"),
     path("invoice/token/<str:token>/sign/", lambda request, token: views.submit_invoice_signature(request, order_id=None, token=token), name="submit_invoice_signature_by_token"),
+    path("invoice/token/<str:token>/signature.png", lambda request, token: views.invoice_signature_image(request, token=token), name="invoice_signature_image_by_token"),
     path("requests/", views.requests, name="requests"),
     path("requests/create/", views.create_stock_request, name="create_stock_request"),
     path("requests/<int:request_id>/", views.view_request, name="view_request"),
+    path("requests/<int:request_id>/submit-draft/", views.submit_draft_request, name="submit_draft_request"),
+    path("requests/<int:request_id>/discard-draft/", views.discard_draft_request, name="discard_draft_request"),
     path("requests/<int:request_id>/approve-reject/", views.approve_reject_request, name="approve_reject_request"),
     path("requests/<int:request_id>/mark-in-process/", views.mark_request_in_process, name="mark_request_in_process"),
     path("requests/<int:request_id>/mark-out-for-delivery/", views.mark_request_out_for_delivery, name="mark_request_out_for_delivery"),
     path("requests/<int:request_id>/mark-delivered/", views.mark_request_delivered, name="mark_request_delivered"),
+    path("delivery-signatures/<int:signature_id>.png", views.delivery_signature_image, name="delivery_signature_image"),
     path("requests/new/", views.new_request, name="new_request"),
     path("purchase-orders/", views.purchase_orders, name="purchase_orders"),
+    path("purchase-orders/receive/", views.receive_purchase_orders, name="receive_purchase_orders"),
     path("purchase-orders/<int:order_id>/", views.view_purchase_order, name="view_purchase_order"),
     path("purchase-orders/<int:order_id>/mark-received/", views.mark_order_received, name="mark_order_received"),
     path("purchase-orders/<int:order_id>/send-receiving-note/", views.send_receiving_note, name="send_receiving_note"),
@@ -64,17 +72,24 @@ urlpatterns = [
     path("suppliers/delete/<str:code>/", views.delete_supplier, name="delete_supplier"),
     path("suppliers/update-category/", views.update_supplier_category, name="update_supplier_category"),
     path("reports/", views.reports, name="reports"),
+    path("reports/export/<str:section>/", views.report_export, name="report_export"),
+    path("api/reports/runs/<int:run_id>/", views.report_run_status, name="report_run_status"),
+    path("api/import-jobs/<int:job_id>/", views.import_job_status, name="import_job_status"),
     path("branch-assignments/", views.manage_branch_assignments, name="manage_branch_assignments"),
     path("settings/", views.procurement_settings, name="procurement_settings"),
     path("branches/", views.branches, name="branches"),
+    path("branches/brands/<int:brand_id>/", views.branch_brand_panel, name="branch_brand_panel"),
     path("branches/configure/", views.branches_configure, name="branches_configure"),
     path("branches/<int:branch_id>/packaging/", views.branch_packaging, name="branch_packaging"),
     path("branches/<int:branch_id>/packaging/upload/", views.branch_upload_packaging, name="branch_upload_packaging"),
     path("branches/<int:branch_id>/packaging/add-item/", views.branch_add_packaging_item, name="branch_add_packaging_item"),
     path("branches/<int:branch_id>/packaging/save/", views.branch_save_packaging_rules, name="branch_save_packaging_rules"),
+    path("branches/<int:branch_id>/packaging/rules/bulk/", views.branch_bulk_save_packaging_rules, name="branch_bulk_save_packaging_rules"),
     path("branches/<int:branch_id>/packaging/cancel-draft/", views.branch_cancel_packaging_draft, name="branch_cancel_packaging_draft"),
     path("branches/<int:branch_id>/packaging/process-csv/", views.branch_process_packaging_csv, name="branch_process_packaging_csv"),
+    path("branches/<int:branch_id>/inventory/as-of/", views.branch_inventory_as_of, name="branch_inventory_as_of"),
     path("api/add-price-discussion/", views.add_price_discussion, name="add_price_discussion"),
+    path("api/suppliers/<int:supplier_id>/items/", views.supplier_items_api, name="supplier_items_api"),
     path('admin/', admin.site.urls),
 ]
 
@@ -4,22 +4,24 @@ from .models import (
     Role, UserProfile, ValidPunchID, Brand, Branch, BranchUser,
     # Inventory
     BaseUnit, Item, ItemPhoto, ItemVariation, InventoryLocation, StockBalance, StockLedger,
+    StockCheckpoint, StockBalanceDrift,
     # Suppliers & Pricing
     Supplier, SupplierCategory, SupplierItem,
     # Requests
     Request, RequestItem, RequestStatusHistory,
     # Supplier Orders
-    SupplierOrder, SupplierOrderItem, PortalToken, SupplierInvoiceSignature,
+    SupplierOrder, SupplierOrderItem, SupplierOrderReceipt, PortalToken, SupplierInvoiceSignature, InvoiceSnapshot,
     # Item Requests
     ItemRequest, ItemRequestItem, SupplierStock,
     # Logistics & Delivery
-    Delivery, DeliveryDocument, DeliverySignature,
+    Delivery, DeliveryDocument, DeliverySignature, DocumentRenderJob,
     # Foodics Integration
-    IntegrationFoodics, FoodicsBranchMapping, ItemConsumptionDaily, SupplierSpendMonthly,
+    IntegrationFoodics, FoodicsBranchMapping, ItemConsumptionDaily, SupplierSpendMonthly, RollupWatermark,
+    RequestDaily, StockMovementDaily, ConsumptionDailyRollup, PoDaily, SupplierLeadTimeStats, ReportRun,
     # Branch inventory (Branches page source of truth)
-    BranchInventory,
+    BranchInventory, BranchInventoryMovement, BranchInventorySnapshot,
     # Excel Import
-    ImportJob, ImportJobRow,
+    ImportJob, ImportJobRow, BranchPackagingDraft,
     # System Settings
     SystemSettings,
 )
@@ -128,6 +130,23 @@ class StockLedgerAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
 
 
+@admin.register(StockCheckpoint)
+class StockCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['taken_at', 'location', 'item', 'variation', 'quantity']
+    list_filter = ['taken_at', 'location']
+    search_fields = ['item__item_code', 'item__name']
+    raw_id_fields = ['item', 'variation', 'location']
+
+
+@admin.register(StockBalanceDrift)
+class StockBalanceDriftAdmin(admin.ModelAdmin):
+    list_display = ['location', 'item', 'variation', 'balance_qty', 'ledger_qty', 'difference', 'detected_at']
+    list_filter = ['location']
+    search_fields = ['item__item_code', 'item__name']
+    raw_id_fields = ['item', 'variation', 'location']
+    readonly_fields = ['detected_at']
+
+
 # ============================================================================
 # C. Suppliers & Pricing
 # ============================================================================
@@ -205,6 +224,15 @@ class SupplierOrderAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(SupplierOrderReceipt)
+class SupplierOrderReceiptAdmin(admin.ModelAdmin):
+    list_display = ['supplier_order', 'order_item', 'supplier', 'qty_received', 'received_at', 'lead_time_days', 'expected_delivery_date', 'on_time']
+    list_filter = ['on_time', 'received_at', 'supplier']
+    search_fields = ['supplier_order__po_code', 'supplier__name', 'order_item__item__item_code']
+    raw_id_fields = ['order_item', 'supplier_order', 'supplier', 'received_by']
+    readonly_fields = ['created_at']
+
+
 @admin.register(PortalToken)
 class PortalTokenAdmin(admin.ModelAdmin):
     list_display = ['token', 'supplier', 'supplier_order', 'expires_at', 'used_at', 'created_at']
@@ -223,6 +251,14 @@ class SupplierInvoiceSignatureAdmin(admin.ModelAdmin):
     readonly_fields = ['signed_at']
 
 
+@admin.register(InvoiceSnapshot)
+class InvoiceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['supplier_order', 'portal_token', 'order_version', 'etag', 'created_at']
+    search_fields = ['supplier_order__po_code', 'etag']
+    raw_id_fields = ['supplier_order', 'portal_token']
+    readonly_fields = ['order_version', 'etag', 'created_at']
+
+
 class ItemRequestItemInline(admin.TabularInline):
     model = ItemRequestItem
     extra = 1
@@ -270,6 +306,15 @@ class DeliveryDocumentAdmin(admin.ModelAdmin):
     readonly_fields = ['generated_at']
 
 
+@admin.register(DocumentRenderJob)
+class DocumentRenderJobAdmin(admin.ModelAdmin):
+    list_display = ['document_type', 'supplier_order', 'request', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['document_type', 'status', 'created_at']
+    search_fields = ['supplier_order__po_code', 'request__request_code']
+    raw_id_fields = ['supplier_order', 'request']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
 @admin.register(DeliverySignature)
 class DeliverySignatureAdmin(admin.ModelAdmin):
     list_display = ['request', 'branch_manager', 'signed_name', 'signed_at']
@@ -299,11 +344,11 @@ class FoodicsBranchMappingAdmin(admin.ModelAdmin):
 
 @admin.register(ItemConsumptionDaily)
 class ItemConsumptionDailyAdmin(admin.ModelAdmin):
-    list_display = ['date', 'branch', 'item', 'variation', 'qty_consumed', 'source', 'created_at']
+    list_display = ['date', 'branch', 'item', 'variation', 'qty_consumed', 'source', 'created_at', 'updated_at']
     list_filter = ['date', 'source', 'created_at']
     search_fields = ['branch__name', 'item__item_code', 'item__name']
     raw_id_fields = ['branch', 'item', 'variation']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'updated_at']
 
 
 @admin.register(BranchInventory)
@@ -314,15 +359,113 @@ class BranchInventoryAdmin(admin.ModelAdmin):
     raw_id_fields = ['branch', 'brand', 'item', 'variation']
     readonly_fields = ['updated_at']
 
+    def save_model(self, request, obj, form, change):
+        from django.db import transaction
+        from .branch_ledger import movement, record_movements
+
+        with transaction.atomic():
+            before = BranchInventory.objects.select_for_update().filter(pk=obj.pk).values_list('quantity', flat=True).first() if change else 0
+            super().save_model(request, obj, form, change)
+            record_movements([movement(
+                obj.branch_id, obj.item_id, obj.variation_id, obj.quantity - (before or 0),
+                BranchInventoryMovement.ReasonType.ADJUSTMENT, user=request.user,
+            )])
+
+    def delete_queryset(self, request, queryset):
+        from django.db import transaction
+        from .branch_ledger import movement, record_movements
+
+        with transaction.atomic():
+            record_movements([
+                movement(inv.branch_id, inv.item_id, inv.variation_id, -inv.quantity, BranchInventoryMovement.ReasonType.ADJUSTMENT, user=request.user)
+                for inv in queryset.select_for_update()
+            ])
+            super().delete_queryset(request, queryset)
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, BranchInventory.objects.filter(pk=obj.pk))
+
+
+@admin.register(BranchInventoryMovement)
+class BranchInventoryMovementAdmin(admin.ModelAdmin):
+    list_display = ['branch', 'item', 'variation', 'qty_change', 'reason', 'reference_type', 'reference_id', 'created_at']
+    list_filter = ['reason', 'reference_type', 'created_at']
+    search_fields = ['branch__name', 'item__item_code', 'item__name', 'reference_id']
+    raw_id_fields = ['branch', 'item', 'variation', 'created_by']
+    readonly_fields = ['created_at']
+
+
+@admin.register(BranchInventorySnapshot)
+class BranchInventorySnapshotAdmin(admin.ModelAdmin):
+    list_display = ['taken_at', 'branch', 'item', 'variation', 'quantity']
+    list_filter = ['taken_at']
+    search_fields = ['branch__name', 'item__item_code', 'item__name']
+    raw_id_fields = ['branch', 'item', 'variation']
+
 
 @admin.register(SupplierSpendMonthly)
 class SupplierSpendMonthlyAdmin(admin.ModelAdmin):
-    list_display = ['month', 'supplier', 'total_spent']
-    list_filter = ['month', 'supplier']
+    list_display = ['month', 'supplier', 'category', 'total_spent', 'order_count', 'updated_at']
+    list_filter = ['month', 'category', 'supplier']
+    search_fields = ['supplier__name']
+    raw_id_fields = ['supplier']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(RequestDaily)
+class RequestDailyAdmin(admin.ModelAdmin):
+    list_display = ['date', 'branch', 'status', 'request_count', 'fulfilled_count', 'fulfillment_days_total']
+    list_filter = ['date', 'status', 'branch']
+    search_fields = ['branch__name']
+    raw_id_fields = ['branch']
+
+
+@admin.register(StockMovementDaily)
+class StockMovementDailyAdmin(admin.ModelAdmin):
+    list_display = ['date', 'reason', 'movement_count', 'qty_in', 'qty_out']
+    list_filter = ['date', 'reason']
+
+
+@admin.register(ConsumptionDailyRollup)
+class ConsumptionDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['date', 'branch', 'item', 'qty_consumed', 'record_count']
+    list_filter = ['date', 'branch']
+    search_fields = ['branch__name', 'item__item_code', 'item__name']
+    raw_id_fields = ['branch', 'item']
+
+
+@admin.register(PoDaily)
+class PoDailyAdmin(admin.ModelAdmin):
+    list_display = ['date', 'supplier', 'status', 'order_count', 'total_value']
+    list_filter = ['date', 'status', 'supplier']
     search_fields = ['supplier__name']
     raw_id_fields = ['supplier']
 
 
+@admin.register(SupplierLeadTimeStats)
+class SupplierLeadTimeStatsAdmin(admin.ModelAdmin):
+    list_display = ['supplier', 'receipt_count', 'lead_time_p50', 'lead_time_p90', 'on_time_rate', 'last_received_at', 'updated_at']
+    search_fields = ['supplier__name']
+    raw_id_fields = ['supplier']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['name', 'high_water', 'last_run_at']
+    readonly_fields = ['high_water', 'last_run_at']
+
+
+@admin.register(ReportRun)
+class ReportRunAdmin(admin.ModelAdmin):
+    list_display = ['cache_key', 'status', 'sections_done', 'sections_total', 'requested_by', 'created_at', 'finished_at', 'expires_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['cache_key', 'role']
+    raw_id_fields = ['requested_by']
+    readonly_fields = ['section_timings', 'created_at', 'started_at', 'finished_at']
+    exclude = ['result']
+
+
 # ============================================================================
 # H. Excel Import
 # ============================================================================
@@ -335,12 +478,23 @@ class ImportJobRowInline(admin.TabularInline):
 
 @admin.register(ImportJob)
 class ImportJobAdmin(admin.ModelAdmin):
-    list_display = ['id', 'uploaded_by', 'status', 'created_at']
-    list_filter = ['status', 'created_at']
-    search_fields = ['uploaded_by__username']
-    raw_id_fields = ['uploaded_by']
+    list_display = ['id', 'kind', 'branch', 'original_filename', 'uploaded_by', 'status', 'rows_processed', 'rows_total', 'rows_failed', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['uploaded_by__username', 'original_filename', 'content_hash', 'branch__name']
+    raw_id_fields = ['uploaded_by', 'branch']
     inlines = [ImportJobRowInline]
+    readonly_fields = ['content_hash', 'rows_total', 'rows_processed', 'rows_failed', 'created_at', 'started_at', 'finished_at']
+    exclude = ['result']
+
+
+@admin.register(BranchPackagingDraft)
+class BranchPackagingDraftAdmin(admin.ModelAdmin):
+    list_display = ['id', 'branch', 'created_by', 'created_at', 'expires_at']
+    list_filter = ['created_at']
+    search_fields = ['branch__name', 'created_by__username']
+    raw_id_fields = ['branch', 'created_by']
     readonly_fields = ['created_at']
+    exclude = ['products']
 
 
 # ============================================================================
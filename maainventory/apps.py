@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class MaainventoryConfig(AppConfig):
     name = 'maainventory'
+
+    def ready(self):
+        from . import branches_page, packaging, supplier_catalog
+        supplier_catalog.connect_signals()
+        branches_page.connect_signals()
+        packaging.connect_signals()
@@ -0,0 +1,143 @@
+"""
+Branch inventory movement ledger and nightly snapshots.
+
+Every change to BranchInventory is written to BranchInventoryMovement in the same
+transaction, with one bulk_create per change (a delivery, a sales file, a Foodics sync
+of one branch). snapshot_branch_inventory then stores the balance of every branch and
+item as of local midnight, computed from the previous snapshot plus that day's
+movements. The opening snapshot, taken from BranchInventory itself, is written by
+migration 0046 when the ledger starts (or by the first take_snapshot otherwise).
+
+A balance as of any moment is the latest snapshot at or before it plus the movements
+since: one snapshot read and a scan of at most a day's movements for the branch,
+instead of replaying its whole history. There is no history before the opening
+snapshot: stock held then never went through the ledger.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from .models import BranchInventory, BranchInventoryMovement, BranchInventorySnapshot
+from .rollups import local_midnight
+
+
+ZERO = Decimal('0')
+
+
+# ============================================================================
+# Writing movements
+# ============================================================================
+
+def movement(branch_id, item_id, variation_id, qty_change, reason, reference_type=None, reference_id=None, user=None):
+    """An unsaved BranchInventoryMovement; collect them and pass to record_movements()."""
+    return BranchInventoryMovement(
+        branch_id=branch_id,
+        item_id=item_id,
+        variation_id=variation_id,
+        qty_change=qty_change,
+        reason=reason,
+        reference_type=reference_type,
+        reference_id=str(reference_id) if reference_id is not None else None,
+        created_by=user if user and user.is_authenticated else None,
+    )
+
+
+def record_movements(movements):
+    """Write the non-zero movements with one bulk_create. Call in the transaction that changes the inventory."""
+    movements = [entry for entry in movements if entry.qty_change]
+    if movements:
+        BranchInventoryMovement.objects.bulk_create(movements, batch_size=1000)
+    return len(movements)
+
+
+# ============================================================================
+# Snapshots
+# ============================================================================
+
+def _add(balances, rows):
+    for branch_id, item_id, variation_id, qty in rows:
+        key = (branch_id, item_id, variation_id)
+        balances[key] = balances.get(key, ZERO) + (qty or ZERO)
+
+
+def _movement_totals(movements):
+    return (
+        movements.values('branch_id', 'item_id', 'variation_id')
+        .annotate(total=Sum('qty_change'))
+        .values_list('branch_id', 'item_id', 'variation_id', 'total')
+    )
+
+
+def take_snapshot(day=None):
+    """
+    Store every branch's balances as of the start of `day` (default: today, local time).
+    Returns the number of rows written, or None when that snapshot already exists.
+    Run it shortly after midnight so the day's last movements have committed. Raises
+    ValueError for a day before the opening snapshot (no ledger to go back with).
+    """
+    taken_at = local_midnight(day or timezone.localdate())
+    with transaction.atomic():
+        if BranchInventorySnapshot.objects.filter(taken_at=taken_at).exists():
+            return None
+        starts_at = history_starts_at()
+        if starts_at is not None and taken_at < starts_at:
+            raise ValueError(f'No branch inventory history before {timezone.localtime(starts_at):%Y-%m-%d %H:%M}')
+
+        balances = {}
+        previous_at = BranchInventorySnapshot.objects.filter(taken_at__lt=taken_at).aggregate(Max('taken_at'))['taken_at__max']
+        if previous_at is None:
+            # Opening snapshot: current inventory, less what has moved since taken_at
+            _add(balances, BranchInventory.objects.values_list('branch_id', 'item_id', 'variation_id', 'quantity'))
+            _add(balances, (
+                (branch_id, item_id, variation_id, -total)
+                for branch_id, item_id, variation_id, total in _movement_totals(
+                    BranchInventoryMovement.objects.filter(created_at__gte=taken_at)
+                )
+            ))
+        else:
+            _add(balances, BranchInventorySnapshot.objects.filter(taken_at=previous_at).values_list(
+                'branch_id', 'item_id', 'variation_id', 'quantity',
+            ))
+            _add(balances, _movement_totals(
+                BranchInventoryMovement.objects.filter(created_at__gte=previous_at, created_at__lt=taken_at)
+            ))
+
+        rows = [
+            BranchInventorySnapshot(taken_at=taken_at, branch_id=branch_id, item_id=item_id, variation_id=variation_id, quantity=qty)
+            for (branch_id, item_id, variation_id), qty in balances.items() if qty
+        ]
+        BranchInventorySnapshot.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+# ============================================================================
+# Balances as of a moment
+# ============================================================================
+
+def history_starts_at():
+    """taken_at of the opening snapshot, or None before any snapshot has been taken."""
+    return BranchInventorySnapshot.objects.aggregate(Min('taken_at'))['taken_at__min']
+
+
+def balances_as_of(branch_id, at):
+    """
+    {(item_id, variation_id): quantity} at `branch_id` as of the aware datetime `at` (zero
+    balances omitted), or None when `at` is before the opening snapshot.
+    """
+    snapshot_at = (
+        BranchInventorySnapshot.objects.filter(taken_at__lte=at)
+        .aggregate(Max('taken_at'))['taken_at__max']
+    )
+    if snapshot_at is None:
+        return None
+    balances = {}
+    _add(balances, BranchInventorySnapshot.objects.filter(taken_at=snapshot_at, branch_id=branch_id).values_list(
+        'branch_id', 'item_id', 'variation_id', 'quantity',
+    ))
+    _add(balances, _movement_totals(
+        BranchInventoryMovement.objects.filter(branch_id=branch_id, created_at__gte=snapshot_at, created_at__lt=at)
+    ))
+    return {(item_id, variation_id): qty for (_, item_id, variation_id), qty in balances.items() if qty}
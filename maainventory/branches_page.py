@@ -0,0 +1,127 @@
+"""
+Branch inventory tables for the Branches page.
+
+The page itself only renders the brand tabs; each tab fetches its branches' tables on
+first open (branch_brand_panel). A brand's tables are built from one joined
+BranchInventory query (plus one for packaging rules and one for photos) grouped by
+branch in a single pass, then cached per brand and dropped whenever branch inventory,
+a branch, its packaging rules, or an item / item photo shown on it changes.
+"""
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+
+from .models import Branch, BranchInventory, BranchPackagingRule, Item, ItemPhoto
+
+
+BRAND_BRANCHES_CACHE_TIMEOUT = 60 * 30
+
+
+def brand_branches_cache_key(brand_id):
+    return f'brand_branches:{brand_id}'
+
+
+def _first_photos(item_ids):
+    """{item_id: url of its first photo} (ItemPhoto ordering) for items that have one."""
+    photos = {}
+    for photo in ItemPhoto.objects.filter(item_id__in=item_ids).order_by('item_id', 'order', 'uploaded_at').only('item_id', 'photo'):
+        if photo.item_id not in photos and photo.photo:
+            photos[photo.item_id] = photo.photo.url
+    return photos
+
+
+def _build_brand_branches(brand_id):
+    branches = list(
+        Branch.objects.filter(brand_id=brand_id, is_active=True).order_by('name').values('id', 'name', 'address', 'brand__name')
+    )
+    branch_ids = [branch['id'] for branch in branches]
+    branch_ids_with_rules = set(
+        BranchPackagingRule.objects.filter(branch_id__in=branch_ids).values_list('branch_id', flat=True).distinct()
+    )
+
+    # Quantity per (branch, item), summed across variations, with the item columns joined in
+    rows = list(
+        BranchInventory.objects.filter(branch_id__in=branch_ids, item__is_active=True)
+        .values(
+            'branch_id', 'item_id', 'item__item_code', 'item__name', 'item__base_unit',
+            'item__min_order_qty', 'item__photo_url',
+        )
+        .annotate(total=Sum('quantity'))
+        .order_by('branch_id', 'item__item_code')
+    )
+    photos = _first_photos({row['item_id'] for row in rows if not row['item__photo_url']})
+
+    items_by_branch = {}
+    for row in rows:
+        items_by_branch.setdefault(row['branch_id'], []).append({
+            'item_code': row['item__item_code'],
+            'name': row['item__name'],
+            'base_unit': row['item__base_unit'],
+            'min_order_qty': row['item__min_order_qty'],
+            'qty_available': float(row['total'] or 0),
+            'image': row['item__photo_url'] or photos.get(row['item_id']),
+        })
+
+    return [
+        {
+            'id': branch['id'],
+            'name': branch['name'],
+            'brand': branch['brand__name'],
+            'address': branch['address'] or '',
+            'items': items_by_branch.get(branch['id'], []),
+            'has_packaging_rules': branch['id'] in branch_ids_with_rules,
+        }
+        for branch in branches
+    ]
+
+
+def get_brand_branches(brand_id):
+    """Active branches of one brand with their inventory items, as plain dicts (cached)."""
+    key = brand_branches_cache_key(brand_id)
+    branches = cache.get(key)
+    if branches is None:
+        branches = _build_brand_branches(brand_id)
+        cache.set(key, branches, BRAND_BRANCHES_CACHE_TIMEOUT)
+    return branches
+
+
+def invalidate_brand_branches(brand_ids):
+    cache.delete_many([brand_branches_cache_key(brand_id) for brand_id in set(brand_ids)])
+
+
+def invalidate_branches(branch_ids):
+    """Drop the cached tables of the brands these branches belong to."""
+    invalidate_brand_branches(Branch.objects.filter(id__in=branch_ids).values_list('brand_id', flat=True))
+
+
+def _branch_inventory_changed(sender, instance, **kwargs):
+    invalidate_brand_branches([instance.brand_id])
+
+
+def _branch_changed(sender, instance, **kwargs):
+    invalidate_brand_branches([instance.brand_id])
+
+
+def _packaging_rule_changed(sender, instance, **kwargs):
+    invalidate_branches([instance.branch_id])
+
+
+def _item_changed(sender, instance, **kwargs):
+    item_id = instance.item_id if isinstance(instance, ItemPhoto) else instance.pk
+    invalidate_brand_branches(
+        BranchInventory.objects.filter(item_id=item_id).values_list('branch__brand_id', flat=True).distinct()
+    )
+
+
+def connect_signals():
+    """Called from MaainventoryConfig.ready()."""
+    post_save.connect(_branch_inventory_changed, sender=BranchInventory, dispatch_uid='branches_page_inventory_saved')
+    post_delete.connect(_branch_inventory_changed, sender=BranchInventory, dispatch_uid='branches_page_inventory_deleted')
+    post_save.connect(_branch_changed, sender=Branch, dispatch_uid='branches_page_branch_saved')
+    post_delete.connect(_branch_changed, sender=Branch, dispatch_uid='branches_page_branch_deleted')
+    post_save.connect(_packaging_rule_changed, sender=BranchPackagingRule, dispatch_uid='branches_page_rule_saved')
+    post_delete.connect(_packaging_rule_changed, sender=BranchPackagingRule, dispatch_uid='branches_page_rule_deleted')
+    post_save.connect(_item_changed, sender=Item, dispatch_uid='branches_page_item_saved')
+    post_save.connect(_item_changed, sender=ItemPhoto, dispatch_uid='branches_page_photo_saved')
+    post_delete.connect(_item_changed, sender=ItemPhoto, dispatch_uid='branches_page_photo_deleted')
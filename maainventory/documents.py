@@ -0,0 +1,292 @@
+"""
+Background rendering of PO invoices and delivery bills.
+
+Views only enqueue a DocumentRenderJob (one insert). The render_documents management
+command claims pending jobs, builds plain payloads from the database and hands the
+CPU-heavy PDF drawing (pdfs.py) to a process pool, then stores the files in media and
+links them from SupplierInvoiceSignature.invoice_file_url / DeliveryDocument.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from . import pdfs
+from .models import (
+    DeliveryDocument, DocumentRenderJob, Request, RequestItem, SupplierInvoiceSignature,
+    SupplierOrder, SupplierOrderItem,
+)
+
+
+RENDERERS = {
+    DocumentRenderJob.DocumentType.PO_INVOICE: pdfs.render_invoice_pdf,
+    DocumentRenderJob.DocumentType.BILL: pdfs.render_bill_pdf,
+}
+
+# Orders/requests that have a document worth regenerating
+INVOICE_STATUSES_EXCLUDED = (SupplierOrder.StatusType.DRAFT,)
+BILL_STATUSES = (
+    Request.StatusType.OUT_FOR_DELIVERY,
+    Request.StatusType.DELIVERED,
+    Request.StatusType.COMPLETED,
+)
+
+
+def _money(value):
+    return f'{value:,.2f}'
+
+
+def _qty(value):
+    return f'{value:,.2f}'.rstrip('0').rstrip('.')
+
+
+def _local(dt, fmt='%Y-%m-%d %H:%M'):
+    return timezone.localtime(dt).strftime(fmt) if dt else ''
+
+
+# ---------------------------------------------------------------------------
+# Enqueueing (called from views; cheap)
+# ---------------------------------------------------------------------------
+
+def _enqueue(document_type, supplier_order=None, request=None):
+    """Queue a render unless the same document is already waiting."""
+    pending = DocumentRenderJob.objects.filter(
+        document_type=document_type,
+        supplier_order=supplier_order,
+        request=request,
+        status=DocumentRenderJob.StatusType.PENDING,
+    )
+    if pending.exists():
+        return None
+    return DocumentRenderJob.objects.create(
+        document_type=document_type, supplier_order=supplier_order, request=request,
+    )
+
+
+def enqueue_invoice_pdf(supplier_order):
+    """Queue the PO invoice PDF (on send and again after signing)."""
+    return _enqueue(DocumentRenderJob.DocumentType.PO_INVOICE, supplier_order=supplier_order)
+
+
+def enqueue_delivery_bill(req):
+    """Queue the delivery bill PDF for a request going out for delivery."""
+    return _enqueue(DocumentRenderJob.DocumentType.BILL, request=req)
+
+
+def enqueue_range(date_from, date_to, document_types=None):
+    """
+    Queue regeneration for every invoice / bill created between date_from and date_to
+    (inclusive, local dates). Returns the number of jobs created.
+    """
+    document_types = document_types or list(RENDERERS)
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz)
+
+    jobs = []
+    if DocumentRenderJob.DocumentType.PO_INVOICE in document_types:
+        order_ids = SupplierOrder.objects.filter(
+            created_at__gte=start, created_at__lt=end,
+        ).exclude(status__in=INVOICE_STATUSES_EXCLUDED).values_list('id', flat=True)
+        jobs += [
+            DocumentRenderJob(document_type=DocumentRenderJob.DocumentType.PO_INVOICE, supplier_order_id=order_id)
+            for order_id in order_ids
+        ]
+    if DocumentRenderJob.DocumentType.BILL in document_types:
+        request_ids = Request.objects.filter(
+            created_at__gte=start, created_at__lt=end, status__in=BILL_STATUSES,
+        ).values_list('id', flat=True)
+        jobs += [
+            DocumentRenderJob(document_type=DocumentRenderJob.DocumentType.BILL, request_id=request_id)
+            for request_id in request_ids
+        ]
+    DocumentRenderJob.objects.bulk_create(jobs, batch_size=500)
+    return len(jobs)
+
+
+# ---------------------------------------------------------------------------
+# Payloads (parent process; all DB access happens here)
+# ---------------------------------------------------------------------------
+
+def _invoice_payloads(order_ids):
+    orders = SupplierOrder.objects.filter(id__in=order_ids).select_related('supplier').prefetch_related(
+        Prefetch('items', queryset=SupplierOrderItem.objects.select_related('item').order_by('id')),
+        Prefetch('invoice_signatures', queryset=SupplierInvoiceSignature.objects.defer(None).order_by('-signed_at')),
+    )
+    payloads = {}
+    for order in orders:
+        lines = []
+        subtotal = 0
+        for order_item in order.items.all():
+            line_total = order_item.qty_ordered * order_item.price_per_unit
+            subtotal += line_total
+            lines.append({
+                'code': order_item.item.item_code,
+                'name': order_item.item.name,
+                'unit': order_item.item.base_unit,
+                'qty': _qty(order_item.qty_ordered),
+                'price': _money(order_item.price_per_unit),
+                'total': _money(line_total),
+            })
+        signatures = list(order.invoice_signatures.all())
+        signature = signatures[0] if signatures else None
+        payloads[order.id] = {
+            'po_code': order.po_code,
+            'supplier_name': order.supplier.name,
+            'supplier_email': order.supplier.email,
+            'order_date': _local(order.created_at),
+            'requested_delivery_date': order.requested_delivery_date.isoformat() if order.requested_delivery_date else '',
+            'status': order.get_status_display(),
+            'lines': lines,
+            'total': _money(subtotal),
+            'signature': {
+                'name': signature.supplier_name_signed,
+                'signed_at': _local(signature.signed_at),
+                'image': bytes(signature.signature_image) if signature.signature_image else None,
+            } if signature else None,
+        }
+    return payloads
+
+
+def _bill_payloads(request_ids):
+    requests = Request.objects.filter(id__in=request_ids).select_related('branch__brand').prefetch_related(
+        Prefetch('items', queryset=RequestItem.objects.select_related('item').order_by('id')),
+    )
+    payloads = {}
+    for req in requests:
+        lines = []
+        total = 0
+        for request_item in req.items.all():
+            qty = request_item.qty_fulfilled or request_item.qty_approved or request_item.qty_requested
+            price = request_item.unit_price_snapshot or request_item.item.price_per_unit or 0
+            line_total = qty * price
+            total += line_total
+            lines.append({
+                'code': request_item.item.item_code,
+                'name': request_item.item.name,
+                'unit': request_item.item.base_unit,
+                'qty': _qty(qty),
+                'price': _money(price),
+                'total': _money(line_total),
+            })
+        payloads[req.id] = {
+            'request_code': req.request_code,
+            'branch_name': str(req.branch),
+            'order_date': _local(req.date_of_order),
+            'status': req.get_status_display(),
+            'lines': lines,
+            'total': _money(total),
+        }
+    return payloads
+
+
+# ---------------------------------------------------------------------------
+# Storing results
+# ---------------------------------------------------------------------------
+
+def _store_pdf(path, content):
+    """Write the PDF to media, replacing the previous version. Returns its URL."""
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    saved_path = default_storage.save(path, ContentFile(content))
+    return default_storage.url(saved_path)
+
+
+def _store_job_result(job, target, content):
+    if job.document_type == DocumentRenderJob.DocumentType.PO_INVOICE:
+        file_url = _store_pdf(f'documents/invoices/{target["po_code"]}.pdf', content)
+        SupplierInvoiceSignature.objects.filter(supplier_order_id=job.supplier_order_id).update(invoice_file_url=file_url)
+    else:
+        file_url = _store_pdf(f'documents/bills/{target["request_code"]}.pdf', content)
+        DeliveryDocument.objects.update_or_create(
+            request_id=job.request_id,
+            document_type=DeliveryDocument.DocumentType.BILL,
+            defaults={'document_url': file_url, 'generated_by_system': True},
+        )
+    return file_url
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def claim_pending_jobs(limit):
+    """
+    Mark up to `limit` jobs as Processing: pending ones, and ones whose worker has not
+    finished within DOCUMENT_RENDER_JOB_TIMEOUT_SECONDS (skips rows locked by another worker).
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.DOCUMENT_RENDER_JOB_TIMEOUT_SECONDS)
+    with transaction.atomic():
+        jobs = list(
+            DocumentRenderJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=DocumentRenderJob.StatusType.PENDING)
+                | Q(status=DocumentRenderJob.StatusType.PROCESSING, started_at__lt=stale)
+            )
+            .order_by('created_at')[:limit]
+        )
+        for job in jobs:
+            job.status = DocumentRenderJob.StatusType.PROCESSING
+            job.started_at = now
+            job.attempts += 1
+        DocumentRenderJob.objects.bulk_update(jobs, ['status', 'started_at', 'attempts'])
+    return jobs
+
+
+def render_pool(max_workers=None):
+    """Process pool for PDF rendering (settings.DOCUMENT_RENDER_WORKERS by default)."""
+    return ProcessPoolExecutor(max_workers=max_workers or settings.DOCUMENT_RENDER_WORKERS)
+
+
+def process_pending_jobs(pool, limit=50):
+    """
+    Render one batch of pending jobs on `pool` (see render_pool).
+    Returns (completed, failed) counts; (0, 0) means the queue was empty.
+    """
+    jobs = claim_pending_jobs(limit)
+    if not jobs:
+        return 0, 0
+
+    invoice_payloads = _invoice_payloads([j.supplier_order_id for j in jobs if j.supplier_order_id])
+    bill_payloads = _bill_payloads([j.request_id for j in jobs if j.request_id])
+
+    finished = []
+    completed = failed = 0
+    futures = {}
+    for job in jobs:
+        if job.document_type == DocumentRenderJob.DocumentType.PO_INVOICE:
+            payload = invoice_payloads.get(job.supplier_order_id)
+        else:
+            payload = bill_payloads.get(job.request_id)
+        if payload is None:
+            job.status = DocumentRenderJob.StatusType.FAILED
+            job.error_log = 'Source record no longer exists'
+            job.finished_at = timezone.now()
+            finished.append(job)
+            failed += 1
+            continue
+        futures[pool.submit(RENDERERS[job.document_type], payload)] = (job, payload)
+
+    for future in as_completed(futures):
+        job, payload = futures[future]
+        try:
+            job.file_url = _store_job_result(job, payload, future.result())
+            job.status = DocumentRenderJob.StatusType.COMPLETED
+            job.error_log = None
+            completed += 1
+        except Exception as e:
+            job.status = DocumentRenderJob.StatusType.FAILED
+            job.error_log = str(e)
+            failed += 1
+        job.finished_at = timezone.now()
+        finished.append(job)
+
+    DocumentRenderJob.objects.bulk_update(finished, ['status', 'file_url', 'error_log', 'finished_at'])
+    return completed, failed
@@ -0,0 +1,304 @@
+"""
+Incremental Foodics sales sync.
+
+Each run pulls the closed orders of every mapped branch for the business days from the
+day before IntegrationFoodics.last_sync_at up to today (FOODICS_SYNC_INITIAL_DAYS on
+the first run), so orders closed or changed late are picked up again. Pages are
+fetched concurrently with asyncio through a pool of at most FOODICS_SYNC_CONCURRENCY
+keep-alive connections; the HTTP calls themselves (http.client) run in worker threads.
+
+Sold products are translated to packaging consumption with the branch's compiled rule
+index (packaging.py) and each (branch, business day) is written as an absolute FOODICS
+ItemConsumptionDaily total: new rows bulk-created, changed ones bulk-updated, and the
+difference from what was stored before taken off branch inventory (or, for a decrease,
+put back up to what the row had actually deducted). Re-running a window therefore never
+double counts.
+
+Point FOODICS_API_BASE_URL at `manage.py foodics_mock_server` to try it locally.
+"""
+
+import asyncio
+import http.client
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .branches_page import invalidate_branches
+from .models import BranchInventoryMovement, FoodicsBranchMapping, IntegrationFoodics, ItemConsumptionDaily
+from .packaging import add_to_plan, deduct_branch_inventory, get_rule_index, match_product
+
+
+CLOSED_ORDER_STATUS = 4  # Foodics order status: 4 = Closed
+MAX_ATTEMPTS = 3
+CENT = Decimal('0.01')
+
+
+class FoodicsError(Exception):
+    pass
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+class FoodicsClient:
+    """GET JSON from the Foodics API over at most `size` keep-alive connections."""
+
+    def __init__(self, base_url, token, size, timeout):
+        parts = urlsplit(base_url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host = parts.netloc
+        self._prefix = parts.path.rstrip('/')
+        self._timeout = timeout
+        self._headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+        # Connections are opened lazily: None marks a free slot without one yet
+        self._idle = asyncio.Queue()
+        for _ in range(max(1, size)):
+            self._idle.put_nowait(None)
+        self._open = []
+
+    def _request(self, conn, url):
+        conn.request('GET', url, headers=self._headers)
+        response = conn.getresponse()
+        return response.status, response.read(), response.getheader('Retry-After')
+
+    async def get(self, path, params):
+        url = f'{self._prefix}{path}?{urlencode(params)}'
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            conn = await self._idle.get()
+            try:
+                if conn is None:
+                    conn = self._connection_class(self._host, timeout=self._timeout)
+                    self._open.append(conn)
+                status, body, retry_after = await asyncio.to_thread(self._request, conn, url)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()  # Reconnects on next use
+                if attempt == MAX_ATTEMPTS:
+                    raise FoodicsError(f'GET {path} failed: {e}')
+                await asyncio.sleep(2 ** attempt)
+                continue
+            finally:
+                self._idle.put_nowait(conn)
+
+            if status == 200:
+                return json.loads(body)
+            if (status == 429 or status >= 500) and attempt < MAX_ATTEMPTS:
+                await asyncio.sleep(float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt)
+                continue
+            raise FoodicsError(f'GET {path} returned HTTP {status}')
+
+    def close(self):
+        for conn in self._open:
+            conn.close()
+
+
+async def fetch_orders(client, foodics_branch_id, business_date):
+    """All orders of one branch and business day: page 1 first, then the rest concurrently."""
+    params = {
+        'filter[branch_id]': foodics_branch_id,
+        'filter[business_date]': business_date.isoformat(),
+        'include': 'products.product',
+    }
+    first = await client.get('/orders', {**params, 'page': 1})
+    last_page = (first.get('meta') or {}).get('last_page') or 1
+    rest = await asyncio.gather(*(client.get('/orders', {**params, 'page': page}) for page in range(2, last_page + 1)))
+    orders = list(first.get('data') or [])
+    for page in rest:
+        orders.extend(page.get('data') or [])
+    return orders
+
+
+def sold_products(orders):
+    """{product name: qty sold} over the closed orders (each order counted once across pages)."""
+    sold = {}
+    seen = set()
+    for order in orders:
+        if order.get('id') in seen or order.get('status') != CLOSED_ORDER_STATUS:
+            continue
+        seen.add(order.get('id'))
+        for line in order.get('products') or []:
+            name = ((line.get('product') or {}).get('name') or '').strip()
+            try:
+                qty = Decimal(str(line.get('quantity') or 0))
+            except InvalidOperation:
+                continue
+            if name and qty:
+                sold[name] = sold.get(name, Decimal('0')) + qty
+    return sold
+
+
+async def _fetch_sales(keys):
+    """{(branch_id, business_date): ({product name: qty}, order count)} for (branch_id, foodics id, date) keys."""
+    client = FoodicsClient(
+        settings.FOODICS_API_BASE_URL, settings.FOODICS_API_TOKEN,
+        settings.FOODICS_SYNC_CONCURRENCY, settings.FOODICS_SYNC_TIMEOUT_SECONDS,
+    )
+    try:
+        results = await asyncio.gather(*(fetch_orders(client, external_id, day) for _, external_id, day in keys))
+    finally:
+        client.close()
+    return {
+        (branch_id, day): (sold_products(orders), len(orders))
+        for (branch_id, _, day), orders in zip(keys, results)
+    }
+
+
+# ============================================================================
+# Sync
+# ============================================================================
+
+def business_dates(last_sync_at, now):
+    """Local business days to (re)sync, oldest first."""
+    today = timezone.localdate(now)
+    if last_sync_at:
+        start = timezone.localdate(last_sync_at) - timedelta(days=1)
+    else:
+        start = today - timedelta(days=settings.FOODICS_SYNC_INITIAL_DAYS - 1)
+    return [start + timedelta(days=offset) for offset in range((today - start).days + 1)]
+
+
+def write_consumption(consumption):
+    """
+    Store {(branch_id, date): {item_id: qty}} as the FOODICS consumption of those branch
+    days and adjust branch inventory by the change. Returns (created, updated) row counts.
+
+    An increase is taken off inventory (as far as stock allows); a decrease puts back
+    only what had been deducted beyond the new total, per the row's qty_deducted, so
+    consumption that found no stock is never returned to it.
+    """
+    source = ItemConsumptionDaily.SourceType.FOODICS
+    now = timezone.now()
+    branch_ids = {branch_id for branch_id, _ in consumption}
+    dates = {day for _, day in consumption}
+
+    with transaction.atomic():
+        existing = {
+            (row.branch_id, row.date, row.item_id): row
+            for row in ItemConsumptionDaily.objects.select_for_update().filter(
+                source=source, variation__isnull=True, branch_id__in=branch_ids, date__in=dates,
+            ).only('id', 'branch_id', 'date', 'item_id', 'qty_consumed', 'qty_deducted')
+            if (row.branch_id, row.date) in consumption
+        }
+        to_create, to_update = [], []
+        changes = []  # (row, quantity to take off inventory; negative to put back)
+
+        for (branch_id, day), plan in consumption.items():
+            for item_id, qty in plan.items():
+                qty = qty.quantize(CENT)
+                row = existing.pop((branch_id, day, item_id), None)
+                if row is None:
+                    if qty > 0:
+                        row = ItemConsumptionDaily(
+                            date=day, branch_id=branch_id, item_id=item_id, variation=None, source=source,
+                            qty_consumed=qty, qty_deducted=Decimal('0'),
+                        )
+                        to_create.append(row)
+                        changes.append((row, qty))
+                    continue
+                if row.qty_consumed != qty:
+                    if qty > row.qty_consumed:
+                        changes.append((row, qty - row.qty_consumed))
+                    else:
+                        changes.append((row, -max(row.qty_deducted - qty, Decimal('0'))))
+                    row.qty_consumed = qty
+                    row.updated_at = now
+                    to_update.append(row)
+
+        # Consumption no longer backed by sales (order voided, rule changed): zero it
+        for row in existing.values():
+            if row.qty_consumed:
+                changes.append((row, -row.qty_deducted))
+                row.qty_consumed = Decimal('0')
+                row.updated_at = now
+                to_update.append(row)
+
+        plans = {}
+        for row, take in changes:
+            branch_plan = plans.setdefault(row.branch_id, {})
+            branch_plan[row.item_id] = branch_plan.get(row.item_id, Decimal('0')) + take
+        # What each item can still take for its increases: the stock actually taken plus what its decreases put back
+        budgets = {}
+        for branch_id, branch_plan in plans.items():
+            applied = deduct_branch_inventory(
+                branch_id, branch_plan,
+                BranchInventoryMovement.ReasonType.FOODICS,
+                BranchInventoryMovement.ReferenceType.FOODICS_SYNC, now.isoformat(timespec='seconds'), now=now,
+            )
+            for item_id, qty_change in applied.items():
+                budgets[(branch_id, item_id)] = -qty_change
+        for row, take in changes:
+            if take < 0 and (row.branch_id, row.item_id) in budgets:
+                budgets[(row.branch_id, row.item_id)] -= take
+                row.qty_deducted += take
+        for row, take in changes:
+            key = (row.branch_id, row.item_id)
+            if take > 0 and key in budgets:
+                taken = min(take, budgets[key])
+                budgets[key] -= taken
+                row.qty_deducted += taken
+
+        ItemConsumptionDaily.objects.bulk_create(to_create, batch_size=1000)
+        ItemConsumptionDaily.objects.bulk_update(to_update, ['qty_consumed', 'qty_deducted', 'updated_at'], batch_size=1000)
+
+    return len(to_create), len(to_update)
+
+
+def sync_foodics():
+    """
+    One incremental sync of every mapped, active branch. Returns a summary dict, or None
+    when the integration is not enabled. last_sync_at only advances when the whole run
+    succeeds.
+
+    The run holds a row lock on the IntegrationFoodics row from start to finish, so a
+    second sync started meanwhile waits and then works from the first one's last_sync_at
+    instead of writing the same branch days at the same time.
+    """
+    began = time.monotonic()
+    with transaction.atomic():
+        integration = IntegrationFoodics.objects.select_for_update().filter(is_enabled=True).first()
+        if integration is None:
+            return None
+
+        started_at = timezone.now()
+        mappings = list(
+            FoodicsBranchMapping.objects.filter(branch__is_active=True)
+            .values_list('branch_id', 'foodics_branch_external_id')
+        )
+        dates = business_dates(integration.last_sync_at, started_at)
+        keys = [(branch_id, external_id, day) for branch_id, external_id in mappings for day in dates]
+        sales = asyncio.run(_fetch_sales(keys)) if keys else {}
+
+        consumption = {}
+        unmatched = set()
+        indexes = {}
+        for (branch_id, day), (sold, _) in sales.items():
+            index = indexes.setdefault(branch_id, get_rule_index(branch_id))
+            plan = consumption.setdefault((branch_id, day), {})
+            for name, qty in sold.items():
+                product_qty, components = match_product(index, {'product_name': name, 'qty': qty})
+                if components is None:
+                    unmatched.add(name)
+                elif product_qty > 0:
+                    add_to_plan(plan, product_qty, components)
+
+        created, updated = write_consumption(consumption) if consumption else (0, 0)
+        IntegrationFoodics.objects.filter(pk=integration.pk).update(last_sync_at=started_at)
+
+    if created or updated:
+        invalidate_branches([branch_id for branch_id, _ in mappings])
+
+    return {
+        'branches': len(mappings),
+        'days': len(dates),
+        'orders': sum(order_count for _, order_count in sales.values()),
+        'rows_created': created,
+        'rows_updated': updated,
+        'unmatched_products': sorted(unmatched),
+        'seconds': round(time.monotonic() - began, 2),
+    }
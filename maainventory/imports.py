@@ -0,0 +1,242 @@
+"""
+Background processing of uploaded files.
+
+Uploads are stored on an ImportJob (with the SHA-256 of their content) and the request
+returns at once; the page then polls import_job_status. The process_import_jobs worker
+claims pending jobs, streams the file (sales_files), and walks the aggregated products
+in chunks of IMPORT_JOB_CHUNK_SIZE, writing each chunk's row outcomes with one
+bulk_create and saving progress after it.
+
+A sales file is deducted from branch inventory in the same transaction that marks its
+job Completed, and a branch can hold only one non-failed job per content hash, so
+uploading the same sales file again is a no-op rather than a second deduction.
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .branches_page import invalidate_brand_branches
+from .models import BranchInventoryMovement, ImportJob, ImportJobRow, Item, ItemConsumptionDaily
+from .packaging import add_to_plan, apply_deduction, create_draft, find_shortages, get_rule_index, match_product
+from .sales_files import aggregate_products, check_file_type, iter_sales_rows
+
+
+ACTIVE_STATUSES = (ImportJob.StatusType.PENDING, ImportJob.StatusType.PROCESSING, ImportJob.StatusType.COMPLETED)
+
+# ImportJobRow.status values
+ROW_PARSED = 'Parsed'
+ROW_MATCHED = 'Matched'
+ROW_UNMATCHED = 'Unmatched'
+ROW_SKIPPED = 'Skipped'
+
+
+class JobReclaimed(Exception):
+    """The job timed out and was claimed by another worker; leave it to that one."""
+
+
+def file_content_hash(uploaded_file):
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+# ============================================================================
+# Starting a job (views)
+# ============================================================================
+
+def start_import(kind, uploaded_file, user, branch=None):
+    """
+    Store `uploaded_file` and queue a job for it. Returns (job, created); for sales
+    files already uploaded for this branch, the existing job and False. Raises
+    ValueError for unsupported file types.
+    """
+    check_file_type(uploaded_file.name)
+    content_hash = file_content_hash(uploaded_file)
+    if kind == ImportJob.KindType.SALES_DEDUCTION:
+        existing = ImportJob.objects.filter(
+            kind=kind, branch=branch, content_hash=content_hash, status__in=ACTIVE_STATUSES,
+        ).first()
+        if existing:
+            return existing, False
+
+    job = ImportJob(
+        kind=kind,
+        branch=branch,
+        uploaded_by=user if user and user.is_authenticated else None,
+        original_filename=(uploaded_file.name or '')[:255],
+        content_hash=content_hash,
+        file=uploaded_file,
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # The same file was queued for this branch between our check and insert
+        job.file.delete(save=False)
+        return ImportJob.objects.get(kind=kind, branch=branch, content_hash=content_hash, status__in=ACTIVE_STATUSES), False
+    return job, True
+
+
+def job_progress(job):
+    """Polling payload for import_job_status."""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'rows_total': job.rows_total,
+        'rows_processed': job.rows_processed,
+        'rows_failed': job.rows_failed,
+        'error': job.error_log if job.status == ImportJob.StatusType.FAILED else None,
+    }
+
+
+# ============================================================================
+# Worker
+# ============================================================================
+
+def claim_pending_jobs(limit):
+    """
+    Mark up to `limit` jobs as Processing: pending ones, and ones whose worker has not
+    finished within IMPORT_JOB_TIMEOUT_SECONDS (skips rows locked by another worker).
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT_SECONDS)
+    with transaction.atomic():
+        jobs = list(
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=ImportJob.StatusType.PENDING) | Q(status=ImportJob.StatusType.PROCESSING, started_at__lt=stale))
+            .order_by('created_at')[:limit]
+        )
+        for job in jobs:
+            job.status = ImportJob.StatusType.PROCESSING
+            job.started_at = now
+        ImportJob.objects.bulk_update(jobs, ['status', 'started_at'])
+    return jobs
+
+
+def _read_products(job):
+    with job.file.open('rb') as f:
+        return aggregate_products(iter_sales_rows(f))
+
+
+def _chunks(products):
+    size = max(1, settings.IMPORT_JOB_CHUNK_SIZE)
+    for start in range(0, len(products), size):
+        yield start, products[start:start + size]
+
+
+def _write_chunk(job, rows):
+    ImportJobRow.objects.bulk_create(rows)
+    job.rows_processed += len(rows)
+    job.rows_failed += sum(1 for row in rows if row.status == ROW_UNMATCHED)
+    ImportJob.objects.filter(pk=job.pk).update(rows_processed=job.rows_processed, rows_failed=job.rows_failed)
+
+
+def _start_rows(job, products):
+    job.rows.all().delete()  # Left over from a timed-out attempt
+    job.rows_total = len(products)
+    job.rows_processed = job.rows_failed = 0
+    ImportJob.objects.filter(pk=job.pk).update(rows_total=job.rows_total, rows_processed=0, rows_failed=0)
+
+
+def _process_packaging_products(job, products):
+    for start, chunk in _chunks(products):
+        _write_chunk(job, [
+            ImportJobRow(import_job=job, row_number=start + offset + 1, raw_data_json=product, status=ROW_PARSED)
+            for offset, product in enumerate(chunk)
+        ])
+    draft = create_draft(job.branch_id, job.uploaded_by, products) if products and job.uploaded_by_id else None
+    return {'product_count': len(products), 'draft_id': draft.id if draft else None}
+
+
+def _process_sales_deduction(job, products):
+    index = get_rule_index(job.branch_id)
+    plan = {}
+    unmatched = []
+    for start, chunk in _chunks(products):
+        rows = []
+        for offset, product in enumerate(chunk):
+            product_qty, components = match_product(index, product)
+            row = ImportJobRow(import_job=job, row_number=start + offset + 1, raw_data_json=product, status=ROW_MATCHED)
+            if product_qty <= 0:
+                row.status = ROW_SKIPPED
+            elif components is None:
+                row.status = ROW_UNMATCHED
+                row.error_message = 'No packaging rule for this product'
+                unmatched.append(product['product_name'])
+            else:
+                add_to_plan(plan, product_qty, components)
+            rows.append(row)
+        _write_chunk(job, rows)
+
+    if not plan:
+        raise ValueError('No packaging items to deduct from the uploaded file.')
+
+    with transaction.atomic():
+        # Another worker may have reclaimed this job while we were running
+        current = ImportJob.objects.select_for_update().filter(pk=job.pk).values_list('status', 'started_at').first()
+        if current != (ImportJob.StatusType.PROCESSING, job.started_at):
+            raise JobReclaimed()
+
+        shortages = find_shortages(job.branch, plan)
+        if shortages:
+            items = Item.objects.in_bulk([item_id for item_id, _, _ in shortages])
+            details = [f'{items[item_id].name} (need {needed}, available at branch {available})' for item_id, needed, available in shortages]
+            raise ValueError(f'Insufficient quantity at your branch: {"; ".join(details[:3])}{"..." if len(details) > 3 else ""}')
+
+        apply_deduction(
+            job.branch, plan, timezone.now().date(), ItemConsumptionDaily.SourceType.PACKAGING_CSV,
+            BranchInventoryMovement.ReasonType.SALES_FILE, BranchInventoryMovement.ReferenceType.IMPORT, job.id, job.uploaded_by,
+        )
+        job.result = {'items_deducted': len(plan), 'unmatched': unmatched}
+        _finish(job, ImportJob.StatusType.COMPLETED)
+    # Bulk updates skip post_save, so drop the Branches page cache here
+    invalidate_brand_branches([job.branch.brand_id])
+    return job.result
+
+
+PROCESSORS = {
+    ImportJob.KindType.PACKAGING_PRODUCTS: _process_packaging_products,
+    ImportJob.KindType.SALES_DEDUCTION: _process_sales_deduction,
+}
+
+
+def _finish(job, status, error=None):
+    job.status = status
+    job.error_log = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_log', 'result', 'finished_at'])
+
+
+def process_job(job):
+    products = _read_products(job)
+    _start_rows(job, products)
+    job.result = PROCESSORS[job.kind](job, products)
+    if job.status != ImportJob.StatusType.COMPLETED:
+        _finish(job, ImportJob.StatusType.COMPLETED)
+
+
+def process_pending_jobs(limit=5):
+    """
+    Process one batch of pending jobs. Returns (completed, failed) counts;
+    (0, 0) means the queue was empty.
+    """
+    completed = failed = 0
+    for job in claim_pending_jobs(limit):
+        try:
+            process_job(job)
+            completed += 1
+        except JobReclaimed:
+            continue
+        except Exception as e:
+            job.result = None
+            _finish(job, ImportJob.StatusType.FAILED, str(e))
+            failed += 1
+    return completed, failed
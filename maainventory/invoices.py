@@ -0,0 +1,96 @@
+"""
+Public supplier invoice pages served from immutable snapshots.
+
+Once a PO has been sent, the rendered invoice HTML is stored per (order, token link)
+together with the order version it was rendered from. Repeat views are answered with
+a single indexed lookup (or a 304 when the supplier's browser already has it).
+"""
+
+import hashlib
+
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+
+from .models import InvoiceSnapshot, SupplierOrder, SupplierOrderItem
+
+
+# Suppliers always revalidate, so a newly signed/cancelled invoice is never shown stale
+INVOICE_CACHE_CONTROL = 'private, no-cache'
+
+
+def get_current_snapshot(order_id=None, token=None):
+    """
+    Current snapshot for an order (by ID, legacy links) or a portal token, or None.
+    Validity is checked in the same query by comparing against the order's updated_at.
+    """
+    snapshots = InvoiceSnapshot.objects.only('etag', 'html').filter(
+        order_version=F('supplier_order__updated_at')
+    )
+    if token is not None:
+        snapshots = snapshots.filter(portal_token__token=token)
+    else:
+        snapshots = snapshots.filter(supplier_order_id=order_id, portal_token__isnull=True)
+    return snapshots.first()
+
+
+def render_invoice_html(order, portal_token=None):
+    """Render invoice.html for an order (items and signature loaded up front)."""
+    signature = order.invoice_signatures.annotate(
+        has_image=ExpressionWrapper(Q(signature_image__isnull=False), output_field=BooleanField())
+    ).first()
+    is_signed = signature is not None
+
+    # Prepare items with line totals
+    items_with_totals = []
+    subtotal = 0
+    for item in SupplierOrderItem.objects.filter(supplier_order=order).select_related('item').order_by('id'):
+        line_total = item.qty_ordered * item.price_per_unit
+        subtotal += line_total
+        items_with_totals.append({
+            'item': item,
+            'line_total': line_total
+        })
+
+    total = subtotal  # Add tax/shipping if needed later
+
+    context = {
+        'order': order,
+        'items_with_totals': items_with_totals,
+        'subtotal': subtotal,
+        'total': total,
+        'signature': signature,
+        'is_signed': is_signed,
+        'portal_token': portal_token,  # Pass token to template for signature linking
+    }
+    return render_to_string('maainventory/invoice.html', context)
+
+
+def build_snapshot(order, portal_token=None):
+    """
+    Render the invoice and, if the PO has been sent, store it as the current snapshot.
+    Returns (etag, html). Draft orders are rendered but never stored.
+    """
+    html = render_invoice_html(order, portal_token)
+    etag = hashlib.sha256(html.encode('utf-8')).hexdigest()
+    if order.status != SupplierOrder.StatusType.DRAFT:
+        InvoiceSnapshot.objects.update_or_create(
+            supplier_order=order,
+            portal_token=portal_token,
+            defaults={'order_version': order.updated_at, 'etag': etag, 'html': html},
+        )
+    return etag, html
+
+
+def invoice_response(request, etag, html):
+    """HTML response with strong ETag and Cache-Control; 304 when the client copy matches."""
+    quoted_etag = f'"{etag}"'
+    not_modified = get_conditional_response(request, etag=quoted_etag)
+    if not_modified is not None:
+        response = not_modified
+    else:
+        response = HttpResponse(html)
+    response['ETag'] = quoted_etag
+    response['Cache-Control'] = INVOICE_CACHE_CONTROL
+    return response
@@ -0,0 +1,90 @@
+"""
+Stock ledger browser.
+
+Ledger pages are keyset-paginated on (created_at, id), newest first: a page is "the
+next N rows after this (created_at, id)", answered from the (created_at, id) index
+(or (item, created_at, id) when filtering by item). Unlike OFFSET paging, the cost of
+a page does not grow with how deep into the history it is.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+from .models import Item, StockLedger
+
+
+LEDGER_PAGE_SIZE = 50
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(entry):
+    """Opaque page cursor for a ledger row: '<created_at in µs since epoch>-<id>'."""
+    return f'{(entry.created_at - _EPOCH) // timedelta(microseconds=1)}-{entry.id}'
+
+
+def decode_cursor(value):
+    """(created_at, id) from encode_cursor(), or None when the value is missing or malformed."""
+    try:
+        micros, entry_id = value.split('-', 1)
+        return _EPOCH + timedelta(microseconds=int(micros)), int(entry_id)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def filter_ledger(item=None, location_id=None, reason=None, reference_type=None, reference_id=None):
+    """
+    Ledger rows matching the browser filters. `item` is an item code (exact) or part of
+    an item name; `location_id` matches either side of a movement.
+    """
+    entries = StockLedger.objects.all()
+    if item:
+        entries = entries.filter(
+            item_id__in=Item.objects.filter(Q(item_code__iexact=item) | Q(name__icontains=item)).values('id')
+        )
+    if location_id:
+        entries = entries.filter(Q(from_location_id=location_id) | Q(to_location_id=location_id))
+    if reason:
+        entries = entries.filter(reason=reason)
+    if reference_type:
+        entries = entries.filter(reference_type=reference_type)
+    if reference_id:
+        entries = entries.filter(reference_id=reference_id)
+    return entries
+
+
+def _beyond(entries, op, cursor):
+    """Rows with (created_at, id) `op` ('<' or '>') the cursor; served by the (created_at, id) index."""
+    created_at, entry_id = cursor
+    lookup = 'lt' if op == '<' else 'gt'
+    return entries.filter(
+        Q(**{f'created_at__{lookup}': created_at}) | Q(created_at=created_at, **{f'id__{lookup}': entry_id})
+    )
+
+
+def ledger_page(entries, after=None, before=None, page_size=LEDGER_PAGE_SIZE):
+    """
+    One page of `entries`, newest first.
+    after:  decoded cursor; return the rows older than it (next page)
+    before: decoded cursor; return the rows newer than it (previous page)
+    Returns (rows, older_cursor, newer_cursor); a cursor is None when there is no such page.
+    """
+    entries = entries.select_related('item', 'variation', 'from_location', 'to_location', 'created_by')
+
+    if before:
+        rows = list(_beyond(entries, '>', before).order_by('created_at', 'id')[:page_size + 1])
+        has_newer = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_older = True
+    else:
+        if after:
+            entries = _beyond(entries, '<', after)
+        rows = list(entries.order_by('-created_at', '-id')[:page_size + 1])
+        has_older = len(rows) > page_size
+        rows = rows[:page_size]
+        has_newer = after is not None
+
+    older_cursor = encode_cursor(rows[-1]) if rows and has_older else None
+    newer_cursor = encode_cursor(rows[0]) if rows and has_newer else None
+    return rows, older_cursor, newer_cursor
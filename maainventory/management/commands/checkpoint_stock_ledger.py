@@ -0,0 +1,32 @@
+"""
+Store the nightly stock ledger checkpoint (schedule shortly after midnight, e.g. 00:15).
+
+    python manage.py checkpoint_stock_ledger                     # balances as of today 00:00
+    python manage.py checkpoint_stock_ledger --date 2026-01-31   # balances as of that day 00:00
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maainventory.stock_checkpoints import take_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint warehouse stock balances from the stock ledger as of local midnight'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Checkpoint the start of this day (YYYY-MM-DD) instead of today')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        rows = take_checkpoint(day)
+        if rows is None:
+            self.stdout.write('Checkpoint already taken')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Checkpoint written: {rows} balance row(s)'))
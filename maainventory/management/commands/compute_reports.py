@@ -0,0 +1,48 @@
+"""
+Compute queued reports page runs.
+
+    python manage.py compute_reports            # drain the queue once
+    python manage.py compute_reports --loop     # long-running worker
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from maainventory.report_runs import process_pending_runs, prune_finished_runs
+
+
+PRUNE_EVERY_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = 'Compute queued reports page runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5, help='Runs claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new runs')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to sleep when the queue is empty (with --loop)')
+
+    def _prune(self):
+        pruned = prune_finished_runs()
+        if pruned:
+            self.stdout.write(f'Deleted {pruned} finished run(s)')
+        return time.monotonic()
+
+    def handle(self, *args, **options):
+        last_pruned = self._prune()
+        total_completed = total_failed = 0
+        while True:
+            completed, failed = process_pending_runs(limit=options['batch_size'])
+            total_completed += completed
+            total_failed += failed
+            if completed or failed:
+                self.stdout.write(f'Computed {completed} report run(s), {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            if time.monotonic() - last_pruned > PRUNE_EVERY_SECONDS:
+                last_pruned = self._prune()
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_completed} computed, {total_failed} failed'))
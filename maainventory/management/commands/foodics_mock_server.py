@@ -0,0 +1,101 @@
+"""
+Local stand-in for the Foodics orders API, for trying sync_foodics without credentials.
+
+    python manage.py foodics_mock_server --port 8765
+    FOODICS_API_BASE_URL=http://127.0.0.1:8765/v5 python manage.py sync_foodics
+
+Serves GET /v5/orders?filter[branch_id]=..&filter[business_date]=..&page=N with
+deterministic closed orders per (branch, business day), paginated like the real API.
+"""
+
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand
+
+
+DEFAULT_PRODUCTS = 'Big Tasty,Fries,Chicken Burger,Cola,Kids Meal'
+
+
+def mock_orders(branch_id, business_date, products, count):
+    """Same orders for the same (branch, day) on every call; one in ten is voided."""
+    rng = random.Random(f'{branch_id}:{business_date}')
+    return [
+        {
+            'id': f'{branch_id}-{business_date}-{n}',
+            'status': 7 if n % 10 == 9 else 4,
+            'business_date': business_date,
+            'products': [
+                {'product': {'name': name}, 'quantity': rng.randint(1, 3)}
+                for name in rng.sample(products, rng.randint(1, min(3, len(products))))
+            ],
+        }
+        for n in range(count)
+    ]
+
+
+class Handler(BaseHTTPRequestHandler):
+    """GET /v5/orders from mock_orders(); the class attributes are set from the command options."""
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+    products = DEFAULT_PRODUCTS.split(',')
+    orders_per_day = 200
+    page_size = 50
+    latency = 0.05
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path.rstrip('/') != '/v5/orders' or 'filter[branch_id]' not in params:
+            return self._send(404, {'message': 'Not found'})
+        orders = mock_orders(
+            params['filter[branch_id]'], params.get('filter[business_date]', ''), self.products, self.orders_per_day,
+        )
+        last_page = max(1, -(-len(orders) // self.page_size))
+        page = min(max(1, int(params.get('page', 1))), last_page)
+        time.sleep(self.latency)
+        self._send(200, {
+            'data': orders[(page - 1) * self.page_size:page * self.page_size],
+            'meta': {'current_page': page, 'last_page': last_page, 'per_page': self.page_size, 'total': len(orders)},
+        })
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Run a local mock of the Foodics orders API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--orders-per-day', type=int, default=200, help='Orders per branch per business day')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--products', default=DEFAULT_PRODUCTS, help='Comma-separated product names')
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every response')
+
+    def handle(self, *args, **options):
+        handler = type('Handler', (Handler,), {
+            'products': [name.strip() for name in options['products'].split(',') if name.strip()],
+            'orders_per_day': options['orders_per_day'],
+            'page_size': max(1, options['page_size']),
+            'latency': options['latency'],
+        })
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), handler)
+        self.stdout.write(self.style.SUCCESS(f'Mock Foodics API on http://127.0.0.1:{options["port"]}/v5'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
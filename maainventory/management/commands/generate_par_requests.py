@@ -0,0 +1,23 @@
+"""
+Create tonight's par-level draft requests for every branch below par (schedule nightly,
+e.g. 02:00, after sync_foodics has brought consumption up to date).
+
+    python manage.py generate_par_requests
+"""
+
+from django.core.management.base import BaseCommand
+
+from maainventory.par_levels import generate_draft_requests
+
+
+class Command(BaseCommand):
+    help = 'Generate draft stock requests for branches below par level'
+
+    def handle(self, *args, **options):
+        summary = generate_draft_requests()
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {summary['drafts']} draft request(s) with {summary['lines']} item(s) "
+            f"(replaced {summary['replaced']} old draft(s)) in {summary['seconds']}s"
+        ))
+        if summary['skipped_branches']:
+            self.stdout.write(f"{summary['skipped_branches']} branch(es) below par have no assigned user; no draft created")
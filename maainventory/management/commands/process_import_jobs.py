@@ -0,0 +1,50 @@
+"""
+Process uploaded files queued as import jobs (packaging product lists, sales files),
+and delete expired define-rules drafts.
+
+    python manage.py process_import_jobs            # drain the queue once
+    python manage.py process_import_jobs --loop     # long-running worker
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from maainventory.imports import process_pending_jobs
+from maainventory.packaging import prune_expired_drafts
+
+
+PRUNE_EVERY_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = 'Process queued import jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5, help='Jobs claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=1, help='Seconds to sleep when the queue is empty (with --loop)')
+
+    def _prune(self):
+        pruned = prune_expired_drafts()
+        if pruned:
+            self.stdout.write(f'Deleted {pruned} expired packaging draft(s)')
+        return time.monotonic()
+
+    def handle(self, *args, **options):
+        last_pruned = self._prune()
+        total_completed = total_failed = 0
+        while True:
+            completed, failed = process_pending_jobs(limit=options['batch_size'])
+            total_completed += completed
+            total_failed += failed
+            if completed or failed:
+                self.stdout.write(f'Processed {completed} import job(s), {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            if time.monotonic() - last_pruned > PRUNE_EVERY_SECONDS:
+                last_pruned = self._prune()
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_completed} processed, {total_failed} failed'))
@@ -0,0 +1,29 @@
+"""
+Maintain the daily fact tables read by the reports page (schedule this, e.g. every 15 minutes).
+
+    python manage.py refresh_daily_facts                    # incremental (dates touched since last run)
+    python manage.py refresh_daily_facts --full             # rebuild every fact table
+    python manage.py refresh_daily_facts --only po_daily    # one fact table
+"""
+
+from django.core.management.base import BaseCommand
+
+from maainventory.rollups import DAILY_FACTS, refresh_daily_facts
+
+
+class Command(BaseCommand):
+    help = 'Refresh the daily fact tables used by reports (incremental by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild the tables instead of only touched dates')
+        parser.add_argument('--only', nargs='+', choices=list(DAILY_FACTS), help='Refresh only these fact tables')
+
+    def handle(self, *args, **options):
+        results = refresh_daily_facts(full=options['full'], names=options['only'])
+        for name, (dates, rows) in results.items():
+            if dates is None:
+                self.stdout.write(self.style.SUCCESS(f'{name}: rebuilt, {rows} row(s)'))
+            elif dates:
+                self.stdout.write(self.style.SUCCESS(f'{name}: recomputed {len(dates)} date(s), {rows} row(s)'))
+            else:
+                self.stdout.write(f'{name}: up to date')
@@ -0,0 +1,66 @@
+"""
+Render queued PO invoice / delivery bill PDFs.
+
+    python manage.py render_documents                  # drain the queue once
+    python manage.py render_documents --loop           # long-running worker
+    python manage.py render_documents --regenerate all --from 2026-01-01 --to 2026-01-31
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maainventory.documents import enqueue_range, process_pending_jobs, render_pool
+from maainventory.models import DocumentRenderJob
+
+
+REGENERATE_CHOICES = {
+    'invoices': [DocumentRenderJob.DocumentType.PO_INVOICE],
+    'bills': [DocumentRenderJob.DocumentType.BILL],
+    'all': [DocumentRenderJob.DocumentType.PO_INVOICE, DocumentRenderJob.DocumentType.BILL],
+}
+
+
+def _parse_date(value, option):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise CommandError(f'{option} must be a date in YYYY-MM-DD format')
+
+
+class Command(BaseCommand):
+    help = 'Render pending PO invoice and delivery bill PDFs in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (default: DOCUMENT_RENDER_WORKERS)')
+        parser.add_argument('--batch-size', type=int, default=50, help='Jobs claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when the queue is empty (with --loop)')
+        parser.add_argument('--regenerate', choices=sorted(REGENERATE_CHOICES), help='Queue documents for a date range before rendering')
+        parser.add_argument('--from', dest='date_from', help='Start date (YYYY-MM-DD, inclusive)')
+        parser.add_argument('--to', dest='date_to', help='End date (YYYY-MM-DD, inclusive)')
+
+    def handle(self, *args, **options):
+        if options['regenerate']:
+            date_from = _parse_date(options['date_from'], '--from')
+            date_to = _parse_date(options['date_to'] or options['date_from'], '--to')
+            if date_to < date_from:
+                raise CommandError('--to must not be before --from')
+            queued = enqueue_range(date_from, date_to, REGENERATE_CHOICES[options['regenerate']])
+            self.stdout.write(f'Queued {queued} document(s) for {date_from} to {date_to}')
+
+        total_completed = total_failed = 0
+        with render_pool(options['workers']) as pool:
+            while True:
+                completed, failed = process_pending_jobs(pool, limit=options['batch_size'])
+                total_completed += completed
+                total_failed += failed
+                if completed or failed:
+                    self.stdout.write(f'Rendered {completed} document(s), {failed} failed')
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_completed} rendered, {total_failed} failed'))
@@ -0,0 +1,26 @@
+"""
+Maintain the SupplierLeadTimeStats rollup (lead time p50/p90 and on-time rate per supplier).
+
+    python manage.py rollup_supplier_lead_times           # incremental (suppliers with new receipts)
+    python manage.py rollup_supplier_lead_times --full    # rebuild every supplier
+"""
+
+from django.core.management.base import BaseCommand
+
+from maainventory.rollups import refresh_supplier_lead_times
+
+
+class Command(BaseCommand):
+    help = 'Refresh supplier lead time / on-time delivery stats (incremental by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild the whole rollup instead of only suppliers with new receipts')
+
+    def handle(self, *args, **options):
+        suppliers, rows = refresh_supplier_lead_times(full=options['full'])
+        if suppliers is None:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt supplier lead times: {rows} row(s)'))
+        elif suppliers:
+            self.stdout.write(self.style.SUCCESS(f'Recomputed {len(suppliers)} supplier(s): {rows} row(s)'))
+        else:
+            self.stdout.write('Supplier lead times are up to date')
@@ -0,0 +1,26 @@
+"""
+Maintain the SupplierSpendMonthly rollup.
+
+    python manage.py rollup_supplier_spend           # incremental (months touched since last run)
+    python manage.py rollup_supplier_spend --full    # rebuild every month
+"""
+
+from django.core.management.base import BaseCommand
+
+from maainventory.rollups import refresh_supplier_spend
+
+
+class Command(BaseCommand):
+    help = 'Refresh monthly supplier spend (incremental by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild the whole rollup instead of only touched months')
+
+    def handle(self, *args, **options):
+        months, rows = refresh_supplier_spend(full=options['full'])
+        if months is None:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt supplier spend: {rows} row(s)'))
+        elif months:
+            self.stdout.write(self.style.SUCCESS(f'Recomputed {", ".join(months)}: {rows} row(s)'))
+        else:
+            self.stdout.write('Supplier spend is up to date')
@@ -0,0 +1,35 @@
+"""
+Store the nightly branch inventory snapshot (schedule shortly after midnight, e.g. 00:15).
+
+    python manage.py snapshot_branch_inventory                     # balances as of today 00:00
+    python manage.py snapshot_branch_inventory --date 2026-01-31   # balances as of that day 00:00
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maainventory.branch_ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Snapshot branch inventory balances as of local midnight'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Snapshot the start of this day (YYYY-MM-DD) instead of today')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        try:
+            rows = take_snapshot(day)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if rows is None:
+            self.stdout.write('Snapshot already taken')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Snapshot written: {rows} balance row(s)'))
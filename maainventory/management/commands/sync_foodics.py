@@ -0,0 +1,43 @@
+"""
+Pull sales from Foodics for every mapped branch and record packaging consumption.
+
+    python manage.py sync_foodics                          # one incremental sync
+    python manage.py sync_foodics --loop --interval 300    # long-running worker
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from maainventory.foodics_sync import FoodicsError, sync_foodics
+
+
+class Command(BaseCommand):
+    help = 'Sync Foodics sales into branch consumption'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep syncing')
+        parser.add_argument('--interval', type=float, default=300, help='Seconds between syncs (with --loop)')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                summary = sync_foodics()
+            except FoodicsError as e:
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'Sync failed: {e}')
+                summary = {}
+            if summary is None:
+                self.stdout.write('Foodics integration is not enabled')
+            elif summary:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Synced {summary['branches']} branch(es) x {summary['days']} day(s): {summary['orders']} orders, "
+                    f"{summary['rows_created']} consumption rows created, {summary['rows_updated']} updated "
+                    f"in {summary['seconds']}s"
+                ))
+                if summary['unmatched_products']:
+                    self.stdout.write(f"No packaging rules for: {', '.join(summary['unmatched_products'][:10])}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
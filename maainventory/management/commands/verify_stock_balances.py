@@ -0,0 +1,21 @@
+"""
+Recompute warehouse balances from the stock ledger and flag StockBalance rows that drift
+(listed in the admin under Stock balance drifts).
+
+    python manage.py verify_stock_balances
+"""
+
+from django.core.management.base import BaseCommand
+
+from maainventory.stock_checkpoints import verify_balances
+
+
+class Command(BaseCommand):
+    help = 'Compare StockBalance with the balances recomputed from the stock ledger'
+
+    def handle(self, *args, **options):
+        drifts = verify_balances()
+        if drifts:
+            self.stdout.write(self.style.WARNING(f'{drifts} stock balance(s) differ from the ledger'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Stock balances match the ledger'))
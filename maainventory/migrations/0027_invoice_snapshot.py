@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0026_add_branch_inventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_version', models.DateTimeField(help_text='SupplierOrder.updated_at at render time')),
+                ('etag', models.CharField(max_length=64)),
+                ('html', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('portal_token', models.ForeignKey(blank=True, help_text='Token link the snapshot was rendered for (sign URL differs per link)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='invoice_snapshots', to='maainventory.portaltoken')),
+                ('supplier_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_snapshots', to='maainventory.supplierorder')),
+            ],
+            options={
+                'db_table': 'invoice_snapshots',
+                'unique_together': {('supplier_order', 'portal_token')},
+            },
+        ),
+    ]
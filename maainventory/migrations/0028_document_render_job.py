@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0027_invoice_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('PO_INVOICE', 'PO Invoice'), ('BILL', 'Delivery Bill')], max_length=20)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('file_url', models.URLField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error_log', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='render_jobs', to='maainventory.request')),
+                ('supplier_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='render_jobs', to='maainventory.supplierorder')),
+            ],
+            options={
+                'db_table': 'document_render_jobs',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='document_re_status_eea531_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated manually - move base64 signature TextFields into deferred binary columns
+
+import base64
+import binascii
+
+from django.db import migrations, models, transaction
+
+
+BATCH_SIZE = 500
+
+
+def _decode(value):
+    """Base64 (optionally a data: URL) -> PNG bytes, or None if unusable."""
+    if not value:
+        return None
+    if value.startswith('data:') and ',' in value:
+        value = value.split(',', 1)[1]
+    try:
+        return base64.b64decode(value, validate=False)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _convert(Model, source, target, transform):
+    """Copy source -> target in id-ordered batches, one transaction per batch."""
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Model.objects.filter(id__gt=last_id).exclude(**{f'{source}__isnull': True})
+                .order_by('id').only('id', source)[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            for row in batch:
+                setattr(row, target, transform(getattr(row, source)))
+            Model.objects.bulk_update(batch, [target])
+        last_id = batch[-1].id
+
+
+def signatures_to_binary(apps, schema_editor):
+    for model_name in ('SupplierInvoiceSignature', 'DeliverySignature'):
+        _convert(apps.get_model('maainventory', model_name), 'signature_data', 'signature_image', _decode)
+
+
+def signatures_to_base64(apps, schema_editor):
+    for model_name in ('SupplierInvoiceSignature', 'DeliverySignature'):
+        _convert(
+            apps.get_model('maainventory', model_name), 'signature_image', 'signature_data',
+            lambda value: base64.b64encode(bytes(value)).decode('ascii'),
+        )
+
+
+class Migration(migrations.Migration):
+    # Batches commit independently so large tables are not converted in one transaction
+    atomic = False
+
+    dependencies = [
+        ('maainventory', '0028_document_render_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplierinvoicesignature',
+            name='signature_image',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deliverysignature',
+            name='signature_image',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(signatures_to_binary, signatures_to_base64, atomic=False),
+        migrations.RemoveField(
+            model_name='supplierinvoicesignature',
+            name='signature_data',
+        ),
+        migrations.RemoveField(
+            model_name='deliverysignature',
+            name='signature_data',
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0029_signature_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('high_water', models.DateTimeField(blank=True, null=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'rollup_watermarks',
+            },
+        ),
+        migrations.AddField(
+            model_name='supplierspendmonthly',
+            name='category',
+            field=models.ForeignKey(blank=True, help_text='Supplier category when the month was rolled up', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='monthly_spend', to='maainventory.suppliercategory'),
+        ),
+        migrations.AddField(
+            model_name='supplierspendmonthly',
+            name='order_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='supplierspendmonthly',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
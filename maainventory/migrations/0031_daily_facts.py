@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0030_supplier_spend_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemconsumptiondaily',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='StockMovementDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('reason', models.CharField(choices=[('DELIVERY_RECEIVED', 'Delivery Received'), ('REQUEST_FULFILLMENT', 'Request Fulfillment'), ('ADJUSTMENT_DAMAGE', 'Adjustment - Damage'), ('ADJUSTMENT_VARIANCE', 'Adjustment - Variance'), ('TRANSFER_SUPPLIER_TO_WAREHOUSE', 'Transfer Supplier to Warehouse'), ('OTHER', 'Other')], max_length=50)),
+                ('movement_count', models.IntegerField(default=0)),
+                ('qty_in', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('qty_out', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'stock_movement_daily',
+                'ordering': ['-date', 'reason'],
+                'unique_together': {('date', 'reason')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsumptionDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('qty_consumed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('record_count', models.IntegerField(default=0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumption_rollup', to='maainventory.branch')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumption_rollup', to='maainventory.item')),
+            ],
+            options={
+                'db_table': 'consumption_daily_rollup',
+                'ordering': ['-date', 'branch', 'item'],
+                'unique_together': {('date', 'branch', 'item')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PoDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('Draft', 'Draft'), ('Sent', 'Sent'), ('Signed', 'Signed'), ('Confirmed', 'Confirmed'), ('InProduction', 'In Production'), ('Ready', 'Ready'), ('PartiallyReceived', 'Partially Received'), ('Received', 'Received'), ('OnHold', 'On Hold'), ('Cancelled', 'Cancelled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='po_daily', to='maainventory.supplier')),
+            ],
+            options={
+                'db_table': 'po_daily',
+                'ordering': ['-date', 'supplier', 'status'],
+                'unique_together': {('date', 'supplier', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RequestDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending Procurement Manager Approval'), ('Approved', 'Approved'), ('Rejected', 'Rejected by Procurement Manager'), ('WarehouseProcessing', 'Warehouse Processing'), ('ReadyForDelivery', 'Ready for Delivery'), ('InProcess', 'In Process'), ('OutForDelivery', 'Out for Delivery'), ('Delivered', 'Delivered'), ('Completed', 'Completed')], max_length=20)),
+                ('request_count', models.IntegerField(default=0)),
+                ('fulfilled_count', models.IntegerField(default=0, help_text='Completed requests with an approval date')),
+                ('fulfillment_days_total', models.IntegerField(default=0, help_text='Sum of whole days from approval to completion')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='request_daily', to='maainventory.branch')),
+            ],
+            options={
+                'db_table': 'request_daily',
+                'ordering': ['-date', 'branch', 'status'],
+                'unique_together': {('date', 'branch', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0031_daily_facts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(db_index=True, max_length=255)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('role', models.CharField(blank=True, default='', max_length=100)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('sections_total', models.PositiveIntegerField(default=0)),
+                ('sections_done', models.PositiveIntegerField(default=0)),
+                ('completed_sections', models.JSONField(blank=True, default=list)),
+                ('current_section', models.CharField(blank=True, max_length=50, null=True)),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error_log', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'report_runs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='report_runs_status_56b995_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['Pending', 'Processing'])), fields=('cache_key',), name='report_runs_one_in_flight_per_key')],
+            },
+        ),
+    ]
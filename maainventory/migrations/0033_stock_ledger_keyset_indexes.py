@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0032_report_run'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['created_at', 'id'], name='stock_ledger_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['item', 'created_at', 'id'], name='stock_ledger_item_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['reference_type', 'reference_id'], name='stock_ledger_reference_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0033_stock_ledger_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supplierpricediscussion',
+            index=models.Index(fields=['supplier_item', 'discussed_date'], name='price_disc_item_date_idx'),
+        ),
+    ]
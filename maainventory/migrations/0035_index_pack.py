@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0034_price_discussion_item_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='branches_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorylocation',
+            index=models.Index(fields=['type'], name='inventory_locations_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='items_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['status', 'created_at'], name='requests_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['branch', 'created_at'], name='requests_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['created_at'], name='stock_ledger_created_brin'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='suppliers_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplierorder',
+            index=models.Index(fields=['status', 'created_at'], name='supp_orders_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplierorder',
+            index=models.Index(fields=['supplier', 'created_at'], name='supp_orders_supp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplierstock',
+            index=models.Index(fields=['supplier', 'item', 'confirmed_at'], name='supplier_stock_fifo_idx'),
+        ),
+    ]
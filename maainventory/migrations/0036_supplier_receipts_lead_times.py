@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0035_index_pack'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierLeadTimeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receipt_count', models.IntegerField(default=0)),
+                ('lead_time_p50', models.DecimalField(blank=True, decimal_places=1, help_text='Median lead time in days', max_digits=6, null=True)),
+                ('lead_time_p90', models.DecimalField(blank=True, decimal_places=1, help_text='90th percentile lead time in days', max_digits=6, null=True)),
+                ('avg_lead_time_days', models.DecimalField(blank=True, decimal_places=1, max_digits=6, null=True)),
+                ('rated_count', models.IntegerField(default=0, help_text='Receipts that had an expected delivery date')),
+                ('on_time_count', models.IntegerField(default=0)),
+                ('on_time_rate', models.DecimalField(blank=True, decimal_places=1, help_text='On-time receipts as a % of rated receipts', max_digits=5, null=True)),
+                ('last_received_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('supplier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='lead_time_stats', to='maainventory.supplier')),
+            ],
+            options={
+                'db_table': 'supplier_lead_time_stats',
+                'ordering': ['supplier'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SupplierOrderReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty_received', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('received_at', models.DateTimeField()),
+                ('ordered_at', models.DateTimeField(help_text='When the PO was emailed to the supplier (created, if never emailed)')),
+                ('lead_time_days', models.IntegerField(help_text='Local calendar days from ordered_at to received_at')),
+                ('expected_lead_time_days', models.IntegerField(blank=True, help_text="Supplier item's lead_time_days at receipt", null=True)),
+                ('expected_delivery_date', models.DateField(blank=True, help_text='Date the line was due: its expected_delivery_date, else the PO requested date, else ordered date + lead time', null=True)),
+                ('on_time', models.BooleanField(blank=True, help_text='Received on or before expected_delivery_date (empty when nothing was expected)', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='maainventory.supplierorderitem')),
+                ('received_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_receipts', to=settings.AUTH_USER_MODEL)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='maainventory.supplier')),
+                ('supplier_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='maainventory.supplierorder')),
+            ],
+            options={
+                'db_table': 'supplier_order_receipts',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['supplier', 'received_at'], name='receipts_supplier_received_idx'), models.Index(fields=['created_at'], name='receipts_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0036_supplier_receipts_lead_times'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='reportrun',
+            name='current_section',
+        ),
+        migrations.AddField(
+            model_name='reportrun',
+            name='running_sections',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='reportrun',
+            name='section_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Seconds taken per section'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0039_branch_packaging_drafts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchInventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty_change', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reason', models.CharField(choices=[('DELIVERY', 'Delivery'), ('SALES_FILE', 'Sales File'), ('FOODICS', 'Foodics Sync'), ('ADJUSTMENT', 'Adjustment')], max_length=20)),
+                ('reference_type', models.CharField(blank=True, choices=[('REQUEST', 'Request'), ('IMPORT', 'Import'), ('FOODICS_SYNC', 'Foodics Sync')], max_length=20, null=True)),
+                ('reference_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to='maainventory.branch')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='branch_inventory_movements', to=settings.AUTH_USER_MODEL)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='branch_inventory_movements', to='maainventory.item')),
+                ('variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='branch_inventory_movements', to='maainventory.itemvariation')),
+            ],
+            options={
+                'db_table': 'branch_inventory_movements',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['branch', 'created_at'], name='branch_movements_branch_idx'), models.Index(fields=['reference_type', 'reference_id'], name='branch_movements_ref_idx'), django.contrib.postgres.indexes.BrinIndex(autosummarize=True, fields=['created_at'], name='branch_movements_created_brin')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BranchInventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='maainventory.branch')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='branch_inventory_snapshots', to='maainventory.item')),
+                ('variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='branch_inventory_snapshots', to='maainventory.itemvariation')),
+            ],
+            options={
+                'db_table': 'branch_inventory_snapshots',
+                'ordering': ['-taken_at', 'branch', 'item'],
+                'indexes': [models.Index(fields=['branch', 'taken_at'], name='branch_snapshots_branch_idx'), models.Index(fields=['taken_at'], name='branch_snapshots_taken_idx')],
+            },
+        ),
+    ]
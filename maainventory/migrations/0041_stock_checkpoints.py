@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0040_branch_inventory_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalanceDrift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('detected_at', models.DateTimeField()),
+                ('ledger_qty', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance_qty', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_drifts', to='maainventory.item')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_drifts', to='maainventory.inventorylocation')),
+                ('variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_drifts', to='maainventory.itemvariation')),
+            ],
+            options={
+                'db_table': 'stock_balance_drifts',
+                'ordering': ['location', 'item'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='maainventory.item')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='maainventory.inventorylocation')),
+                ('variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='maainventory.itemvariation')),
+            ],
+            options={
+                'db_table': 'stock_checkpoints',
+                'ordering': ['-taken_at', 'location', 'item'],
+                'indexes': [models.Index(fields=['taken_at', 'location'], name='stock_checkpoints_taken_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0041_stock_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='request',
+            name='status',
+            field=models.CharField(choices=[('Draft', 'Draft (Review and Submit)'), ('Pending', 'Pending Procurement Manager Approval'), ('Approved', 'Approved'), ('Rejected', 'Rejected by Procurement Manager'), ('WarehouseProcessing', 'Warehouse Processing'), ('ReadyForDelivery', 'Ready for Delivery'), ('InProcess', 'In Process'), ('OutForDelivery', 'Out for Delivery'), ('Delivered', 'Delivered'), ('Completed', 'Completed')], default='Pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='requestdaily',
+            name='status',
+            field=models.CharField(choices=[('Draft', 'Draft (Review and Submit)'), ('Pending', 'Pending Procurement Manager Approval'), ('Approved', 'Approved'), ('Rejected', 'Rejected by Procurement Manager'), ('WarehouseProcessing', 'Warehouse Processing'), ('ReadyForDelivery', 'Ready for Delivery'), ('InProcess', 'In Process'), ('OutForDelivery', 'Out for Delivery'), ('Delivered', 'Delivered'), ('Completed', 'Completed')], max_length=20),
+        ),
+    ]
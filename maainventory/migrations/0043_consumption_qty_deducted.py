@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def backfill_qty_deducted(apps, schema_editor):
+    # What was deducted before is not known; assume all of it (the previous behaviour)
+    ItemConsumptionDaily = apps.get_model('maainventory', 'ItemConsumptionDaily')
+    ItemConsumptionDaily.objects.update(qty_deducted=models.F('qty_consumed'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0042_request_draft_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemconsumptiondaily',
+            name='qty_deducted',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Part of qty_consumed actually taken off branch inventory (less when stock ran out)', max_digits=10, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.RunPython(backfill_qty_deducted, migrations.RunPython.noop),
+    ]
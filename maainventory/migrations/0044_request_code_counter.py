@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0043_consumption_qty_deducted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestCodeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField(unique=True)),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'request_code_counters',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-19
+
+from django.db import migrations, models
+
+
+def drop_duplicate_internal_snapshots(apps, schema_editor):
+    # Snapshots are a render cache; keep the newest token-less one per order
+    InvoiceSnapshot = apps.get_model('maainventory', 'InvoiceSnapshot')
+    keep = (
+        InvoiceSnapshot.objects.filter(portal_token__isnull=True)
+        .values('supplier_order_id').annotate(last_id=models.Max('id')).values('last_id')
+    )
+    InvoiceSnapshot.objects.filter(portal_token__isnull=True).exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0044_request_code_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_internal_snapshots, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='invoicesnapshot',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='invoicesnapshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('portal_token__isnull', False)), fields=('supplier_order', 'portal_token'), name='invoice_snapshots_one_per_token'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoicesnapshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('portal_token__isnull', True)), fields=('supplier_order',), name='invoice_snapshots_one_internal'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-19
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def write_opening_snapshot(apps, schema_editor):
+    # Branch history starts here: stock held before the ledger never produced movements
+    BranchInventory = apps.get_model('maainventory', 'BranchInventory')
+    BranchInventorySnapshot = apps.get_model('maainventory', 'BranchInventorySnapshot')
+    if BranchInventorySnapshot.objects.exists():
+        return
+    taken_at = timezone.now()
+    BranchInventorySnapshot.objects.bulk_create([
+        BranchInventorySnapshot(
+            taken_at=taken_at, branch_id=row.branch_id, item_id=row.item_id,
+            variation_id=row.variation_id, quantity=row.quantity,
+        )
+        for row in BranchInventory.objects.exclude(quantity=0)
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maainventory', '0045_invoice_snapshot_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(write_opening_snapshot, migrations.RunPython.noop),
+    ]
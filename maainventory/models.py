@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import BrinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 import uuid
 
@@ -80,6 +82,9 @@ class Branch(models.Model):
     class Meta:
         db_table = 'branches'
         ordering = ['brand', 'name']
+        indexes = [
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='branches_active_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.brand.name})"
@@ -143,6 +148,10 @@ class Item(models.Model):
     class Meta:
         db_table = 'items'
         ordering = ['item_code']
+        indexes = [
+            # Active item pickers, ordered by name
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='items_active_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.item_code} - {self.name}"
@@ -192,6 +201,9 @@ class InventoryLocation(models.Model):
     
     class Meta:
         db_table = 'inventory_locations'
+        indexes = [
+            models.Index(fields=['type'], name='inventory_locations_type_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -245,11 +257,67 @@ class StockLedger(models.Model):
     class Meta:
         db_table = 'stock_ledger'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the ledger browser (ledger.py)
+            models.Index(fields=['created_at', 'id'], name='stock_ledger_created_id_idx'),
+            models.Index(fields=['item', 'created_at', 'id'], name='stock_ledger_item_created_idx'),
+            models.Index(fields=['reference_type', 'reference_id'], name='stock_ledger_reference_idx'),
+            # Date-range scans (reports, exports): the ledger is append-only, so created_at
+            # follows the physical row order and a BRIN index stays tiny
+            BrinIndex(fields=['created_at'], name='stock_ledger_created_brin', autosummarize=True),
+        ]
     
     def __str__(self):
         return f"{self.item.item_code} - {self.qty_change} ({self.reason})"
 
 
+class StockCheckpoint(models.Model):
+    """
+    Per item/variation/location balances derived from StockLedger as of taken_at (local
+    midnight), written by checkpoint_stock_ledger (stock_checkpoints.py). Zero balances
+    have no row.
+    """
+    taken_at = models.DateTimeField()
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    variation = models.ForeignKey(ItemVariation, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_checkpoints')
+    location = models.ForeignKey(InventoryLocation, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = 'stock_checkpoints'
+        ordering = ['-taken_at', 'location', 'item']
+        indexes = [
+            models.Index(fields=['taken_at', 'location'], name='stock_checkpoints_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item.item_code} @ {self.location.name} {self.taken_at:%Y-%m-%d}: {self.quantity}"
+
+
+class StockBalanceDrift(models.Model):
+    """
+    StockBalance rows that disagree with the balance recomputed from StockLedger, as found
+    by the last verify_stock_balances run (each run replaces the previous findings).
+    """
+    detected_at = models.DateTimeField()
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='stock_drifts')
+    variation = models.ForeignKey(ItemVariation, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_drifts')
+    location = models.ForeignKey(InventoryLocation, on_delete=models.CASCADE, related_name='stock_drifts')
+    ledger_qty = models.DecimalField(max_digits=12, decimal_places=2)
+    balance_qty = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = 'stock_balance_drifts'
+        ordering = ['location', 'item']
+
+    @property
+    def difference(self):
+        return self.balance_qty - self.ledger_qty
+
+    def __str__(self):
+        return f"{self.item.item_code} @ {self.location.name}: balance {self.balance_qty}, ledger {self.ledger_qty}"
+
+
 # ============================================================================
 # C. Suppliers & Pricing
 # ============================================================================
@@ -289,6 +357,9 @@ class Supplier(models.Model):
     class Meta:
         db_table = 'suppliers'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='suppliers_active_name_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -371,6 +442,10 @@ class SupplierPriceDiscussion(models.Model):
     class Meta:
         db_table = 'supplier_price_discussions'
         ordering = ['-discussed_date', '-created_at']
+        indexes = [
+            # Price history windows and as-of lookups per supplier item (price_history.py)
+            models.Index(fields=['supplier_item', 'discussed_date'], name='price_disc_item_date_idx'),
+        ]
         verbose_name = 'Price Discussion'
         verbose_name_plural = 'Price Discussions'
     
@@ -385,6 +460,7 @@ class SupplierPriceDiscussion(models.Model):
 class Request(models.Model):
     """Branch requests for inventory"""
     class StatusType(models.TextChoices):
+        DRAFT = 'Draft', 'Draft (Review and Submit)'  # par-level suggestion (par_levels.py), not yet sent
         PENDING = 'Pending', 'Pending Procurement Manager Approval'
         APPROVED = 'Approved', 'Approved'  # legacy; after approval flow uses WAREHOUSE_PROCESSING
         REJECTED = 'Rejected', 'Rejected by Procurement Manager'
@@ -410,6 +486,11 @@ class Request(models.Model):
     class Meta:
         db_table = 'requests'
         ordering = ['-created_at']
+        indexes = [
+            # Status tabs / pending alerts and per-branch lists, newest first
+            models.Index(fields=['status', 'created_at'], name='requests_status_created_idx'),
+            models.Index(fields=['branch', 'created_at'], name='requests_branch_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.request_code} - {self.branch.name}"
@@ -450,6 +531,45 @@ class RequestStatusHistory(models.Model):
         return f"{self.request.request_code}: {self.old_status} → {self.new_status}"
 
 
+class RequestCodeCounterManager(models.Manager):
+    def allocate(self, year, count=1):
+        """
+        Reserve `count` consecutive REQ-YYYY-NNNNNN codes. The year's counter row is locked
+        until the caller's transaction ends, so concurrent callers get distinct codes, and
+        numbers are never handed out again (even when the request is deleted later).
+        """
+        prefix = f'REQ-{year}-'
+
+        def last_issued():
+            # A year's first allocation continues from the codes already in use
+            last = Request.objects.filter(request_code__startswith=prefix).order_by('-request_code').values_list('request_code', flat=True).first()
+            try:
+                return int(last.split('-')[-1]) if last else 0
+            except ValueError:
+                return 0
+
+        with transaction.atomic():
+            counter, _ = self.select_for_update().get_or_create(year=year, defaults={'last_number': last_issued})
+            first = counter.last_number + 1
+            counter.last_number += count
+            counter.save(update_fields=['last_number'])
+        return [f'{prefix}{number:06d}' for number in range(first, first + count)]
+
+
+class RequestCodeCounter(models.Model):
+    """Last request code number issued per year (see RequestCodeCounterManager.allocate)"""
+    year = models.PositiveIntegerField(unique=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    objects = RequestCodeCounterManager()
+
+    class Meta:
+        db_table = 'request_code_counters'
+
+    def __str__(self):
+        return f"REQ-{self.year}: {self.last_number}"
+
+
 # ============================================================================
 # E. Supplier Orders (PO) & Invoice Signing
 # ============================================================================
@@ -481,6 +601,10 @@ class SupplierOrder(models.Model):
     class Meta:
         db_table = 'supplier_orders'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='supp_orders_status_created_idx'),
+            models.Index(fields=['supplier', 'created_at'], name='supp_orders_supp_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.po_code} - {self.supplier.name}"
@@ -504,6 +628,36 @@ class SupplierOrderItem(models.Model):
         return f"{self.supplier_order.po_code} - {self.item.item_code}"
 
 
+class SupplierOrderReceipt(models.Model):
+    """
+    One receipt of goods against a PO line (written by receiving.receive_orders), with
+    the lead time it took and whether it arrived by the date expected at the time.
+    """
+    order_item = models.ForeignKey(SupplierOrderItem, on_delete=models.CASCADE, related_name='receipts')
+    supplier_order = models.ForeignKey(SupplierOrder, on_delete=models.CASCADE, related_name='receipts')
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='receipts')
+    qty_received = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    received_at = models.DateTimeField()
+    received_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_receipts')
+    ordered_at = models.DateTimeField(help_text='When the PO was emailed to the supplier (created, if never emailed)')
+    lead_time_days = models.IntegerField(help_text='Local calendar days from ordered_at to received_at')
+    expected_lead_time_days = models.IntegerField(null=True, blank=True, help_text="Supplier item's lead_time_days at receipt")
+    expected_delivery_date = models.DateField(null=True, blank=True, help_text='Date the line was due: its expected_delivery_date, else the PO requested date, else ordered date + lead time')
+    on_time = models.BooleanField(null=True, blank=True, help_text='Received on or before expected_delivery_date (empty when nothing was expected)')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'supplier_order_receipts'
+        ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['supplier', 'received_at'], name='receipts_supplier_received_idx'),
+            models.Index(fields=['created_at'], name='receipts_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.supplier_order.po_code} - {self.order_item.item.item_code}: {self.qty_received} ({self.received_at.strftime('%Y-%m-%d')})"
+
+
 class PortalToken(models.Model):
     """Secure supplier access links for invoice signing"""
     token = models.CharField(max_length=255, unique=True)
@@ -520,16 +674,24 @@ class PortalToken(models.Model):
         return f"Token for {self.supplier_order.po_code}"
 
 
+class DeferredSignatureManager(models.Manager):
+    """Leaves signature_image out of every query; load it explicitly with only()/defer(None)"""
+    def get_queryset(self):
+        return super().get_queryset().defer('signature_image')
+
+
 class SupplierInvoiceSignature(models.Model):
     """Supplier invoice signatures"""
     supplier_order = models.ForeignKey(SupplierOrder, on_delete=models.CASCADE, related_name='invoice_signatures')
     supplier_name_signed = models.CharField(max_length=255)
     signature_file_url = models.URLField(null=True, blank=True)
-    signature_data = models.TextField(null=True, blank=True)  # Base64 encoded signature
+    signature_image = models.BinaryField(null=True, blank=True)  # PNG bytes, deferred by default
     invoice_file_url = models.URLField(null=True, blank=True)
     signed_at = models.DateTimeField()
     token = models.ForeignKey(PortalToken, on_delete=models.SET_NULL, null=True, related_name='signatures')
     
+    objects = DeferredSignatureManager()
+    
     class Meta:
         db_table = 'supplier_invoice_signatures'
     
@@ -537,6 +699,40 @@ class SupplierInvoiceSignature(models.Model):
         return f"Invoice signature for {self.supplier_order.po_code}"
 
 
+class InvoiceSnapshot(models.Model):
+    """
+    Rendered invoice HTML for one version of a sent PO, served to suppliers with a strong ETag.
+    A snapshot is valid while order_version equals the order's updated_at (signing, cancelling
+    or receiving the order bumps updated_at, which retires the snapshot).
+    """
+    supplier_order = models.ForeignKey(SupplierOrder, on_delete=models.CASCADE, related_name='invoice_snapshots')
+    portal_token = models.ForeignKey(PortalToken, on_delete=models.CASCADE, null=True, blank=True, related_name='invoice_snapshots', help_text='Token link the snapshot was rendered for (sign URL differs per link)')
+    order_version = models.DateTimeField(help_text='SupplierOrder.updated_at at render time')
+    etag = models.CharField(max_length=64)
+    html = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'invoice_snapshots'
+        constraints = [
+            # One snapshot per token link, and one internal (token-less) snapshot: a plain
+            # unique (order, token) would let NULL tokens repeat
+            models.UniqueConstraint(
+                fields=['supplier_order', 'portal_token'],
+                condition=models.Q(portal_token__isnull=False),
+                name='invoice_snapshots_one_per_token',
+            ),
+            models.UniqueConstraint(
+                fields=['supplier_order'],
+                condition=models.Q(portal_token__isnull=True),
+                name='invoice_snapshots_one_internal',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Invoice snapshot for {self.supplier_order.po_code} ({self.order_version:%Y-%m-%d %H:%M:%S})"
+
+
 class ItemRequest(models.Model):
     """Item requests to suppliers (no invoice, just notification)"""
     class StatusType(models.TextChoices):
@@ -595,6 +791,10 @@ class SupplierStock(models.Model):
     class Meta:
         db_table = 'supplier_stock'
         ordering = ['-confirmed_at']
+        indexes = [
+            # Available stock per (supplier, item), consumed oldest first
+            models.Index(fields=['supplier', 'item', 'confirmed_at'], name='supplier_stock_fifo_idx'),
+        ]
     
     def __str__(self):
         return f"{self.supplier.name} - {self.item.item_code} ({self.quantity})"
@@ -644,15 +844,52 @@ class DeliveryDocument(models.Model):
         return f"{self.document_type} for {self.request.request_code}"
 
 
+class DocumentRenderJob(models.Model):
+    """Queued PDF renders (PO invoices, delivery bills) processed by the render_documents worker"""
+    class DocumentType(models.TextChoices):
+        PO_INVOICE = 'PO_INVOICE', 'PO Invoice'
+        BILL = 'BILL', 'Delivery Bill'
+    
+    class StatusType(models.TextChoices):
+        PENDING = 'Pending', 'Pending'
+        PROCESSING = 'Processing', 'Processing'
+        COMPLETED = 'Completed', 'Completed'
+        FAILED = 'Failed', 'Failed'
+    
+    document_type = models.CharField(max_length=20, choices=DocumentType.choices)
+    supplier_order = models.ForeignKey(SupplierOrder, on_delete=models.CASCADE, null=True, blank=True, related_name='render_jobs')
+    request = models.ForeignKey(Request, on_delete=models.CASCADE, null=True, blank=True, related_name='render_jobs')
+    status = models.CharField(max_length=20, choices=StatusType.choices, default=StatusType.PENDING)
+    file_url = models.URLField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error_log = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'document_render_jobs'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        target = self.supplier_order.po_code if self.supplier_order_id else self.request.request_code
+        return f"{self.get_document_type_display()} for {target} - {self.status}"
+
+
 class DeliverySignature(models.Model):
     """Branch manager signatures for delivery confirmation"""
     request = models.ForeignKey(Request, on_delete=models.CASCADE, related_name='delivery_signatures')
     branch_manager = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='delivery_signatures')
     signed_name = models.CharField(max_length=255)
     signature_file_url = models.URLField(null=True, blank=True)
-    signature_data = models.TextField(null=True, blank=True)  # Base64 encoded signature
+    signature_image = models.BinaryField(null=True, blank=True)  # PNG bytes, deferred by default
     signed_at = models.DateTimeField(auto_now_add=True)
     
+    objects = DeferredSignatureManager()
+    
     class Meta:
         db_table = 'delivery_signatures'
     
@@ -759,6 +996,26 @@ class BranchPackagingRuleItem(models.Model):
         return f"{self.rule.product_name}: {self.quantity_per_unit} units"
 
 
+class BranchPackagingDraft(models.Model):
+    """
+    Products parsed from an uploaded file, waiting to be mapped to packaging items on the
+    define-rules form. The user's session only holds the draft id; expired drafts are
+    deleted by the process_import_jobs worker.
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='packaging_drafts')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='packaging_drafts')
+    products = models.JSONField(default=list)  # [{'product_name', 'qty', 'sales', 'popularity', 'popularity_category'}]
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'branch_packaging_drafts'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.branch.name}: {len(self.products)} products (draft #{self.id})"
+
+
 class ItemConsumptionDaily(models.Model):
     """Daily consumption at branch: Foodics sales or packaging CSV deduction"""
     class SourceType(models.TextChoices):
@@ -770,8 +1027,10 @@ class ItemConsumptionDaily(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='consumption_records')
     variation = models.ForeignKey(ItemVariation, on_delete=models.CASCADE, null=True, blank=True, related_name='consumption_records')
     qty_consumed = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    qty_deducted = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)], help_text='Part of qty_consumed actually taken off branch inventory (less when stock ran out)')
     source = models.CharField(max_length=20, choices=SourceType.choices)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'item_consumption_daily'
@@ -785,8 +1044,8 @@ class ItemConsumptionDaily(models.Model):
 class BranchInventory(models.Model):
     """
     Current inventory at each branch. Rows are added when requests are marked Delivered
-    and decremented when consumption (e.g. packaging CSV) is recorded.
-    The Branches page displays rows from this table only.
+    and decremented when consumption (e.g. packaging CSV) is recorded; every change is
+    also recorded in BranchInventoryMovement. The Branches page displays rows from this table only.
     """
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='branch_inventory')
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='branch_inventory')
@@ -805,11 +1064,79 @@ class BranchInventory(models.Model):
         return f"{self.branch.name}: {self.item.item_code}{var_str} = {self.quantity}"
 
 
+class BranchInventoryMovement(models.Model):
+    """
+    Append-only ledger of branch inventory changes, written alongside every change to
+    BranchInventory (branch_ledger.py). qty_change is what was actually applied, so
+    deductions clamped at zero record the smaller amount.
+    """
+    class ReasonType(models.TextChoices):
+        DELIVERY = 'DELIVERY', 'Delivery'
+        SALES_FILE = 'SALES_FILE', 'Sales File'
+        FOODICS = 'FOODICS', 'Foodics Sync'
+        ADJUSTMENT = 'ADJUSTMENT', 'Adjustment'
+
+    class ReferenceType(models.TextChoices):
+        REQUEST = 'REQUEST', 'Request'
+        IMPORT = 'IMPORT', 'Import'
+        FOODICS_SYNC = 'FOODICS_SYNC', 'Foodics Sync'
+
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='inventory_movements')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='branch_inventory_movements')
+    variation = models.ForeignKey(ItemVariation, on_delete=models.CASCADE, null=True, blank=True, related_name='branch_inventory_movements')
+    qty_change = models.DecimalField(max_digits=10, decimal_places=2)  # positive or negative
+    reason = models.CharField(max_length=20, choices=ReasonType.choices)
+    reference_type = models.CharField(max_length=20, choices=ReferenceType.choices, null=True, blank=True)
+    reference_id = models.CharField(max_length=100, null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='branch_inventory_movements')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'branch_inventory_movements'
+        ordering = ['-created_at']
+        indexes = [
+            # Delta scans from a snapshot: one branch, created_at in [snapshot, as of)
+            models.Index(fields=['branch', 'created_at'], name='branch_movements_branch_idx'),
+            models.Index(fields=['reference_type', 'reference_id'], name='branch_movements_ref_idx'),
+            BrinIndex(fields=['created_at'], name='branch_movements_created_brin', autosummarize=True),
+        ]
+
+    def __str__(self):
+        return f"{self.branch.name}: {self.item.item_code} {self.qty_change} ({self.reason})"
+
+
+class BranchInventorySnapshot(models.Model):
+    """
+    Branch inventory balances as of taken_at (local midnight), written nightly by
+    snapshot_branch_inventory; the earliest (opening) one marks where history starts.
+    Items with a zero balance have no row.
+    """
+    taken_at = models.DateTimeField()
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='branch_inventory_snapshots')
+    variation = models.ForeignKey(ItemVariation, on_delete=models.CASCADE, null=True, blank=True, related_name='branch_inventory_snapshots')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = 'branch_inventory_snapshots'
+        ordering = ['-taken_at', 'branch', 'item']
+        indexes = [
+            models.Index(fields=['branch', 'taken_at'], name='branch_snapshots_branch_idx'),
+            models.Index(fields=['taken_at'], name='branch_snapshots_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.branch.name} @ {self.taken_at:%Y-%m-%d}: {self.item.item_code} = {self.quantity}"
+
+
 class SupplierSpendMonthly(models.Model):
-    """Monthly supplier spending report (optional materialized table)"""
+    """Monthly supplier spending rollup (maintained by rollups.refresh_supplier_spend)"""
     month = models.CharField(max_length=7)  # YYYY-MM
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='monthly_spend')
+    category = models.ForeignKey(SupplierCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='monthly_spend', help_text='Supplier category when the month was rolled up')
     total_spent = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
+    order_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'supplier_spend_monthly'
@@ -820,27 +1147,207 @@ class SupplierSpendMonthly(models.Model):
         return f"{self.month} - {self.supplier.name}: {self.total_spent}"
 
 
+class RequestDaily(models.Model):
+    """Branch requests per (created date, branch, status) (maintained by rollups.refresh_daily_facts)"""
+    date = models.DateField()
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='request_daily')
+    status = models.CharField(max_length=20, choices=Request.StatusType.choices)
+    request_count = models.IntegerField(default=0)
+    fulfilled_count = models.IntegerField(default=0, help_text='Completed requests with an approval date')
+    fulfillment_days_total = models.IntegerField(default=0, help_text='Sum of whole days from approval to completion')
+    
+    class Meta:
+        db_table = 'request_daily'
+        unique_together = ['date', 'branch', 'status']
+        ordering = ['-date', 'branch', 'status']
+    
+    def __str__(self):
+        return f"{self.date} - {self.branch.name} - {self.status}: {self.request_count}"
+
+
+class StockMovementDaily(models.Model):
+    """Stock ledger movements per (date, reason) (maintained by rollups.refresh_daily_facts)"""
+    date = models.DateField()
+    reason = models.CharField(max_length=50, choices=StockLedger.ReasonType.choices)
+    movement_count = models.IntegerField(default=0)
+    qty_in = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    qty_out = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # stored positive
+    
+    class Meta:
+        db_table = 'stock_movement_daily'
+        unique_together = ['date', 'reason']
+        ordering = ['-date', 'reason']
+    
+    def __str__(self):
+        return f"{self.date} - {self.reason}: {self.movement_count}"
+
+
+class ConsumptionDailyRollup(models.Model):
+    """Branch consumption per (date, branch, item), all sources and variations (maintained by rollups.refresh_daily_facts)"""
+    date = models.DateField()
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='consumption_rollup')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='consumption_rollup')
+    qty_consumed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    record_count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'consumption_daily_rollup'
+        unique_together = ['date', 'branch', 'item']
+        ordering = ['-date', 'branch', 'item']
+    
+    def __str__(self):
+        return f"{self.date} - {self.branch.name} - {self.item.item_code}: {self.qty_consumed}"
+
+
+class PoDaily(models.Model):
+    """Supplier orders per (created date, supplier, status) (maintained by rollups.refresh_daily_facts)"""
+    date = models.DateField()
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='po_daily')
+    status = models.CharField(max_length=20, choices=SupplierOrder.StatusType.choices)
+    order_count = models.IntegerField(default=0)
+    total_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        db_table = 'po_daily'
+        unique_together = ['date', 'supplier', 'status']
+        ordering = ['-date', 'supplier', 'status']
+    
+    def __str__(self):
+        return f"{self.date} - {self.supplier.name} - {self.status}: {self.order_count}"
+
+
+class SupplierLeadTimeStats(models.Model):
+    """Lead time and on-time delivery per supplier over all receipts (maintained by rollups.refresh_supplier_lead_times)"""
+    supplier = models.OneToOneField(Supplier, on_delete=models.CASCADE, related_name='lead_time_stats')
+    receipt_count = models.IntegerField(default=0)
+    lead_time_p50 = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, help_text='Median lead time in days')
+    lead_time_p90 = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, help_text='90th percentile lead time in days')
+    avg_lead_time_days = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True)
+    rated_count = models.IntegerField(default=0, help_text='Receipts that had an expected delivery date')
+    on_time_count = models.IntegerField(default=0)
+    on_time_rate = models.DecimalField(max_digits=5, decimal_places=1, null=True, blank=True, help_text='On-time receipts as a % of rated receipts')
+    last_received_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'supplier_lead_time_stats'
+        ordering = ['supplier']
+
+    def __str__(self):
+        return f"{self.supplier.name}: p50 {self.lead_time_p50} / p90 {self.lead_time_p90} days"
+
+
+class RollupWatermark(models.Model):
+    """High-water mark (source updated_at) per incremental rollup job"""
+    name = models.CharField(max_length=100, unique=True)
+    high_water = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'rollup_watermarks'
+    
+    def __str__(self):
+        return f"{self.name}: {self.high_water}"
+
+
+class ReportRun(models.Model):
+    """
+    One computation of the reports page for a (date range, role), produced by the
+    compute_reports worker and reused by every viewer of that key until expires_at.
+    """
+    class StatusType(models.TextChoices):
+        PENDING = 'Pending', 'Pending'
+        PROCESSING = 'Processing', 'Processing'
+        COMPLETED = 'Completed', 'Completed'
+        FAILED = 'Failed', 'Failed'
+    
+    cache_key = models.CharField(max_length=255, db_index=True)  # start:end:role
+    start_date = models.DateField()
+    end_date = models.DateField()
+    role = models.CharField(max_length=100, blank=True, default='')
+    status = models.CharField(max_length=20, choices=StatusType.choices, default=StatusType.PENDING)
+    sections_total = models.PositiveIntegerField(default=0)
+    sections_done = models.PositiveIntegerField(default=0)
+    completed_sections = models.JSONField(default=list, blank=True)
+    running_sections = models.JSONField(default=list, blank=True)
+    section_timings = models.JSONField(default=dict, blank=True, help_text='Seconds taken per section')
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error_log = models.TextField(null=True, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_runs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'report_runs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            # Concurrent viewers of the same key share one queued/running computation
+            models.UniqueConstraint(
+                fields=['cache_key'],
+                condition=models.Q(status__in=['Pending', 'Processing']),
+                name='report_runs_one_in_flight_per_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.cache_key} - {self.status}"
+
+
 # ============================================================================
 # H. Excel Import
 # ============================================================================
 
 class ImportJob(models.Model):
-    """Excel import job tracking"""
+    """
+    An uploaded file processed in the background by the process_import_jobs worker
+    (see imports.py). Sales files are deduplicated per branch by content_hash.
+    """
     class StatusType(models.TextChoices):
         PENDING = 'Pending', 'Pending'
         PROCESSING = 'Processing', 'Processing'
         COMPLETED = 'Completed', 'Completed'
         FAILED = 'Failed', 'Failed'
     
+    class KindType(models.TextChoices):
+        PACKAGING_PRODUCTS = 'PackagingProducts', 'Packaging Products'  # Product list for defining packaging rules
+        SALES_DEDUCTION = 'SalesDeduction', 'Sales Deduction'  # Foodics sales file deducted from branch inventory
+    
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='import_jobs')
-    file_url = models.URLField()
+    kind = models.CharField(max_length=30, choices=KindType.choices, default=KindType.PACKAGING_PRODUCTS)
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/%Y/%m/', null=True, blank=True)
+    file_url = models.URLField(blank=True, default='')
+    original_filename = models.CharField(max_length=255, blank=True, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)  # SHA-256 of the file
     status = models.CharField(max_length=20, choices=StatusType.choices, default=StatusType.PENDING)
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
     error_log = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         db_table = 'import_jobs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            # The same sales file is deducted at most once per branch (a failed job may be retried)
+            models.UniqueConstraint(
+                fields=['branch', 'content_hash'],
+                condition=models.Q(kind='SalesDeduction', status__in=['Pending', 'Processing', 'Completed']),
+                name='import_jobs_one_sales_file_per_branch',
+            ),
+        ]
     
     def __str__(self):
         return f"Import Job #{self.id} - {self.status}"
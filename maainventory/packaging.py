@@ -0,0 +1,359 @@
+"""
+Packaging deduction from branch sales files.
+
+Each branch's packaging rules are compiled into an index {normalized product name:
+[(inventory item id, qty per unit), ...]} loaded with one query, cached per branch and
+dropped whenever a rule or rule item is saved or deleted. A sales file is turned into
+a deduction plan in memory against that index, and the plan is applied with one
+UPDATE per table (F() arithmetic) plus a bulk_create for rows that do not exist yet.
+Saving rules diffs the submitted rule matrix against the stored rules and writes only
+the differences in bulk. Products parsed from an upload wait for the define-rules form
+in a BranchPackagingDraft row; the session only carries its id.
+"""
+
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Greatest, Lower, Trim
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .branch_ledger import movement, record_movements
+from .branches_page import invalidate_brand_branches
+from .models import BranchInventory, BranchPackagingDraft, BranchPackagingRule, BranchPackagingRuleItem, Item, ItemConsumptionDaily
+
+
+RULE_INDEX_CACHE_TIMEOUT = 60 * 60
+
+QTY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def normalize_product_name(name):
+    """Key products are matched on: case-insensitive, surrounding/repeated whitespace ignored."""
+    return ' '.join((name or '').split()).casefold()
+
+
+def rule_index_cache_key(branch_id):
+    return f'packaging_rule_index:{branch_id}'
+
+
+# ============================================================================
+# Rule index
+# ============================================================================
+
+def _compile_rule_index(branch_id):
+    index = {}
+    rows = BranchPackagingRuleItem.objects.filter(rule__branch_id=branch_id).values_list(
+        'rule__product_name', 'inventory_item_id', 'quantity_per_unit',
+    ).order_by('rule_id', 'id')
+    for product_name, item_id, qty_per_unit in rows:
+        components = index.setdefault(normalize_product_name(product_name), [])
+        # Legacy rule items without an inventory item still mark the product as configured
+        if item_id is not None:
+            components.append((item_id, qty_per_unit))
+    return index
+
+
+def get_rule_index(branch_id):
+    """{normalized product name: [(inventory item id, qty per unit)]} for one branch (cached)."""
+    key = rule_index_cache_key(branch_id)
+    index = cache.get(key)
+    if index is None:
+        index = _compile_rule_index(branch_id)
+        cache.set(key, index, RULE_INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def invalidate_rule_index(branch_ids):
+    cache.delete_many([rule_index_cache_key(branch_id) for branch_id in set(branch_ids)])
+
+
+def _rule_changed(sender, instance, **kwargs):
+    invalidate_rule_index([instance.branch_id])
+
+
+def _rule_item_changed(sender, instance, **kwargs):
+    branch_id = BranchPackagingRule.objects.filter(id=instance.rule_id).values_list('branch_id', flat=True).first()
+    if branch_id is not None:
+        invalidate_rule_index([branch_id])
+
+
+def connect_signals():
+    """Called from MaainventoryConfig.ready()."""
+    post_save.connect(_rule_changed, sender=BranchPackagingRule, dispatch_uid='packaging_rule_saved')
+    post_delete.connect(_rule_changed, sender=BranchPackagingRule, dispatch_uid='packaging_rule_deleted')
+    post_save.connect(_rule_item_changed, sender=BranchPackagingRuleItem, dispatch_uid='packaging_rule_item_saved')
+    post_delete.connect(_rule_item_changed, sender=BranchPackagingRuleItem, dispatch_uid='packaging_rule_item_deleted')
+
+
+# ============================================================================
+# Deduction
+# ============================================================================
+
+def match_product(index, product):
+    """
+    (qty sold, [(item_id, qty per unit)] or None when the product has no rule) for one
+    parsed sales row against a rule index.
+    """
+    try:
+        product_qty = Decimal(str(product.get('qty', 0) or 0))
+    except (InvalidOperation, TypeError, ValueError):
+        product_qty = Decimal('0')
+    return product_qty, index.get(normalize_product_name(product.get('product_name')))
+
+
+def add_to_plan(plan, product_qty, components):
+    for item_id, qty_per_unit in components:
+        plan[item_id] = plan.get(item_id, Decimal('0')) + product_qty * qty_per_unit
+
+
+def build_deduction_plan(branch_id, products):
+    """
+    products: [{'product_name', 'qty'}] from the sales file.
+    Returns ({item_id: total qty to deduct}, [product names without rules]).
+    """
+    index = get_rule_index(branch_id)
+    plan = {}
+    unmatched = []
+    for product in products:
+        product_qty, components = match_product(index, product)
+        if product_qty <= 0:
+            continue
+        if components is None:
+            unmatched.append((product.get('product_name') or '').strip())
+            continue
+        add_to_plan(plan, product_qty, components)
+    return plan, unmatched
+
+
+def find_shortages(branch, plan):
+    """[(item_id, qty needed, qty available)] for planned items the branch does not have enough of."""
+    available = dict(
+        BranchInventory.objects.filter(branch=branch, item_id__in=plan)
+        .values('item_id').annotate(total=Sum('quantity')).values_list('item_id', 'total')
+    )
+    return [
+        (item_id, qty_needed, available.get(item_id) or Decimal('0'))
+        for item_id, qty_needed in plan.items()
+        if (available.get(item_id) or Decimal('0')) < qty_needed
+    ]
+
+
+def _per_item(plan):
+    """CASE item_id WHEN ... THEN qty END for one UPDATE over all planned items."""
+    return Case(*[When(item_id=item_id, then=Value(qty)) for item_id, qty in plan.items()], output_field=QTY)
+
+
+def apply_deduction(branch, plan, day, source, reason, reference_type=None, reference_id=None, user=None):
+    """
+    Record `plan` ({item_id: qty}) as consumption at `branch` on `day` and take it off the
+    branch's (variation-less) inventory, never below zero. Call inside a transaction.
+    """
+    now = timezone.now()
+
+    consumption = ItemConsumptionDaily.objects.filter(
+        date=day, branch=branch, variation__isnull=True, source=source, item_id__in=plan,
+    )
+    existing = set(consumption.select_for_update().values_list('item_id', flat=True))
+    if existing:
+        consumption.filter(item_id__in=existing).update(
+            qty_consumed=F('qty_consumed') + _per_item({item_id: plan[item_id] for item_id in existing}),
+            updated_at=now,
+        )
+    ItemConsumptionDaily.objects.bulk_create([
+        ItemConsumptionDaily(date=day, branch=branch, item_id=item_id, variation=None, source=source, qty_consumed=qty)
+        for item_id, qty in plan.items() if item_id not in existing
+    ])
+
+    applied = deduct_branch_inventory(branch, plan, reason, reference_type, reference_id, user, now)
+    if applied:
+        consumption.filter(item_id__in=applied).update(
+            qty_deducted=F('qty_deducted') - _per_item(applied),
+        )
+
+
+def deduct_branch_inventory(branch, plan, reason, reference_type=None, reference_id=None, user=None, now=None):
+    """
+    Take `plan` ({item_id: qty}, negative to put stock back) off the branch's variation-less
+    inventory in one UPDATE, never below zero, and record what was actually taken in the
+    branch movement ledger. Call inside a transaction. Returns {item_id: quantity change
+    applied} (negative for stock taken) for the items the branch has an inventory row for.
+    """
+    if not plan:
+        return {}
+    branch_id = getattr(branch, 'pk', branch)
+    rows = BranchInventory.objects.select_for_update().filter(branch_id=branch_id, variation__isnull=True, item_id__in=plan)
+    applied = {}
+    for item_id, quantity in rows.values_list('item_id', 'quantity'):
+        applied[item_id] = applied.get(item_id, Decimal('0')) + max(quantity - plan[item_id], Decimal('0')) - quantity
+    rows.update(
+        quantity=Greatest(F('quantity') - _per_item(plan), Value(Decimal('0'), output_field=QTY)),
+        updated_at=now or timezone.now(),
+    )
+    record_movements([
+        movement(branch_id, item_id, None, qty_change, reason, reference_type, reference_id, user)
+        for item_id, qty_change in applied.items()
+    ])
+    return applied
+
+
+# ============================================================================
+# Saving rules
+# ============================================================================
+
+def _quantity(value):
+    try:
+        qty = Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f'Invalid quantity: {value!r}')
+    if qty <= 0:
+        raise ValueError(f'Quantity must be greater than 0: {value!r}')
+    return qty
+
+
+def parse_rule_matrix(rules, allowed_item_ids):
+    """
+    Validate the JSON rule matrix [{'product_name', 'items': [{'item_id', 'qty'}]}] and
+    return {product_name: {item_id: qty}}. Raises ValueError.
+    """
+    if not isinstance(rules, list):
+        raise ValueError('rules must be a list')
+    matrix = {}
+    for rule in rules:
+        product_name = (rule.get('product_name') or '').strip() if isinstance(rule, dict) else ''
+        if not product_name:
+            raise ValueError('Every rule needs a product_name')
+        if product_name in matrix:
+            raise ValueError(f'Duplicate product: {product_name}')
+        components = {}
+        for component in rule.get('items') or []:
+            try:
+                item_id = int(component['item_id'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f'Invalid item for {product_name}')
+            if item_id not in allowed_item_ids:
+                raise ValueError(f'Item {item_id} is not available at this branch')
+            components[item_id] = _quantity(component.get('qty', 1))
+        matrix[product_name] = components
+    return matrix
+
+
+def _linked_item_ids(product_names):
+    """{lowercased product name: id of the active item with that name}."""
+    lowered = {name.lower() for name in product_names}
+    return dict(
+        Item.objects.filter(is_active=True).annotate(lower_name=Lower(Trim('name')))
+        .filter(lower_name__in=lowered).values_list('lower_name', 'id')
+    )
+
+
+def save_rule_matrix(branch, matrix):
+    """
+    Make the branch's rules for the products in `matrix` ({product_name: {item_id: qty}})
+    match it, diffing against what is stored: new rules and rule items are bulk-created,
+    changed quantities and item links bulk-updated, and stale rule items (including
+    legacy packaging-item ones) removed with a single delete. Products not in `matrix`
+    are left alone. Returns counts of what changed and the elapsed milliseconds.
+    """
+    began = time.monotonic()
+    names = list(matrix)
+    linked = _linked_item_ids(names)
+    now = timezone.now()
+
+    with transaction.atomic():
+        rules = {
+            rule.product_name: rule
+            for rule in BranchPackagingRule.objects.filter(branch=branch, product_name__in=names).only('id', 'product_name', 'item_id')
+        }
+        stored = {}
+        for rule_item_id, rule_id, inventory_item_id, qty in BranchPackagingRuleItem.objects.filter(
+            rule_id__in=[rule.id for rule in rules.values()],
+        ).values_list('id', 'rule_id', 'inventory_item_id', 'quantity_per_unit').order_by('id'):
+            stored.setdefault(rule_id, {}).setdefault(inventory_item_id, []).append((rule_item_id, qty))
+
+        new_rules = BranchPackagingRule.objects.bulk_create([
+            BranchPackagingRule(branch=branch, product_name=name, item_id=linked.get(name.lower()))
+            for name in names if name not in rules
+        ])
+        rules.update((rule.product_name, rule) for rule in new_rules)
+        new_rule_ids = {rule.id for rule in new_rules}
+
+        to_create, to_update, to_delete, touched_rules = [], [], [], []
+        for name, components in matrix.items():
+            rule = rules[name]
+            current = stored.get(rule.id, {})
+            changed = False
+            for inventory_item_id, qty in components.items():
+                existing = current.pop(inventory_item_id, [])
+                if not existing:
+                    to_create.append(BranchPackagingRuleItem(rule_id=rule.id, inventory_item_id=inventory_item_id, quantity_per_unit=qty))
+                    changed = True
+                    continue
+                (rule_item_id, stored_qty), duplicates = existing[0], existing[1:]
+                if stored_qty != qty:
+                    to_update.append(BranchPackagingRuleItem(id=rule_item_id, quantity_per_unit=qty))
+                    changed = True
+                if duplicates:
+                    to_delete.extend(rule_item_id for rule_item_id, _ in duplicates)
+                    changed = True
+            for leftovers in current.values():
+                to_delete.extend(rule_item_id for rule_item_id, _ in leftovers)
+                changed = True
+
+            item_id = linked.get(name.lower())
+            if rule.id not in new_rule_ids and (changed or rule.item_id != item_id):
+                rule.item_id = item_id
+                rule.updated_at = now
+                touched_rules.append(rule)
+
+        BranchPackagingRuleItem.objects.bulk_create(to_create)
+        BranchPackagingRuleItem.objects.bulk_update(to_update, ['quantity_per_unit'])
+        if to_delete:
+            BranchPackagingRuleItem.objects.filter(id__in=to_delete).delete()
+        BranchPackagingRule.objects.bulk_update(touched_rules, ['item', 'updated_at'])
+
+    # Bulk writes skip the model signals that normally drop these caches
+    invalidate_rule_index([branch.id])
+    if new_rules:
+        invalidate_brand_branches([branch.brand_id])
+
+    return {
+        'rules_created': len(new_rules),
+        'rules_updated': len(touched_rules),
+        'rules_unchanged': len(names) - len(new_rules) - len(touched_rules),
+        'items_created': len(to_create),
+        'items_updated': len(to_update),
+        'items_deleted': len(to_delete),
+        'elapsed_ms': round((time.monotonic() - began) * 1000, 1),
+    }
+
+
+# ============================================================================
+# Define-rules drafts
+# ============================================================================
+
+def create_draft(branch_id, user, products):
+    return BranchPackagingDraft.objects.create(
+        branch_id=branch_id,
+        created_by=user,
+        products=products,
+        expires_at=timezone.now() + timedelta(seconds=settings.PACKAGING_DRAFT_TTL_SECONDS),
+    )
+
+
+def get_draft(draft_id, branch_id, user):
+    """The user's unexpired draft for this branch, or None."""
+    return BranchPackagingDraft.objects.filter(
+        id=draft_id, branch_id=branch_id, created_by=user, expires_at__gt=timezone.now(),
+    ).first()
+
+
+def prune_expired_drafts():
+    """Delete drafts past their expiry. Returns the number deleted."""
+    deleted, _ = BranchPackagingDraft.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,191 @@
+"""
+Nightly par-level draft requests.
+
+A branch's par for an item is its average daily consumption over the last
+PAR_LEVEL_LOOKBACK_DAYS (ItemConsumptionDaily, today excluded) times
+PAR_LEVEL_COVER_DAYS. The computation covers all branches at once with three grouped
+queries (consumption per branch/item/variation, BranchInventory, and quantities
+already on order in open requests) folded together in dicts, so its cost grows with
+the number of branch/item pairs rather than with queries per branch.
+
+Where on hand plus on order is below par, the shortfall (rounded up to whole units, and
+to at least the item's min_order_qty) goes on one Draft request per branch, created
+with bulk_create and raised in the name of the branch's first assigned user. Each run
+replaces the previous night's drafts; codes come from RequestCodeCounter (shared with
+create_stock_request), so the discarded drafts' codes are not issued again. Branch
+managers review the draft, adjust quantities and submit it (it becomes Pending) or
+discard it.
+"""
+
+import time
+from datetime import datetime, timedelta
+from decimal import ROUND_CEILING, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    BranchInventory, BranchUser, Item, ItemConsumptionDaily, Request, RequestCodeCounter, RequestItem, RequestStatusHistory,
+)
+
+
+ZERO = Decimal('0')
+
+# Requests whose items are still on their way to the branch
+OPEN_STATUSES = (
+    Request.StatusType.PENDING,
+    Request.StatusType.APPROVED,
+    Request.StatusType.WAREHOUSE_PROCESSING,
+    Request.StatusType.READY_FOR_DELIVERY,
+    Request.StatusType.IN_PROCESS,
+    Request.StatusType.OUT_FOR_DELIVERY,
+)
+
+
+# ============================================================================
+# Par levels
+# ============================================================================
+
+def _grouped(queryset, total, branch='branch_id'):
+    """{(branch_id, item_id, variation_id): total} in one GROUP BY query."""
+    return {
+        (branch_id, item_id, variation_id): qty or ZERO
+        for branch_id, item_id, variation_id, qty in queryset.order_by()
+        .values(branch, 'item_id', 'variation_id').annotate(total=total)
+        .values_list(branch, 'item_id', 'variation_id', 'total')
+    }
+
+
+def compute_shortfalls(today=None):
+    """
+    {branch_id: [(item_id, variation_id, qty to order)]} for active branches and items
+    whose on-hand plus on-order quantity is below par.
+    """
+    today = today or timezone.localdate()
+    lookback = settings.PAR_LEVEL_LOOKBACK_DAYS
+    cover = Decimal(settings.PAR_LEVEL_COVER_DAYS) / lookback
+
+    consumed = _grouped(
+        ItemConsumptionDaily.objects.filter(
+            date__gte=today - timedelta(days=lookback), date__lt=today,
+            branch__is_active=True, item__is_active=True,
+        ),
+        Sum('qty_consumed'),
+    )
+    if not consumed:
+        return {}
+    branch_ids = {branch_id for branch_id, _, _ in consumed}
+    item_ids = {item_id for _, item_id, _ in consumed}
+
+    on_hand = _grouped(
+        BranchInventory.objects.filter(branch_id__in=branch_ids, item_id__in=item_ids),
+        Sum('quantity'),
+    )
+    on_order = _grouped(
+        RequestItem.objects.filter(
+            request__status__in=OPEN_STATUSES, request__branch_id__in=branch_ids, item_id__in=item_ids,
+        ),
+        Sum(Coalesce('qty_approved', 'qty_requested')),
+        branch='request__branch_id',
+    )
+    min_order = dict(Item.objects.filter(id__in=item_ids).values_list('id', 'min_order_qty'))
+
+    shortfalls = {}
+    for key, total in consumed.items():
+        need = total * cover - on_hand.get(key, ZERO) - on_order.get(key, ZERO)
+        if need <= 0:
+            continue
+        branch_id, item_id, variation_id = key
+        qty = max(need.to_integral_value(rounding=ROUND_CEILING), min_order.get(item_id) or ZERO)
+        shortfalls.setdefault(branch_id, []).append((item_id, variation_id, qty))
+    return shortfalls
+
+
+# ============================================================================
+# Draft requests
+# ============================================================================
+
+def generate_draft_requests(today=None):
+    """
+    Replace every branch's par-level draft with a fresh one. Returns a summary dict;
+    branches below par with no assigned user are counted in 'skipped_branches'.
+    """
+    began = time.monotonic()
+    shortfalls = compute_shortfalls(today)
+
+    requesters = {}
+    for branch_id, user_id in BranchUser.objects.filter(
+        branch_id__in=shortfalls, user__is_active=True,
+    ).order_by('branch_id', 'created_at', 'id').values_list('branch_id', 'user_id'):
+        requesters.setdefault(branch_id, user_id)
+    branch_ids = sorted(branch_id for branch_id in shortfalls if branch_id in requesters)
+
+    now = timezone.now()
+    with transaction.atomic():
+        codes = RequestCodeCounter.objects.allocate(datetime.now().year, len(branch_ids)) if branch_ids else []
+        _, deleted = Request.objects.filter(status=Request.StatusType.DRAFT).delete()
+        drafts = Request.objects.bulk_create([
+            Request(
+                request_code=code,
+                branch_id=branch_id,
+                requested_by_id=requesters[branch_id],
+                status=Request.StatusType.DRAFT,
+                date_of_order=now,
+                notes='Suggested from recent consumption (par level). Review the quantities and submit.',
+            )
+            for branch_id, code in zip(branch_ids, codes)
+        ])
+        lines = RequestItem.objects.bulk_create([
+            RequestItem(request=draft, item_id=item_id, variation_id=variation_id, qty_requested=qty)
+            for draft in drafts
+            for item_id, variation_id, qty in shortfalls[draft.branch_id]
+        ], batch_size=1000)
+
+    return {
+        'drafts': len(drafts),
+        'lines': len(lines),
+        'skipped_branches': len(shortfalls) - len(branch_ids),
+        'replaced': deleted.get(Request._meta.label, 0),
+        'seconds': round(time.monotonic() - began, 2),
+    }
+
+
+def submit_draft(req, user, quantities=None):
+    """
+    Send a Draft request to procurement as Pending. `quantities` ({request item id: qty})
+    overrides the suggested quantities; lines set to 0 are dropped. Raises ValueError.
+    """
+    with transaction.atomic():
+        req = Request.objects.select_for_update().get(pk=req.pk)
+        if req.status != Request.StatusType.DRAFT:
+            raise ValueError('Only draft requests can be submitted.')
+
+        lines = list(req.items.all())
+        if quantities:
+            unknown = set(quantities) - {line.id for line in lines}
+            if unknown:
+                raise ValueError('Unknown request item.')
+            for line in lines:
+                if line.id in quantities:
+                    line.qty_requested = quantities[line.id]
+            RequestItem.objects.filter(id__in=[line.id for line in lines if line.qty_requested <= 0]).delete()
+            lines = [line for line in lines if line.qty_requested > 0]
+            RequestItem.objects.bulk_update(lines, ['qty_requested'])
+        if not lines:
+            raise ValueError('Add at least one item with quantity greater than 0.')
+
+        req.status = Request.StatusType.PENDING
+        req.requested_by = user
+        req.date_of_order = timezone.now()
+        req.save()
+        RequestStatusHistory.objects.create(
+            request=req,
+            old_status=Request.StatusType.DRAFT,
+            new_status=req.status,
+            changed_by=user,
+            notes='Submitted from the par-level draft.',
+        )
+    return req
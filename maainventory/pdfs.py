@@ -0,0 +1,94 @@
+"""
+PDF layouts for PO invoices and delivery bills.
+
+These functions run inside the render worker's process pool, so they take plain
+dict payloads (built by documents.py) and return PDF bytes. Keep Django imports out
+of this module: pool processes only import what they need to draw.
+"""
+
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+
+LINE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f3f4f6')),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#d1d5db')),
+    ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+])
+
+
+def _build_pdf(title, header_rows, lines, total, footer=None):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, title=title,
+        leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+    )
+    styles = getSampleStyleSheet()
+
+    story = [Paragraph('MAA Inventory', styles['Title']), Paragraph(title, styles['Heading2'])]
+    header = Table([[label, value] for label, value in header_rows], colWidths=[40 * mm, None], hAlign='LEFT')
+    header.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ]))
+    story += [header, Spacer(1, 6 * mm)]
+
+    rows = [['Code', 'Item', 'Unit', 'Qty', 'Unit Price', 'Total']]
+    rows += [[l['code'], Paragraph(escape(l['name']), styles['BodyText']), l['unit'], l['qty'], l['price'], l['total']] for l in lines]
+    rows.append(['', '', '', '', 'Total', total])
+    table = Table(rows, colWidths=[25 * mm, None, 18 * mm, 20 * mm, 25 * mm, 28 * mm], repeatRows=1)
+    table.setStyle(LINE_TABLE_STYLE)
+    story.append(table)
+
+    if footer:
+        story += [Spacer(1, 8 * mm)] + footer(styles)
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def render_invoice_pdf(payload):
+    """PO invoice PDF (includes the supplier signature once signed)."""
+    header_rows = [
+        ('PO Number', payload['po_code']),
+        ('Supplier', payload['supplier_name']),
+        ('Supplier Email', payload['supplier_email'] or '-'),
+        ('Order Date', payload['order_date']),
+        ('Delivery Date', payload['requested_delivery_date'] or '-'),
+        ('Status', payload['status']),
+    ]
+
+    def signature_footer(styles):
+        signature = payload.get('signature')
+        if not signature:
+            return [Paragraph('Not signed yet.', styles['Italic'])]
+        parts = [Paragraph(escape(f"Signed by {signature['name']} on {signature['signed_at']}"), styles['BodyText'])]
+        if signature.get('image'):
+            image = Image(BytesIO(signature['image']))
+            image._restrictSize(60 * mm, 25 * mm)
+            image.hAlign = 'LEFT'
+            parts.append(image)
+        return parts
+
+    return _build_pdf(f"Purchase Order {payload['po_code']}", header_rows, payload['lines'], payload['total'], signature_footer)
+
+
+def render_bill_pdf(payload):
+    """Delivery bill PDF for a branch request going out for delivery."""
+    header_rows = [
+        ('Request', payload['request_code']),
+        ('Branch', payload['branch_name']),
+        ('Order Date', payload['order_date']),
+        ('Status', payload['status']),
+    ]
+    return _build_pdf(f"Delivery Bill {payload['request_code']}", header_rows, payload['lines'], payload['total'])
@@ -0,0 +1,152 @@
+"""
+Supplier price history.
+
+Price trends are computed in the database with window functions over
+SupplierPriceDiscussion partitioned by supplier item (ordered by discussed_date, id),
+keeping one row per partition: every supplier item's first/last/min/max price and
+discussion count come back from a single query instead of one query (or several) per
+item. price_series() does the same per (supplier item, period), and price_as_of()
+answers "what did this cost on date X", both served by the (supplier_item,
+discussed_date) index.
+"""
+
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import Coalesce, FirstValue, LastValue, RowNumber, TruncDay, TruncMonth, TruncWeek
+
+from .models import SupplierItem, SupplierPriceDiscussion
+
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+_CHRONOLOGICAL = [F('discussed_date').asc(), F('id').asc()]
+_NEWEST_FIRST = [F('discussed_date').desc(), F('id').desc()]
+
+# Frame spanning the whole partition, so LastValue sees the last row rather than the current one
+_WHOLE_PARTITION = RowRange(start=None, end=None)
+
+
+def _one_row_per(discussions, partition, **windows):
+    """
+    `discussions` annotated with `windows` (expressions evaluated over `partition`),
+    narrowed to the newest row of each partition.
+    """
+    annotations = {
+        name: Window(expression, partition_by=partition, order_by=_CHRONOLOGICAL, frame=_WHOLE_PARTITION)
+        for name, expression in windows.items()
+    }
+    return discussions.order_by().annotate(
+        **annotations,
+        recency=Window(RowNumber(), partition_by=partition, order_by=_NEWEST_FIRST),
+    ).filter(recency=1)
+
+
+def _percent_change(first, last):
+    return ((last - first) / first) * 100 if first > 0 else 0
+
+
+# ============================================================================
+# Trends
+# ============================================================================
+
+def price_trends(discussions):
+    """
+    Price trend of every supplier item in `discussions`, most recently discussed first:
+    current, first, latest, min and max price, change and change %, discussion count
+    and the date of the latest discussion. One query.
+    """
+    partition = [F('supplier_item_id')]
+    rows = _one_row_per(
+        discussions,
+        partition,
+        first_price=FirstValue('discussed_price'),
+        last_price=LastValue('discussed_price'),
+        min_price=Min('discussed_price'),
+        max_price=Max('discussed_price'),
+        discussion_count=Count('id'),
+    ).values(
+        'supplier_item_id', 'discussed_date', 'first_price', 'last_price', 'min_price', 'max_price', 'discussion_count',
+        'supplier_item__supplier__name', 'supplier_item__item__item_code', 'supplier_item__item__name',
+        'supplier_item__variation__variation_name', 'supplier_item__price_per_unit',
+    ).order_by('-discussed_date', 'supplier_item_id')
+
+    trends = []
+    for row in rows:
+        first_price = float(row['first_price'])
+        last_price = float(row['last_price'])
+        trends.append({
+            'supplier_item_id': row['supplier_item_id'],
+            'supplier_name': row['supplier_item__supplier__name'],
+            'item_code': row['supplier_item__item__item_code'],
+            'item_name': row['supplier_item__item__name'],
+            'variation': row['supplier_item__variation__variation_name'],
+            'current_price': float(row['supplier_item__price_per_unit']),
+            'first_price': first_price,
+            'latest_discussed_price': last_price,
+            'min_price': float(row['min_price']),
+            'max_price': float(row['max_price']),
+            'price_change': last_price - first_price,
+            'price_change_percent': _percent_change(first_price, last_price),
+            'discussion_count': row['discussion_count'],
+            'latest_discussion_date': row['discussed_date'].date(),
+        })
+    return trends
+
+
+def price_series(discussions, period='month', supplier_item_ids=None):
+    """
+    {supplier_item_id: [{'date', 'price', 'min_price', 'max_price', 'discussion_count'}]}:
+    per `period` ('day', 'week' or 'month', in local time) the closing price of each
+    supplier item and its range within the period, oldest period first. One query.
+    """
+    if supplier_item_ids is not None:
+        discussions = discussions.filter(supplier_item_id__in=supplier_item_ids)
+    partition = [F('supplier_item_id'), F('period')]
+    rows = _one_row_per(
+        discussions.annotate(period=PERIODS[period]('discussed_date')),
+        partition,
+        close_price=LastValue('discussed_price'),
+        min_price=Min('discussed_price'),
+        max_price=Max('discussed_price'),
+        discussion_count=Count('id'),
+    ).values(
+        'supplier_item_id', 'period', 'close_price', 'min_price', 'max_price', 'discussion_count',
+    ).order_by('supplier_item_id', 'period')
+
+    series = {}
+    for row in rows:
+        series.setdefault(row['supplier_item_id'], []).append({
+            'date': row['period'].date().isoformat(),
+            'price': float(row['close_price']),
+            'min_price': float(row['min_price']),
+            'max_price': float(row['max_price']),
+            'discussion_count': row['discussion_count'],
+        })
+    return series
+
+
+# ============================================================================
+# As-of lookup
+# ============================================================================
+
+def price_as_of(at, supplier_item_ids=None):
+    """
+    {supplier_item_id: price} as of the datetime `at`: the price agreed in the latest
+    discussion on or before `at`; failing that, the old_price recorded by the first
+    discussion after it; failing that, the current price_per_unit.
+    """
+    discussions = SupplierPriceDiscussion.objects.filter(supplier_item=OuterRef('pk'))
+    agreed = discussions.filter(discussed_date__lte=at).order_by(*_NEWEST_FIRST).values('discussed_price')[:1]
+    superseded = discussions.filter(discussed_date__gt=at).order_by(*_CHRONOLOGICAL).values('old_price')[:1]
+
+    supplier_items = SupplierItem.objects.all()
+    if supplier_item_ids is not None:
+        supplier_items = supplier_items.filter(id__in=supplier_item_ids)
+    prices = supplier_items.annotate(
+        price_then=Coalesce(Subquery(agreed), Subquery(superseded), F('price_per_unit')),
+    ).values_list('id', 'price_then')
+    return dict(prices)
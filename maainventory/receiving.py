@@ -0,0 +1,257 @@
+"""
+Goods receipt for purchase orders.
+
+Receives one or many POs in a single transaction: quantities per PO line are
+applied to the warehouse StockBalance rows in bulk, ledger rows are written with
+bulk_create, and each order is moved to PartiallyReceived or Received depending
+on what is still outstanding. Every line received also gets a SupplierOrderReceipt
+recording the lead time and whether it arrived when expected; those feed the
+per-supplier SupplierLeadTimeStats rollup.
+"""
+
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    InventoryLocation, Item, StockBalance, StockLedger, SupplierItem, SupplierOrder, SupplierOrderItem, SupplierOrderReceipt,
+)
+
+
+# Orders in these statuses cannot receive goods
+NON_RECEIVABLE_STATUSES = (
+    SupplierOrder.StatusType.RECEIVED,
+    SupplierOrder.StatusType.CANCELLED,
+)
+
+
+def get_warehouse_location():
+    """Main warehouse location that receipts are booked into (created on first use)."""
+    warehouse_location, _ = InventoryLocation.objects.get_or_create(
+        type=InventoryLocation.LocationType.WAREHOUSE,
+        defaults={'name': 'Main Warehouse'}
+    )
+    return warehouse_location
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f'Invalid quantity: {value!r}')
+
+
+def _supplier_lead_times(received_lines, orders):
+    """{(supplier_id, item_id, variation_id): lead_time_days} for the supplier items of the received lines."""
+    supplier_ids = {orders[oi.supplier_order_id].supplier_id for oi, _ in received_lines}
+    item_ids = {oi.item_id for oi, _ in received_lines}
+    rows = SupplierItem.objects.filter(supplier_id__in=supplier_ids, item_id__in=item_ids).values_list(
+        'supplier_id', 'item_id', 'variation_id', 'lead_time_days',
+    )
+    return {(supplier_id, item_id, variation_id): days for supplier_id, item_id, variation_id, days in rows}
+
+
+def _build_receipt(order, order_item, qty, lead_time_days, user, received_at):
+    """
+    SupplierOrderReceipt for `qty` of `order_item` received at `received_at`.
+    lead_time_days is the supplier item's quoted lead time (0/None = not quoted).
+    """
+    ordered_at = order.email_sent_at or order.created_at
+    ordered_date = timezone.localtime(ordered_at).date()
+    received_date = timezone.localtime(received_at).date()
+    expected_lead_time = lead_time_days or None
+    expected_date = order_item.expected_delivery_date or order.requested_delivery_date
+    if expected_date is None and expected_lead_time:
+        expected_date = ordered_date + timedelta(days=expected_lead_time)
+    return SupplierOrderReceipt(
+        order_item=order_item,
+        supplier_order=order,
+        supplier_id=order.supplier_id,
+        qty_received=qty,
+        received_at=received_at,
+        received_by=user,
+        ordered_at=ordered_at,
+        lead_time_days=(received_date - ordered_date).days,
+        expected_lead_time_days=expected_lead_time,
+        expected_delivery_date=expected_date,
+        on_time=(received_date <= expected_date) if expected_date else None,
+    )
+
+
+def receive_orders(receipts, user, note=''):
+    """
+    Receive goods against one or many purchase orders.
+
+    receipts: {order_id: lines} where lines is either None (receive everything still
+    outstanding on the order) or {order_item_id: qty_received_now}. Lines that are not
+    listed are left untouched. Quantities are capped at what is still outstanding.
+
+    Returns a summary dict: {'orders': [{'id', 'po_code', 'status', 'lines_received'}],
+    'lines_received': int, 'qty_received': Decimal}.
+    Raises ValueError for unknown orders/lines, negative quantities or orders that
+    are already received or cancelled.
+    """
+    receipts = {int(order_id): lines for order_id, lines in receipts.items()}
+    if not receipts:
+        raise ValueError('No purchase orders to receive')
+
+    warehouse_location = get_warehouse_location()
+    now = timezone.now()
+
+    with transaction.atomic():
+        orders = {
+            order.id: order
+            for order in SupplierOrder.objects.select_for_update().select_related('supplier').filter(id__in=receipts.keys())
+        }
+        missing = set(receipts) - set(orders)
+        if missing:
+            raise ValueError(f'Purchase order(s) not found: {", ".join(str(m) for m in sorted(missing))}')
+        for order in orders.values():
+            if order.status in NON_RECEIVABLE_STATUSES:
+                raise ValueError(f'Purchase order {order.po_code} is {order.get_status_display().lower()} and cannot be received')
+
+        order_items = list(
+            SupplierOrderItem.objects.select_for_update().filter(supplier_order_id__in=orders.keys()).order_by('id')
+        )
+        items_by_order = {}
+        for order_item in order_items:
+            items_by_order.setdefault(order_item.supplier_order_id, []).append(order_item)
+
+        # Work out how much to receive on each line
+        received_lines = []  # (order_item, qty)
+        for order_id, lines in receipts.items():
+            order_lines = {oi.id: oi for oi in items_by_order.get(order_id, [])}
+            if lines is None:
+                requested = {oi_id: None for oi_id in order_lines}
+            else:
+                requested = {int(oi_id): qty for oi_id, qty in lines.items()}
+                unknown = set(requested) - set(order_lines)
+                if unknown:
+                    raise ValueError(f'Line(s) {", ".join(str(u) for u in sorted(unknown))} do not belong to {orders[order_id].po_code}')
+
+            for oi_id, qty in requested.items():
+                order_item = order_lines[oi_id]
+                outstanding = order_item.qty_ordered - order_item.qty_received
+                if qty is None:
+                    qty = outstanding
+                else:
+                    qty = _to_decimal(qty)
+                    if qty < 0:
+                        raise ValueError(f'Received quantity cannot be negative (line {oi_id})')
+                    qty = min(qty, outstanding)
+                if qty <= 0:
+                    continue
+                order_item.qty_received += qty
+                received_lines.append((order_item, qty))
+
+        # Upsert warehouse balances: lock existing rows, update in bulk, create the rest
+        qty_by_key = {}
+        for order_item, qty in received_lines:
+            key = (order_item.item_id, order_item.variation_id)
+            qty_by_key[key] = qty_by_key.get(key, Decimal('0')) + qty
+
+        if qty_by_key:
+            # Lock the items first: a missing balance has no row to lock, and the unique
+            # (item, variation, location) key does not stop duplicates when variation is NULL
+            item_ids = {item_id for item_id, _ in qty_by_key}
+            list(Item.objects.select_for_update().filter(id__in=item_ids).order_by('id').values_list('id', flat=True))
+            balances = {
+                (b.item_id, b.variation_id): b
+                for b in StockBalance.objects.select_for_update().filter(
+                    location=warehouse_location,
+                    item_id__in=item_ids,
+                )
+            }
+            to_update = []
+            to_create = []
+            for (item_id, variation_id), qty in qty_by_key.items():
+                balance = balances.get((item_id, variation_id))
+                if balance:
+                    balance.qty_on_hand += qty
+                    balance.updated_at = now
+                    to_update.append(balance)
+                else:
+                    to_create.append(StockBalance(
+                        item_id=item_id,
+                        variation_id=variation_id,
+                        location=warehouse_location,
+                        qty_on_hand=qty,
+                    ))
+            if to_update:
+                StockBalance.objects.bulk_update(to_update, ['qty_on_hand', 'updated_at'])
+            if to_create:
+                StockBalance.objects.bulk_create(to_create)
+
+        # Audit trail: one ledger row per received line
+        ledger_rows = []
+        for order_item, qty in received_lines:
+            order = orders[order_item.supplier_order_id]
+            ledger_notes = f'Received from PO {order.po_code} - Supplier: {order.supplier.name}'
+            if note:
+                ledger_notes += f'\nWarehouse Note: {note}'
+            ledger_rows.append(StockLedger(
+                item_id=order_item.item_id,
+                variation_id=order_item.variation_id,
+                to_location=warehouse_location,
+                qty_change=qty,
+                reason=StockLedger.ReasonType.DELIVERY_RECEIVED,
+                reference_type=StockLedger.ReferenceType.SUPPLIER_ORDER,
+                reference_id=str(order.id),
+                notes=ledger_notes,
+                created_by=user,
+            ))
+        if ledger_rows:
+            StockLedger.objects.bulk_create(ledger_rows)
+            SupplierOrderItem.objects.bulk_update([oi for oi, _ in received_lines], ['qty_received'])
+
+        # Receipt events for lead time / on-time metrics
+        if received_lines:
+            lead_times = _supplier_lead_times(received_lines, orders)
+            receipt_rows = []
+            for order_item, qty in received_lines:
+                order = orders[order_item.supplier_order_id]
+                lead_time_days = lead_times.get(
+                    (order.supplier_id, order_item.item_id, order_item.variation_id),
+                    lead_times.get((order.supplier_id, order_item.item_id, None)),
+                )
+                receipt_rows.append(_build_receipt(order, order_item, qty, lead_time_days, user, now))
+            SupplierOrderReceipt.objects.bulk_create(receipt_rows)
+
+        # Order status from what is still outstanding
+        lines_received_by_order = {}
+        for order_item, _ in received_lines:
+            lines_received_by_order[order_item.supplier_order_id] = lines_received_by_order.get(order_item.supplier_order_id, 0) + 1
+
+        changed_orders = []
+        summary_orders = []
+        for order_id, order in orders.items():
+            lines = items_by_order.get(order_id, [])
+            fully_received = all(oi.qty_received >= oi.qty_ordered for oi in lines)
+            any_received = any(oi.qty_received > 0 for oi in lines)
+            if fully_received:
+                new_status = SupplierOrder.StatusType.RECEIVED
+            elif any_received:
+                new_status = SupplierOrder.StatusType.PARTIALLY_RECEIVED
+            else:
+                new_status = order.status
+            # Any receipt bumps updated_at so cached invoice snapshots are retired
+            if new_status != order.status or lines_received_by_order.get(order_id):
+                order.status = new_status
+                order.updated_at = now
+                changed_orders.append(order)
+            summary_orders.append({
+                'id': order.id,
+                'po_code': order.po_code,
+                'status': order.status,
+                'lines_received': lines_received_by_order.get(order_id, 0),
+            })
+        if changed_orders:
+            SupplierOrder.objects.bulk_update(changed_orders, ['status', 'updated_at'])
+
+    return {
+        'orders': summary_orders,
+        'lines_received': len(received_lines),
+        'qty_received': sum((qty for _, qty in received_lines), Decimal('0')),
+    }
@@ -0,0 +1,263 @@
+"""
+CSV / XLSX export of the reports page sections.
+
+Each export is a header row plus a generator of rows for (start_date, end_date). Tables
+the page truncates (stock movements, low stock, requested items, price discussions)
+are exported in full: they are read with values_list().iterator(), which uses a
+server-side cursor on PostgreSQL, and written out row by row. CSV is streamed straight
+to the client; XLSX goes through openpyxl's write-only workbook into a temporary file,
+so memory stays flat however many rows there are.
+"""
+
+import csv
+import tempfile
+
+from django.db.models import Count, F, Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from .models import (
+    ConsumptionDailyRollup, InventoryLocation, RequestItem, StockBalance, StockLedger, SupplierPriceDiscussion,
+)
+from .price_history import price_trends
+from .reporting import SECTIONS, created_between
+
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+# CSV rows joined into one chunk of the streamed response
+CSV_ROWS_PER_CHUNK = 500
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _local(dt):
+    return timezone.localtime(dt).strftime('%Y-%m-%d %H:%M') if dt else ''
+
+
+def _section(name, start_date, end_date):
+    return SECTIONS[name](start_date, end_date)
+
+
+def _grouped(*groups):
+    """Rows of (group, name, value) for several {name: value} breakdowns."""
+    for group, values in groups:
+        for name, value in values.items():
+            yield group, name, value
+
+
+# ============================================================================
+# Sections
+# ============================================================================
+
+def supplier_spending_rows(start_date, end_date):
+    for row in _section('supplier_spending', start_date, end_date)['supplier_spending']:
+        yield row['supplier_name'], row['category'], row['total_spent'], row['order_count'], row['avg_order_value']
+
+
+def po_summary_rows(start_date, end_date):
+    summary = _section('po_summary', start_date, end_date)['po_summary']
+    yield from _grouped(
+        ('Total', {'Orders': summary['total_orders'], 'Value': summary['total_value'], 'Average order value': summary['avg_order_value']}),
+        ('Orders by status', summary['by_status']),
+    )
+
+
+def stock_levels_rows(start_date, end_date):
+    for row in _section('stock_levels', start_date, end_date)['stock_levels']:
+        yield row['location_name'], row['total_items'], row['low_stock_count'], row['total_value']
+
+
+def low_stock_items_rows(start_date, end_date):
+    balances = StockBalance.objects.filter(
+        item__is_active=True,
+        location__type=InventoryLocation.LocationType.WAREHOUSE,
+        qty_on_hand__lt=F('item__min_stock_qty'),
+    ).order_by('id').values_list(
+        'item__item_code', 'item__name', 'variation__variation_name', 'location__name',
+        'qty_on_hand', 'item__min_stock_qty', 'item__base_unit',
+    )
+    for code, name, variation, location, on_hand, min_stock, unit in balances.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield code, name, variation or '', location, on_hand, min_stock, min_stock - on_hand, unit
+
+
+def stock_movements_rows(start_date, end_date):
+    reasons = dict(StockLedger.ReasonType.choices)
+    ledger = StockLedger.objects.filter(created_between(start_date, end_date)).order_by('-created_at', '-id').values_list(
+        'created_at', 'item__item_code', 'item__name', 'variation__variation_name',
+        'from_location__name', 'to_location__name', 'qty_change', 'reason',
+        'reference_type', 'reference_id', 'created_by__username', 'notes',
+    )
+    for created_at, code, name, variation, from_location, to_location, qty, reason, ref_type, ref_id, user, notes in ledger.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (
+            _local(created_at), code, name, variation or '', from_location or '', to_location or '', qty,
+            reasons.get(reason, reason), ref_type or '', ref_id or '', user or '', notes or '',
+        )
+
+
+def request_summary_rows(start_date, end_date):
+    summary = _section('request_summary', start_date, end_date)['request_summary']
+    yield from _grouped(
+        ('Total', {
+            'Requests': summary['total_requests'],
+            'Average fulfillment days': summary['avg_fulfillment_days'],
+            'Approval rate %': summary['approval_rate'],
+        }),
+        ('Requests by status', summary['by_status']),
+        ('Requests by branch', summary['by_branch']),
+    )
+
+
+def requested_items_rows(start_date, end_date):
+    rows = RequestItem.objects.filter(
+        created_between(start_date, end_date, 'request__created_at')
+    ).values('item__item_code', 'item__name').annotate(
+        total_requested=Sum('qty_requested'),
+        request_count=Count('request', distinct=True),
+    ).order_by('-total_requested', 'item__item_code').values_list(
+        'item__item_code', 'item__name', 'total_requested', 'request_count',
+    )
+    yield from rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def po_status_report_rows(start_date, end_date):
+    report = _section('po_status_report', start_date, end_date)['po_status_report']
+    yield from _grouped(
+        ('Total', {'Orders': report['total_orders']}),
+        ('Orders by status', report['by_status']),
+        ('Orders by supplier', report['by_supplier']),
+    )
+
+
+def item_request_summary_rows(start_date, end_date):
+    summary = _section('item_request_summary', start_date, end_date)['item_request_summary']
+    yield from _grouped(
+        ('Total', {
+            'Item requests': summary['total_requests'],
+            'Average delivery days (min)': summary['avg_delivery_days_min'],
+            'Average delivery days (max)': summary['avg_delivery_days_max'],
+        }),
+        ('Item requests by status', summary['by_status']),
+        ('Item requests by supplier', summary['by_supplier']),
+    )
+
+
+def consumption_summary_rows(start_date, end_date):
+    rows = ConsumptionDailyRollup.objects.filter(date__range=(start_date, end_date)).values(
+        'branch__name', 'item__item_code', 'item__name', 'item__base_unit',
+    ).annotate(total=Sum('qty_consumed')).order_by('branch__name', '-total', 'item__item_code').values_list(
+        'branch__name', 'item__item_code', 'item__name', 'total', 'item__base_unit',
+    )
+    yield from rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def supplier_performance_rows(start_date, end_date):
+    for row in _section('supplier_performance', start_date, end_date)['supplier_performance']:
+        yield (
+            row['supplier_name'], row['total_orders'], row['received_orders'], row['completion_rate'], row['item_requests'],
+            row['receipt_count'], row['lead_time_p50'], row['lead_time_p90'], row['on_time_rate'],
+        )
+
+
+def _discussions(start_date, end_date):
+    return SupplierPriceDiscussion.objects.filter(created_between(start_date, end_date, 'discussed_date'))
+
+
+def price_discussions_rows(start_date, end_date):
+    discussions = _discussions(start_date, end_date).order_by('-discussed_date', '-id').values_list(
+        'discussed_date', 'supplier_item__supplier__name', 'supplier_item__item__item_code',
+        'supplier_item__item__name', 'old_price', 'discussed_price', 'supplier_item__price_per_unit',
+        'discussed_by__profile__full_name', 'discussed_by__username', 'notes',
+    )
+    for discussed_date, supplier, code, name, old_price, new_price, current_price, full_name, username, notes in discussions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        base_price = old_price if old_price else current_price
+        yield _local(discussed_date), supplier, code, name, old_price, new_price, new_price - base_price, full_name or username or '', notes or ''
+
+
+def price_trends_rows(start_date, end_date):
+    for trend in price_trends(_discussions(start_date, end_date)):
+        yield (
+            trend['supplier_name'], trend['item_code'], trend['item_name'], trend['variation'] or '',
+            trend['current_price'], trend['first_price'], trend['latest_discussed_price'],
+            trend['min_price'], trend['max_price'],
+            trend['price_change'], trend['price_change_percent'], trend['discussion_count'],
+            trend['latest_discussion_date'].isoformat(),
+        )
+
+
+def discussions_by_supplier_rows(start_date, end_date):
+    yield from _discussions(start_date, end_date).order_by().values('supplier_item__supplier__name').annotate(
+        n=Count('id')
+    ).order_by('-n', 'supplier_item__supplier__name').values_list('supplier_item__supplier__name', 'n')
+
+
+GROUPED_COLUMNS = ['Group', 'Name', 'Value']
+
+# Export name -> (sheet title, header row, function(start_date, end_date) yielding rows)
+EXPORTS = {
+    'supplier_spending': ('Supplier Spending', ['Supplier', 'Category', 'Total Spent (OMR)', 'Orders', 'Avg Order Value (OMR)'], supplier_spending_rows),
+    'po_summary': ('PO Summary', GROUPED_COLUMNS, po_summary_rows),
+    'stock_levels': ('Stock Levels', ['Location', 'Items', 'Low Stock Items', 'Stock Value (OMR)'], stock_levels_rows),
+    'low_stock_items': ('Low Stock Items', ['Item Code', 'Item', 'Variation', 'Location', 'Current Stock', 'Min Stock', 'Shortage', 'Unit'], low_stock_items_rows),
+    'stock_movements': ('Stock Movements', ['Date', 'Item Code', 'Item', 'Variation', 'From', 'To', 'Quantity', 'Reason', 'Reference Type', 'Reference', 'Created By', 'Notes'], stock_movements_rows),
+    'request_summary': ('Request Summary', GROUPED_COLUMNS, request_summary_rows),
+    'requested_items': ('Requested Items', ['Item Code', 'Item', 'Total Requested', 'Requests'], requested_items_rows),
+    'po_status_report': ('PO Status', GROUPED_COLUMNS, po_status_report_rows),
+    'item_request_summary': ('Item Requests', GROUPED_COLUMNS, item_request_summary_rows),
+    'consumption_summary': ('Consumption', ['Branch', 'Item Code', 'Item', 'Consumed', 'Unit'], consumption_summary_rows),
+    'supplier_performance': ('Supplier Performance', ['Supplier', 'Orders', 'Received', 'Completion Rate %', 'Item Requests', 'Receipts', 'Lead Time p50 (days)', 'Lead Time p90 (days)', 'On-Time %'], supplier_performance_rows),
+    'price_discussions': ('Price Discussions', ['Date', 'Supplier', 'Item Code', 'Item', 'Old Price', 'New Price', 'Change', 'Discussed By', 'Notes'], price_discussions_rows),
+    'price_trends': ('Price Trends', ['Supplier', 'Item Code', 'Item', 'Variation', 'Current Price', 'First Price', 'Latest Price', 'Min Price', 'Max Price', 'Change', 'Change %', 'Discussions', 'Last Discussed'], price_trends_rows),
+    'discussions_by_supplier': ('Discussions by Supplier', ['Supplier', 'Discussions'], discussions_by_supplier_rows),
+}
+
+
+# ============================================================================
+# Writers
+# ============================================================================
+
+class _Echo:
+    """File-like object whose write() hands the formatted CSV line back to the caller."""
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(columns, rows):
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    chunk = ['\ufeff' + writer.writerow(columns)]
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= CSV_ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def csv_response(filename, columns, rows):
+    response = StreamingHttpResponse(_csv_chunks(columns, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def _xlsx_value(value):
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+def xlsx_response(filename, title, columns, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx', content_type=XLSX_CONTENT_TYPE)
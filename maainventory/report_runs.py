@@ -0,0 +1,193 @@
+"""
+Background computation of the reports page.
+
+The reports view asks for a run keyed by (date range, role). A completed run younger
+than REPORT_RUN_TTL_SECONDS is served as is; otherwise the viewer joins the run already
+queued or in progress for that key (at most one, enforced by a partial unique
+constraint) or queues a new one, then polls report_run_status. The compute_reports
+worker claims queued runs, computes the reporting SECTIONS concurrently
+(reporting.compute_sections) while recording progress and per-section timings, and
+stores the merged context on the run as JSON.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ReportRun
+from .reporting import SECTIONS, compute_sections
+
+
+IN_FLIGHT_STATUSES = (ReportRun.StatusType.PENDING, ReportRun.StatusType.PROCESSING)
+
+# Finished runs are kept this long (for the admin) before the worker deletes them
+REPORT_RUN_RETENTION = timedelta(days=1)
+
+
+def report_cache_key(start_date, end_date, role):
+    return f'{start_date.isoformat()}:{end_date.isoformat()}:{role}'
+
+
+def user_report_role(user):
+    """Role name that report runs are keyed by ('' for users without a role)."""
+    profile = getattr(user, 'profile', None)
+    role = getattr(profile, 'role', None) if profile else None
+    return role.name if role else ''
+
+
+def section_label(name):
+    return name.replace('_', ' ').capitalize()
+
+
+# ============================================================================
+# Requesting a run (views)
+# ============================================================================
+
+def _fail_timed_out_runs(cache_key, now):
+    """A worker that died mid-run must not block its key forever."""
+    ReportRun.objects.filter(
+        cache_key=cache_key,
+        status=ReportRun.StatusType.PROCESSING,
+        started_at__lt=now - timedelta(seconds=settings.REPORT_RUN_TIMEOUT_SECONDS),
+    ).update(status=ReportRun.StatusType.FAILED, error_log='Timed out', finished_at=now)
+
+
+def get_or_start_run(start_date, end_date, role, user=None):
+    """
+    The run to show for this key: a fresh completed run, else the queued/running one,
+    else a newly queued run. Concurrent callers for the same key get the same run.
+    """
+    cache_key = report_cache_key(start_date, end_date, role)
+    now = timezone.now()
+
+    fresh = ReportRun.objects.filter(
+        cache_key=cache_key, status=ReportRun.StatusType.COMPLETED, expires_at__gt=now,
+    ).defer('result').order_by('-finished_at').first()
+    if fresh:
+        return fresh
+
+    _fail_timed_out_runs(cache_key, now)
+    in_flight = ReportRun.objects.filter(cache_key=cache_key, status__in=IN_FLIGHT_STATUSES).first()
+    if in_flight:
+        return in_flight
+
+    try:
+        with transaction.atomic():
+            return ReportRun.objects.create(
+                cache_key=cache_key,
+                start_date=start_date,
+                end_date=end_date,
+                role=role,
+                requested_by=user if user and user.is_authenticated else None,
+                sections_total=len(SECTIONS),
+            )
+    except IntegrityError:
+        # Another viewer queued this key between our check and insert
+        return ReportRun.objects.filter(cache_key=cache_key).defer('result').order_by('-created_at').first()
+
+
+def run_progress(run):
+    """Polling payload for report_run_status."""
+    done = set(run.completed_sections or [])
+    running = set(run.running_sections or [])
+    timings = run.section_timings or {}
+    return {
+        'id': run.id,
+        'status': run.status,
+        'sections_done': run.sections_done,
+        'sections_total': run.sections_total,
+        'sections': [
+            {
+                'name': name,
+                'label': section_label(name),
+                'state': 'done' if name in done else ('running' if name in running else 'waiting'),
+                'seconds': timings.get(name),
+            }
+            for name in SECTIONS
+        ],
+        'error': run.error_log if run.status == ReportRun.StatusType.FAILED else None,
+    }
+
+
+def load_report_result(run):
+    """Stored context of a completed run, with the dates the template formats parsed back."""
+    result = dict(run.result)
+    for movement in result.get('stock_movements', []):
+        movement['created_at'] = parse_datetime(movement['created_at'])
+    for discussion in result.get('price_discussions', []):
+        discussion['discussed_date'] = parse_datetime(discussion['discussed_date'])
+    for trend in result.get('price_trends', []):
+        trend['latest_discussion_date'] = parse_date(trend['latest_discussion_date'])
+    return result
+
+
+# ============================================================================
+# Worker
+# ============================================================================
+
+def claim_pending_runs(limit):
+    """Mark up to `limit` pending runs as Processing (skips rows locked by another worker)."""
+    now = timezone.now()
+    with transaction.atomic():
+        runs = list(
+            ReportRun.objects.select_for_update(skip_locked=True)
+            .filter(status=ReportRun.StatusType.PENDING)
+            .order_by('created_at')[:limit]
+        )
+        for run in runs:
+            run.status = ReportRun.StatusType.PROCESSING
+            run.started_at = now
+        ReportRun.objects.bulk_update(runs, ['status', 'started_at'])
+    return runs
+
+
+def compute_run(run):
+    """
+    Run every section for `run`, saving progress after each one finishes.
+    Returns the merged context; run.section_timings holds the seconds per section.
+    """
+    ReportRun.objects.filter(pk=run.pk).update(running_sections=list(SECTIONS)[:settings.REPORT_SECTION_WORKERS])
+
+    def record_progress(completed, running, timings):
+        run.section_timings = timings
+        ReportRun.objects.filter(pk=run.pk).update(
+            sections_done=len(completed), completed_sections=completed,
+            running_sections=running, section_timings=timings,
+        )
+
+    context, run.section_timings = compute_sections(run.start_date, run.end_date, on_progress=record_progress)
+    return context
+
+
+def process_pending_runs(limit=5):
+    """
+    Compute one batch of pending runs. Returns (completed, failed) counts;
+    (0, 0) means the queue was empty.
+    """
+    completed = failed = 0
+    for run in claim_pending_runs(limit):
+        try:
+            run.result = compute_run(run)
+            run.status = ReportRun.StatusType.COMPLETED
+            run.error_log = None
+            completed += 1
+        except Exception as e:
+            run.status = ReportRun.StatusType.FAILED
+            run.error_log = str(e)
+            failed += 1
+        run.finished_at = timezone.now()
+        run.running_sections = []
+        run.expires_at = run.finished_at + timedelta(seconds=settings.REPORT_RUN_TTL_SECONDS)
+        run.save(update_fields=['result', 'status', 'error_log', 'finished_at', 'running_sections', 'section_timings', 'expires_at'])
+    return completed, failed
+
+
+def prune_finished_runs():
+    """Delete runs that finished more than REPORT_RUN_RETENTION ago. Returns the number deleted."""
+    deleted, _ = ReportRun.objects.filter(
+        finished_at__lt=timezone.now() - REPORT_RUN_RETENTION,
+    ).exclude(status__in=IN_FLIGHT_STATUSES).delete()
+    return deleted
@@ -0,0 +1,499 @@
+"""
+Query layer for the reports page.
+
+Each section is a function of (start_date, end_date) that answers with one or two
+GROUP BY queries and returns ready-to-render context entries made of plain values
+(dicts, lists, numbers, strings and dates) so a run can be stored as JSON.
+Sections are independent of each other: compute_sections() runs them concurrently on
+a bounded thread pool (settings.REPORT_SECTION_WORKERS), each thread on its own
+database connection, so a run takes about as long as its slowest section rather than
+the sum of all of them. build_report_context() merges the results.
+
+Request, PO, stock movement and consumption figures are read from the daily fact
+tables kept by rollups.refresh_daily_facts() (the refresh_daily_facts command), so
+they are as fresh as its last run.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import (
+    ConsumptionDailyRollup, InventoryLocation, ItemRequest, PoDaily, Request, RequestDaily, RequestItem,
+    StockBalance, StockLedger, StockMovementDaily, Supplier, SupplierLeadTimeStats, SupplierOrder,
+    SupplierPriceDiscussion,
+)
+from .price_history import price_series, price_trends
+from .rollups import local_midnight, spend_by_supplier
+
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+APPROVED_REQUEST_STATUSES = (
+    'Approved', 'WarehouseProcessing', 'ReadyForDelivery', 'InProcess', 'OutForDelivery', 'Delivered', 'Completed',
+)
+
+
+def created_between(start_date, end_date, field='created_at'):
+    """
+    Filter for records whose local date falls within [start_date, end_date], as the
+    half-open range [start_date 00:00, end_date + 1 day 00:00) so the column is
+    compared as stored and its indexes apply (a __date lookup casts every row).
+    """
+    return Q(**{
+        f'{field}__gte': local_midnight(start_date),
+        f'{field}__lt': local_midnight(end_date + timedelta(days=1)),
+    })
+
+
+def _counts_by(queryset, field, labels=None):
+    """{label: count} for one GROUP BY column (labels maps stored values to display names)."""
+    rows = queryset.order_by().values(field).annotate(n=Count('id')).order_by('-n', field)
+    labels = labels or {}
+    return {labels.get(row[field], row[field]): row['n'] for row in rows}
+
+
+def _sums_by(facts, field, measure, labels=None):
+    """{label: total} of one fact count column per GROUP BY column (like _counts_by for fact tables)."""
+    rows = facts.order_by().values(field).annotate(n=Sum(measure)).order_by('-n', field)
+    labels = labels or {}
+    return {labels.get(row[field], row[field]): row['n'] for row in rows}
+
+
+def _total(measure, **extra):
+    return Coalesce(Sum(measure, **extra), Value(0))
+
+
+def _money_total(measure, **extra):
+    return Coalesce(Sum(measure, **extra), Value(Decimal('0')), output_field=MONEY)
+
+
+def _float_or_none(value):
+    return float(value) if value is not None else None
+
+
+def _display_name(user):
+    if user is None:
+        return ''
+    profile = getattr(user, 'profile', None)
+    return profile.full_name if profile and profile.full_name else user.username
+
+
+# ============================================================================
+# 1. Financial & spending
+# ============================================================================
+
+def supplier_spending(start_date, end_date):
+    """Spend per active supplier (SupplierSpendMonthly rollup plus live partial months)."""
+    spend = spend_by_supplier(start_date, end_date)
+    suppliers = Supplier.objects.filter(
+        is_active=True, id__in=[supplier_id for supplier_id, row in spend.items() if row['total_spent'] > 0]
+    ).select_related('category')
+
+    rows = sorted(
+        ((supplier, spend[supplier.id]) for supplier in suppliers),
+        key=lambda pair: (-pair[1]['total_spent'], pair[0].name),
+    )
+    return {
+        'supplier_spending': [
+            {
+                'supplier_name': supplier.name,
+                'category': supplier.category.name if supplier.category else 'Uncategorized',
+                'total_spent': float(row['total_spent']),
+                'order_count': row['order_count'],
+                'avg_order_value': float(row['total_spent'] / row['order_count']) if row['order_count'] > 0 else 0,
+            }
+            for supplier, row in rows[:20]
+        ],
+    }
+
+
+def po_summary(start_date, end_date):
+    """PO count, value and status breakdown."""
+    facts = PoDaily.objects.filter(date__range=(start_date, end_date))
+    totals = facts.aggregate(total_orders=_total('order_count'), total_value=_money_total('total_value'))
+    total_orders = totals['total_orders']
+    total_value = totals['total_value']
+
+    return {
+        'po_summary': {
+            'total_orders': total_orders,
+            'total_value': float(total_value),
+            'avg_order_value': float(total_value / total_orders) if total_orders > 0 else 0.0,
+            'by_status': _sums_by(facts, 'status', 'order_count', dict(SupplierOrder.StatusType.choices)),
+        },
+    }
+
+
+# ============================================================================
+# 2. Inventory
+# ============================================================================
+
+def stock_levels(start_date, end_date):
+    """Per-warehouse item count, low-stock count and stock value (active items only)."""
+    active = Q(stock_balances__item__is_active=True)
+    locations = InventoryLocation.objects.filter(
+        type=InventoryLocation.LocationType.WAREHOUSE
+    ).annotate(
+        total_items=Count('stock_balances', filter=active),
+        low_stock_count=Count('stock_balances', filter=active & Q(stock_balances__qty_on_hand__lt=F('stock_balances__item__min_stock_qty'))),
+        total_value=Coalesce(
+            Sum(
+                F('stock_balances__qty_on_hand') * Coalesce(F('stock_balances__item__price_per_unit'), Value(Decimal('0'))),
+                filter=active, output_field=MONEY,
+            ),
+            Value(Decimal('0')), output_field=MONEY,
+        ),
+    ).order_by('id')
+
+    return {
+        'stock_levels': [
+            {
+                'location_name': location.name,
+                'total_items': location.total_items,
+                'low_stock_count': location.low_stock_count,
+                'total_value': float(location.total_value),
+            }
+            for location in locations
+        ],
+    }
+
+
+def low_stock_items(start_date, end_date):
+    """Warehouse balances below the item's minimum stock (first 50)."""
+    balances = StockBalance.objects.filter(
+        item__is_active=True,
+        location__type=InventoryLocation.LocationType.WAREHOUSE,
+        qty_on_hand__lt=F('item__min_stock_qty'),
+    ).select_related('item', 'variation', 'location').order_by('id')[:50]
+
+    return {
+        'low_stock_items': [
+            {
+                'item_code': stock.item.item_code,
+                'item_name': stock.item.name,
+                'variation': stock.variation.variation_name if stock.variation else None,
+                'location': stock.location.name,
+                'current_stock': float(stock.qty_on_hand),
+                'min_stock': float(stock.item.min_stock_qty),
+                'shortage': float(stock.item.min_stock_qty - stock.qty_on_hand),
+                'base_unit': stock.item.base_unit,
+            }
+            for stock in balances
+        ],
+    }
+
+
+def stock_movements(start_date, end_date):
+    """Latest 100 ledger rows plus counts per reason and incoming/outgoing totals (one aggregate query)."""
+    ledger = StockLedger.objects.filter(created_between(start_date, end_date))
+    reasons = dict(StockLedger.ReasonType.choices)
+    totals = StockMovementDaily.objects.filter(date__range=(start_date, end_date)).aggregate(
+        total_movements=_total('movement_count'),
+        incoming=_money_total('qty_in'),
+        outgoing=_money_total('qty_out'),
+        **{f'reason_{reason}': _total('movement_count', filter=Q(reason=reason)) for reason in reasons},
+    )
+    by_reason = sorted(
+        ((totals[f'reason_{reason}'], reason) for reason in reasons if totals[f'reason_{reason}']),
+        key=lambda pair: (-pair[0], pair[1]),
+    )
+
+    return {
+        'stock_movements': [
+            {
+                'created_at': movement.created_at,
+                'item': {'item_code': movement.item.item_code, 'name': movement.item.name},
+                'from_location': {'name': movement.from_location.name} if movement.from_location else None,
+                'to_location': {'name': movement.to_location.name} if movement.to_location else None,
+                'qty_change': float(movement.qty_change),
+                'reason': reasons.get(movement.reason, movement.reason),
+            }
+            for movement in ledger.select_related('item', 'from_location', 'to_location').order_by('-created_at', '-id')[:100]
+        ],
+        'movement_summary': {
+            'total_movements': totals['total_movements'],
+            'by_reason': {reasons[reason]: count for count, reason in by_reason},
+            'incoming': float(totals['incoming']),
+            'outgoing': float(totals['outgoing']),
+        },
+    }
+
+
+# ============================================================================
+# 3. Operational
+# ============================================================================
+
+def request_summary(start_date, end_date):
+    """Branch request counts by status/branch, approval rate and average fulfilment days."""
+    facts = RequestDaily.objects.filter(date__range=(start_date, end_date))
+    totals = facts.aggregate(
+        total_requests=_total('request_count'),
+        approved=_total('request_count', filter=Q(status__in=APPROVED_REQUEST_STATUSES)),
+        rejected=_total('request_count', filter=Q(status='Rejected')),
+        fulfilled=_total('fulfilled_count'),
+        fulfillment_days=_total('fulfillment_days_total'),
+    )
+
+    total_reviewed = totals['approved'] + totals['rejected']
+    return {
+        'request_summary': {
+            'total_requests': totals['total_requests'],
+            'by_status': _sums_by(facts, 'status', 'request_count', dict(Request.StatusType.choices)),
+            'by_branch': _sums_by(facts, 'branch__name', 'request_count'),
+            'avg_fulfillment_days': totals['fulfillment_days'] / totals['fulfilled'] if totals['fulfilled'] else None,
+            'approval_rate': (totals['approved'] / total_reviewed) * 100 if total_reviewed > 0 else None,
+        },
+    }
+
+
+def requested_items(start_date, end_date):
+    """Top 20 requested items by quantity."""
+    rows = RequestItem.objects.filter(
+        created_between(start_date, end_date, 'request__created_at')
+    ).values('item__item_code', 'item__name').annotate(
+        total_requested=Sum('qty_requested'),
+        request_count=Count('request', distinct=True),
+    ).order_by('-total_requested')[:20]
+    return {
+        'requested_items': [dict(row, total_requested=float(row['total_requested'])) for row in rows],
+    }
+
+
+def po_status_report(start_date, end_date):
+    """PO counts by status and by supplier."""
+    facts = PoDaily.objects.filter(date__range=(start_date, end_date))
+    return {
+        'po_status_report': {
+            'total_orders': facts.aggregate(n=_total('order_count'))['n'],
+            'by_status': _sums_by(facts, 'status', 'order_count', dict(SupplierOrder.StatusType.choices)),
+            'by_supplier': _sums_by(facts, 'supplier__name', 'order_count'),
+            'avg_delivery_days': None,
+        },
+    }
+
+
+def item_request_summary(start_date, end_date):
+    """Item requests to suppliers by status/supplier with average quoted delivery days."""
+    item_requests = ItemRequest.objects.filter(created_between(start_date, end_date))
+    totals = item_requests.aggregate(
+        total_requests=Count('id'),
+        avg_delivery_days_min=Avg('delivery_days_min', filter=Q(delivery_days_min__isnull=False) & ~Q(delivery_days_min=0)),
+        avg_delivery_days_max=Avg('delivery_days_max', filter=Q(delivery_days_max__isnull=False) & ~Q(delivery_days_max=0)),
+    )
+    return {
+        'item_request_summary': {
+            'total_requests': totals['total_requests'],
+            'by_status': _counts_by(item_requests, 'status', dict(ItemRequest.StatusType.choices)),
+            'by_supplier': _counts_by(item_requests, 'supplier__name'),
+            'avg_delivery_days_min': totals['avg_delivery_days_min'],
+            'avg_delivery_days_max': totals['avg_delivery_days_max'],
+        },
+    }
+
+
+# ============================================================================
+# 4. Analytics
+# ============================================================================
+
+def consumption_summary(start_date, end_date):
+    """Branch consumption totals, per-branch totals and the top 10 items."""
+    consumption = ConsumptionDailyRollup.objects.filter(date__range=(start_date, end_date))
+    totals = consumption.aggregate(
+        total_records=_total('record_count'),
+        total_consumed=_money_total('qty_consumed'),
+    )
+    by_branch = consumption.order_by().values('branch__name').annotate(
+        total=Sum('qty_consumed')
+    ).order_by('-total', 'branch__name')
+    top_items = consumption.order_by().values('item__item_code', 'item__name', 'item__base_unit').annotate(
+        total=Sum('qty_consumed')
+    ).order_by('-total', 'item__item_code')[:10]
+
+    return {
+        'consumption_summary': {
+            'total_records': totals['total_records'],
+            'total_consumed': float(totals['total_consumed']),
+            'by_branch': {row['branch__name']: float(row['total']) for row in by_branch},
+            'top_items': [
+                {
+                    'item_code': row['item__item_code'],
+                    'item_name': row['item__name'],
+                    'total_consumed': float(row['total']),
+                    'base_unit': row['item__base_unit'],
+                }
+                for row in top_items
+            ],
+        },
+    }
+
+
+def supplier_performance(start_date, end_date):
+    """
+    Per active supplier with POs in range: completion rate, item request count, and
+    lead time / on-time delivery over all receipts (from SupplierLeadTimeStats).
+    """
+    in_range = Q(po_daily__date__range=(start_date, end_date))
+    suppliers = Supplier.objects.filter(is_active=True).annotate(
+        total_orders=_total('po_daily__order_count', filter=in_range),
+        received_orders=_total('po_daily__order_count', filter=in_range & Q(po_daily__status='Received')),
+    ).filter(total_orders__gt=0).order_by('name')[:20]
+    suppliers = list(suppliers)
+    supplier_ids = [s.id for s in suppliers]
+
+    item_request_counts = dict(
+        ItemRequest.objects.filter(
+            created_between(start_date, end_date), supplier__in=supplier_ids
+        ).order_by().values('supplier_id').annotate(n=Count('id')).values_list('supplier_id', 'n')
+    )
+    lead_times = {stats.supplier_id: stats for stats in SupplierLeadTimeStats.objects.filter(supplier_id__in=supplier_ids)}
+
+    performance = []
+    for supplier in suppliers:
+        stats = lead_times.get(supplier.id)
+        performance.append({
+            'supplier_name': supplier.name,
+            'total_orders': supplier.total_orders,
+            'received_orders': supplier.received_orders,
+            'completion_rate': (supplier.received_orders / supplier.total_orders * 100) if supplier.total_orders > 0 else 0,
+            'item_requests': item_request_counts.get(supplier.id, 0),
+            'receipt_count': stats.receipt_count if stats else 0,
+            'lead_time_p50': _float_or_none(stats.lead_time_p50) if stats else None,
+            'lead_time_p90': _float_or_none(stats.lead_time_p90) if stats else None,
+            'on_time_count': stats.on_time_count if stats else 0,
+            'on_time_rate': _float_or_none(stats.on_time_rate) if stats else None,
+        })
+    return {'supplier_performance': performance}
+
+
+# ============================================================================
+# 5. Price discussions
+# ============================================================================
+
+def price_discussions(start_date, end_date):
+    """Latest 50 discussions, counts per supplier and per-item price trends."""
+    discussions = SupplierPriceDiscussion.objects.filter(created_between(start_date, end_date, 'discussed_date'))
+
+    latest = []
+    for discussion in discussions.select_related(
+        'supplier_item__supplier', 'supplier_item__item', 'discussed_by__profile'
+    ).order_by('-discussed_date')[:50]:
+        # Price difference from old_price (or the current price if old_price wasn't recorded)
+        base_price = discussion.old_price if discussion.old_price else discussion.supplier_item.price_per_unit
+        latest.append({
+            'discussed_date': discussion.discussed_date,
+            'supplier_name': discussion.supplier_item.supplier.name,
+            'item_code': discussion.supplier_item.item.item_code,
+            'item_name': discussion.supplier_item.item.name,
+            'discussed_by': _display_name(discussion.discussed_by),
+            'notes': discussion.notes or '',
+            'old_price': float(discussion.old_price) if discussion.old_price else None,
+            'new_price': float(discussion.discussed_price),
+            'price_difference': float(discussion.discussed_price - base_price),
+        })
+
+    trends = price_trends(discussions)
+    # Chart: daily closing price of the 10 most recently discussed items
+    charted = trends[:10]
+    series = price_series(discussions, 'day', [t['supplier_item_id'] for t in charted])
+
+    return {
+        'price_discussions': latest,
+        'discussions_by_supplier': _counts_by(discussions, 'supplier_item__supplier__name'),
+        'price_trends': trends[:30],
+        'price_trends_chart': [
+            {
+                'label': f"{t['item_code']} - {t['item_name']}",
+                'supplier': t['supplier_name'],
+                'history': series.get(t['supplier_item_id'], []),
+            }
+            for t in charted
+        ],
+    }
+
+
+# Section name -> function(start_date, end_date) returning context entries
+SECTIONS = {
+    'supplier_spending': supplier_spending,
+    'po_summary': po_summary,
+    'stock_levels': stock_levels,
+    'low_stock_items': low_stock_items,
+    'stock_movements': stock_movements,
+    'request_summary': request_summary,
+    'requested_items': requested_items,
+    'po_status_report': po_status_report,
+    'item_request_summary': item_request_summary,
+    'consumption_summary': consumption_summary,
+    'supplier_performance': supplier_performance,
+    'price_discussions': price_discussions,
+}
+
+
+def _timed_section(name, start_date, end_date):
+    """Run one section; returns (context entries, seconds taken)."""
+    began = time.monotonic()
+    return SECTIONS[name](start_date, end_date), time.monotonic() - began
+
+
+def _pooled_section(name, start_date, end_date):
+    """_timed_section on a pool thread, closing the connection that thread opened."""
+    try:
+        return _timed_section(name, start_date, end_date)
+    finally:
+        connection.close()
+
+
+def compute_sections(start_date, end_date, sections=None, on_progress=None, max_workers=None):
+    """
+    Run the requested sections (all by default) on up to `max_workers` threads
+    (settings.REPORT_SECTION_WORKERS by default; 1 runs them in order on the calling
+    thread). Pool threads use their own connections, so they do not see rows written
+    inside an open transaction of the caller.
+
+    on_progress(completed, running, timings) is called on the calling thread each time a
+    section finishes: names of the finished sections in finishing order, names of the
+    sections still running, and {name: seconds} so far. The first failing section's
+    exception is raised once the sections already running have finished.
+    Returns (context, timings) with context entries merged in SECTIONS order.
+    """
+    names = list(sections or SECTIONS)
+    workers = min(max_workers or settings.REPORT_SECTION_WORKERS, len(names))
+    results = {}
+    timings = {}
+
+    def finished(name, section_context, seconds, running=()):
+        results[name] = section_context
+        timings[name] = round(seconds, 3)
+        if on_progress:
+            on_progress(list(timings), sorted(running), dict(timings))
+
+    if workers <= 1:
+        for name in names:
+            finished(name, *_timed_section(name, start_date, end_date))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-section') as pool:
+            futures = {pool.submit(_pooled_section, name, start_date, end_date): name for name in names}
+            try:
+                for future in as_completed(futures):
+                    running = [futures[f] for f in futures if f.running()]
+                    finished(futures[future], *future.result(), running=running)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    context = {}
+    for name in names:
+        context.update(results[name])
+    return context, timings
+
+
+def build_report_context(start_date, end_date, sections=None):
+    """Run the requested sections (all by default) and merge their context entries."""
+    return compute_sections(start_date, end_date, sections)[0]
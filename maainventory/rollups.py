@@ -0,0 +1,452 @@
+"""
+Incremental rollups of transactional data.
+
+SupplierSpendMonthly holds PO spend per (month, supplier), with the supplier's
+category captured at rollup time. refresh_supplier_spend() only recomputes the
+months of orders changed since the last watermark; readers combine closed months
+from the rollup with the current (or partial) months read live.
+
+The daily fact tables (RequestDaily, StockMovementDaily, ConsumptionDailyRollup and
+PoDaily) back the reports page. refresh_daily_facts() recomputes, per fact, only the
+dates of source rows created or updated since that fact's watermark.
+
+SupplierLeadTimeStats holds lead time percentiles and the on-time rate per supplier
+over all SupplierOrderReceipt rows; refresh_supplier_lead_times() recomputes only the
+suppliers with receipts recorded since its watermark.
+"""
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    ConsumptionDailyRollup, ItemConsumptionDaily, PoDaily, Request, RequestDaily, RollupWatermark,
+    StockLedger, StockMovementDaily, SupplierLeadTimeStats, SupplierOrder, SupplierOrderItem, SupplierOrderReceipt,
+    SupplierSpendMonthly,
+)
+
+
+SUPPLIER_SPEND_ROLLUP = 'supplier_spend_monthly'
+SUPPLIER_LEAD_TIME_ROLLUP = 'supplier_lead_time_stats'
+
+# Orders that do not count as spend
+NON_SPEND_ORDER_STATUSES = (SupplierOrder.StatusType.DRAFT, SupplierOrder.StatusType.CANCELLED)
+
+# Re-read a little before the watermark so rows committed late are not missed
+ROLLUP_OVERLAP = timedelta(minutes=5)
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+LINE_VALUE = ExpressionWrapper(F('qty_ordered') * F('price_per_unit'), output_field=MONEY)
+
+
+def month_key(value):
+    return value.strftime('%Y-%m')
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def next_month(value):
+    return (value.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def local_midnight(day):
+    """Aware datetime of the start of `day` in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def _on_local_dates(field, dates):
+    """Q for rows whose datetime `field` falls on one of the given local dates (runs of days become one range)."""
+    condition = Q()
+    run_start = run_end = None
+    for day in sorted(dates) + [None]:
+        if run_end is not None and day == run_end:
+            run_end = day + timedelta(days=1)
+            continue
+        if run_start is not None:
+            condition |= Q(**{f'{field}__gte': local_midnight(run_start), f'{field}__lt': local_midnight(run_end)})
+        if day is not None:
+            run_start, run_end = day, day + timedelta(days=1)
+    return condition
+
+
+def _spend_lines():
+    return SupplierOrderItem.objects.exclude(supplier_order__status__in=NON_SPEND_ORDER_STATUSES)
+
+
+# ============================================================================
+# Writing the rollup
+# ============================================================================
+
+def _rollup_rows(months=None):
+    """SupplierSpendMonthly rows for the given 'YYYY-MM' months (all months if None)."""
+    lines = _spend_lines()
+    if months is not None:
+        month_ranges = Q()
+        for key in months:
+            first = date(int(key[:4]), int(key[5:7]), 1)
+            month_ranges |= Q(
+                supplier_order__created_at__gte=local_midnight(first),
+                supplier_order__created_at__lt=local_midnight(next_month(first)),
+            )
+        lines = lines.filter(month_ranges)
+
+    rows = lines.annotate(
+        month=TruncMonth('supplier_order__created_at'),
+    ).order_by().values(
+        'month', 'supplier_order__supplier_id', 'supplier_order__supplier__category_id',
+    ).annotate(
+        total=Sum(LINE_VALUE),
+        orders=Count('supplier_order', distinct=True),
+    )
+    return [
+        SupplierSpendMonthly(
+            month=month_key(row['month']),
+            supplier_id=row['supplier_order__supplier_id'],
+            category_id=row['supplier_order__supplier__category_id'],
+            total_spent=row['total'] or Decimal('0'),
+            order_count=row['orders'],
+        )
+        for row in rows
+    ]
+
+
+def refresh_supplier_spend(full=False):
+    """
+    Bring SupplierSpendMonthly up to date. Incremental runs recompute only the months
+    (by order created_at) of orders updated since the watermark; full=True rebuilds all.
+    Returns (months_recomputed, rows_written); months_recomputed is None for a full rebuild.
+    """
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=SUPPLIER_SPEND_ROLLUP)
+        now = timezone.now()
+
+        if full or watermark.high_water is None:
+            months = None
+        else:
+            touched = SupplierOrder.objects.filter(
+                updated_at__gt=watermark.high_water - ROLLUP_OVERLAP,
+            ).annotate(month=TruncMonth('created_at')).order_by().values_list('month', flat=True).distinct()
+            months = {month_key(m) for m in touched}
+
+        rows = []
+        if months is None:
+            rows = _rollup_rows()
+            SupplierSpendMonthly.objects.all().delete()
+        elif months:
+            rows = _rollup_rows(months)
+            SupplierSpendMonthly.objects.filter(month__in=months).delete()
+        SupplierSpendMonthly.objects.bulk_create(rows, batch_size=500)
+
+        watermark.high_water = now
+        watermark.last_run_at = now
+        watermark.save()
+
+    return (sorted(months) if months is not None else None), len(rows)
+
+
+# ============================================================================
+# Reading spend
+# ============================================================================
+
+def _live_spend(start, end, supplier_ids):
+    """{supplier_id: (total, order_count)} from PO lines for local dates [start, end)."""
+    lines = _spend_lines().filter(
+        supplier_order__created_at__gte=local_midnight(start),
+        supplier_order__created_at__lt=local_midnight(end),
+    )
+    if supplier_ids is not None:
+        lines = lines.filter(supplier_order__supplier_id__in=supplier_ids)
+    rows = lines.order_by().values('supplier_order__supplier_id').annotate(
+        total=Sum(LINE_VALUE), orders=Count('supplier_order', distinct=True),
+    )
+    return {row['supplier_order__supplier_id']: (row['total'] or Decimal('0'), row['orders']) for row in rows}
+
+
+def spend_by_supplier(start_date=None, end_date=None, supplier_ids=None):
+    """
+    Spend per supplier for local dates [start_date, end_date] (open-ended if None):
+    {supplier_id: {'total_spent': Decimal, 'order_count': int}}.
+
+    Whole months before the current month are read from SupplierSpendMonthly; partial
+    months at either end of the range and the current month are read live.
+    """
+    today = timezone.localdate()
+    end_exclusive = (end_date or today) + timedelta(days=1)
+
+    # Whole months inside the range that the rollup covers
+    rollup_from = None
+    if start_date is not None:
+        rollup_from = start_date if start_date.day == 1 else next_month(start_date)
+    rollup_to = end_exclusive if end_exclusive.day == 1 else month_start(end_exclusive)
+    rollup_to = min(rollup_to, month_start(today))
+
+    totals = {}
+
+    def add(supplier_id, total, orders):
+        entry = totals.setdefault(supplier_id, {'total_spent': Decimal('0'), 'order_count': 0})
+        entry['total_spent'] += total
+        entry['order_count'] += orders
+
+    if rollup_from is None or rollup_from < rollup_to:
+        rollup = SupplierSpendMonthly.objects.filter(month__lt=month_key(rollup_to))
+        if rollup_from is not None:
+            rollup = rollup.filter(month__gte=month_key(rollup_from))
+        if supplier_ids is not None:
+            rollup = rollup.filter(supplier_id__in=supplier_ids)
+        for row in rollup.order_by().values('supplier_id').annotate(total=Sum('total_spent'), orders=Sum('order_count')):
+            add(row['supplier_id'], row['total'], row['orders'])
+        live_ranges = [(rollup_to, end_exclusive)]
+        if rollup_from is not None:
+            live_ranges.append((start_date, rollup_from))
+    else:
+        live_ranges = [(start_date, end_exclusive)]
+
+    for start, end in live_ranges:
+        if start < end:
+            for supplier_id, (total, orders) in _live_spend(start, end, supplier_ids).items():
+                add(supplier_id, total, orders)
+    return totals
+
+
+# ============================================================================
+# Daily fact tables
+# ============================================================================
+
+def _request_dates_since(since):
+    return Request.objects.filter(updated_at__gt=since).annotate(
+        day=TruncDate('created_at')
+    ).order_by().values_list('day', flat=True).distinct()
+
+
+def _request_daily_rows(dates=None):
+    requests = Request.objects.exclude(status=Request.StatusType.DRAFT)  # Not sent by the branch yet
+    if dates is not None:
+        requests = requests.filter(_on_local_dates('created_at', dates))
+    requests = requests.annotate(day=TruncDate('created_at')).order_by()
+
+    facts = {
+        (row['day'], row['branch_id'], row['status']): RequestDaily(
+            date=row['day'], branch_id=row['branch_id'], status=row['status'], request_count=row['n'],
+        )
+        for row in requests.values('day', 'branch_id', 'status').annotate(n=Count('id'))
+    }
+
+    # Whole days from approval to completion (last update of a completed request)
+    completed = Request.StatusType.COMPLETED
+    for day, branch_id, updated_at, approved_at in requests.filter(
+        status=completed, approved_at__isnull=False
+    ).values_list('day', 'branch_id', 'updated_at', 'approved_at'):
+        days = (updated_at.date() - approved_at.date()).days
+        if days >= 0:
+            fact = facts[(day, branch_id, completed)]
+            fact.fulfilled_count += 1
+            fact.fulfillment_days_total += days
+    return list(facts.values())
+
+
+def _stock_movement_dates_since(since):
+    return StockLedger.objects.filter(created_at__gt=since).annotate(
+        day=TruncDate('created_at')
+    ).order_by().values_list('day', flat=True).distinct()
+
+
+def _stock_movement_daily_rows(dates=None):
+    ledger = StockLedger.objects.all()
+    if dates is not None:
+        ledger = ledger.filter(_on_local_dates('created_at', dates))
+    rows = ledger.annotate(day=TruncDate('created_at')).order_by().values('day', 'reason').annotate(
+        n=Count('id'),
+        incoming=Coalesce(Sum('qty_change', filter=Q(qty_change__gt=0)), Value(Decimal('0')), output_field=MONEY),
+        outgoing=Coalesce(Sum('qty_change', filter=Q(qty_change__lt=0)), Value(Decimal('0')), output_field=MONEY),
+    )
+    return [
+        StockMovementDaily(
+            date=row['day'], reason=row['reason'], movement_count=row['n'],
+            qty_in=row['incoming'], qty_out=-row['outgoing'],
+        )
+        for row in rows
+    ]
+
+
+def _consumption_dates_since(since):
+    return ItemConsumptionDaily.objects.filter(updated_at__gt=since).order_by().values_list('date', flat=True).distinct()
+
+
+def _consumption_daily_rows(dates=None):
+    consumption = ItemConsumptionDaily.objects.all()
+    if dates is not None:
+        consumption = consumption.filter(date__in=dates)
+    rows = consumption.order_by().values('date', 'branch_id', 'item_id').annotate(
+        total=Sum('qty_consumed'), n=Count('id'),
+    )
+    return [
+        ConsumptionDailyRollup(
+            date=row['date'], branch_id=row['branch_id'], item_id=row['item_id'],
+            qty_consumed=row['total'], record_count=row['n'],
+        )
+        for row in rows
+    ]
+
+
+def _po_dates_since(since):
+    return SupplierOrder.objects.filter(updated_at__gt=since).annotate(
+        day=TruncDate('created_at')
+    ).order_by().values_list('day', flat=True).distinct()
+
+
+def _po_daily_rows(dates=None):
+    orders = SupplierOrder.objects.all()
+    if dates is not None:
+        orders = orders.filter(_on_local_dates('created_at', dates))
+    rows = orders.annotate(day=TruncDate('created_at')).order_by().values('day', 'supplier_id', 'status').annotate(
+        n=Count('id', distinct=True),
+        total=Coalesce(Sum(F('items__qty_ordered') * F('items__price_per_unit'), output_field=MONEY), Value(Decimal('0')), output_field=MONEY),
+    )
+    return [
+        PoDaily(
+            date=row['day'], supplier_id=row['supplier_id'], status=row['status'],
+            order_count=row['n'], total_value=row['total'],
+        )
+        for row in rows
+    ]
+
+
+# Fact name (also its watermark name) -> (model, dates touched since a timestamp, rows for dates)
+DAILY_FACTS = {
+    'request_daily': (RequestDaily, _request_dates_since, _request_daily_rows),
+    'stock_movement_daily': (StockMovementDaily, _stock_movement_dates_since, _stock_movement_daily_rows),
+    'consumption_daily_rollup': (ConsumptionDailyRollup, _consumption_dates_since, _consumption_daily_rows),
+    'po_daily': (PoDaily, _po_dates_since, _po_daily_rows),
+}
+
+
+def refresh_daily_fact(name, full=False):
+    """
+    Bring one daily fact table up to date. Incremental runs recompute only the dates of
+    source rows changed since the watermark; full=True rebuilds the table (needed after
+    source rows are deleted). Returns (dates_recomputed, rows_written); dates_recomputed
+    is None for a full rebuild.
+    """
+    model, dates_since, build_rows = DAILY_FACTS[name]
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=name)
+        now = timezone.now()
+
+        if full or watermark.high_water is None:
+            dates = None
+        else:
+            dates = set(dates_since(watermark.high_water - ROLLUP_OVERLAP))
+
+        rows = []
+        if dates is None:
+            rows = build_rows()
+            model.objects.all().delete()
+        elif dates:
+            rows = build_rows(dates)
+            model.objects.filter(date__in=dates).delete()
+        model.objects.bulk_create(rows, batch_size=500)
+
+        watermark.high_water = now
+        watermark.last_run_at = now
+        watermark.save()
+
+    return (sorted(dates) if dates is not None else None), len(rows)
+
+
+def refresh_daily_facts(full=False, names=None):
+    """Refresh the given daily facts (all by default): {name: (dates_recomputed, rows_written)}."""
+    return {name: refresh_daily_fact(name, full=full) for name in names or DAILY_FACTS}
+
+
+# ============================================================================
+# Supplier lead times
+# ============================================================================
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile (0..1) of an ascending list, as PostgreSQL's percentile_cont."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _one_decimal(value):
+    return Decimal(str(round(value, 1))) if value is not None else None
+
+
+def _lead_time_rows(supplier_ids=None):
+    """SupplierLeadTimeStats rows for the given suppliers (all suppliers with receipts if None)."""
+    receipts = SupplierOrderReceipt.objects.all()
+    if supplier_ids is not None:
+        receipts = receipts.filter(supplier_id__in=supplier_ids)
+
+    by_supplier = {}
+    for supplier_id, lead_time, on_time, received_at in receipts.order_by('supplier_id', 'lead_time_days').values_list(
+        'supplier_id', 'lead_time_days', 'on_time', 'received_at',
+    ).iterator(chunk_size=2000):
+        stats = by_supplier.setdefault(supplier_id, {'lead_times': [], 'rated': 0, 'on_time': 0, 'last': received_at})
+        stats['lead_times'].append(lead_time)
+        if on_time is not None:
+            stats['rated'] += 1
+            stats['on_time'] += on_time
+        stats['last'] = max(stats['last'], received_at)
+
+    rows = []
+    for supplier_id, stats in by_supplier.items():
+        lead_times = stats['lead_times']
+        rows.append(SupplierLeadTimeStats(
+            supplier_id=supplier_id,
+            receipt_count=len(lead_times),
+            lead_time_p50=_one_decimal(percentile(lead_times, 0.5)),
+            lead_time_p90=_one_decimal(percentile(lead_times, 0.9)),
+            avg_lead_time_days=_one_decimal(sum(lead_times) / len(lead_times)),
+            rated_count=stats['rated'],
+            on_time_count=stats['on_time'],
+            on_time_rate=_one_decimal(stats['on_time'] / stats['rated'] * 100) if stats['rated'] else None,
+            last_received_at=stats['last'],
+        ))
+    return rows
+
+
+def refresh_supplier_lead_times(full=False):
+    """
+    Bring SupplierLeadTimeStats up to date. Incremental runs recompute only suppliers
+    with receipts recorded since the watermark; full=True rebuilds all.
+    Returns (suppliers_recomputed, rows_written); suppliers_recomputed is None for a
+    full rebuild.
+    """
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=SUPPLIER_LEAD_TIME_ROLLUP)
+        now = timezone.now()
+
+        if full or watermark.high_water is None:
+            supplier_ids = None
+        else:
+            supplier_ids = set(
+                SupplierOrderReceipt.objects.filter(created_at__gt=watermark.high_water - ROLLUP_OVERLAP)
+                .order_by().values_list('supplier_id', flat=True).distinct()
+            )
+
+        rows = []
+        if supplier_ids is None:
+            rows = _lead_time_rows()
+            SupplierLeadTimeStats.objects.all().delete()
+        elif supplier_ids:
+            rows = _lead_time_rows(supplier_ids)
+            SupplierLeadTimeStats.objects.filter(supplier_id__in=supplier_ids).delete()
+        SupplierLeadTimeStats.objects.bulk_create(rows, batch_size=500)
+
+        watermark.high_water = now
+        watermark.last_run_at = now
+        watermark.save()
+
+    return (sorted(supplier_ids) if supplier_ids is not None else None), len(rows)
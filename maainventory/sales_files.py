@@ -0,0 +1,146 @@
+"""
+Streaming reader for POS / Foodics sales exports.
+
+The header row is resolved to column positions once, then rows are decoded and
+yielded one at a time (CSV line by line, gzip-compressed CSV through GzipFile, XLSX
+through openpyxl's read-only iterator), so a full-month export is never held in
+memory. aggregate_products() folds the stream into one entry per product, keeping
+memory bounded by the number of distinct products rather than rows.
+"""
+
+import codecs
+import csv
+import gzip
+from decimal import Decimal, InvalidOperation
+
+
+# Accepted header names per field, matched case-insensitively after stripping
+COLUMNS = {
+    'product_name': ['Product', 'Product Name', 'product_name'],
+    'qty': ['Quantity', 'Qty'],
+    'sales': ['Sales'],
+    'popularity': ['Popularity'],
+    'popularity_category': ['Popularity Category', 'popularity_category', 'PopularityCategory'],
+}
+
+# Fields summed across rows of the same product; the others keep the first non-empty value
+SUMMED_FIELDS = ('qty', 'sales')
+
+
+def _normalize_header(value):
+    return str(value).strip().lower() if value is not None else ''
+
+
+def resolve_columns(header):
+    """{field: column index} for the fields present in `header` (first matching column wins)."""
+    positions = {}
+    for index, name in enumerate(header):
+        positions.setdefault(_normalize_header(name), index)
+    columns = {}
+    for field, candidates in COLUMNS.items():
+        for candidate in candidates:
+            index = positions.get(candidate.lower())
+            if index is not None:
+                columns[field] = index
+                break
+    return columns
+
+
+def _csv_rows(lines):
+    return csv.reader(codecs.iterdecode(lines, 'utf-8-sig', errors='replace'))
+
+
+def _xlsx_rows(uploaded_file):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def check_file_type(filename):
+    """Raise ValueError unless `filename` is a CSV, gzip-compressed CSV or XLSX file."""
+    if not (filename or '').lower().endswith(('.csv', '.gz', '.xlsx')):
+        raise ValueError('File must be CSV or Excel (.csv, .csv.gz, .xlsx)')
+
+
+def _raw_rows(uploaded_file):
+    check_file_type(uploaded_file.name)
+    filename = uploaded_file.name.lower()
+    if filename.endswith('.csv'):
+        return _csv_rows(uploaded_file)
+    if filename.endswith('.gz'):
+        return _csv_rows(gzip.GzipFile(fileobj=uploaded_file, mode='rb'))
+    return _xlsx_rows(uploaded_file)
+
+
+def _cell(row, index):
+    if index >= len(row) or row[index] is None:
+        return ''
+    return str(row[index]).strip()
+
+
+def iter_sales_rows(uploaded_file):
+    """
+    Yield {'product_name', 'qty', 'sales', 'popularity', 'popularity_category'} (stripped
+    strings) for each row with a product name. Nothing is yielded if the file has no
+    Product column.
+    """
+    rows = iter(_raw_rows(uploaded_file))
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = resolve_columns(header)
+    if 'product_name' not in columns:
+        return
+
+    empty = dict.fromkeys(COLUMNS, '')
+    product_index = columns['product_name']
+    for row in rows:
+        if not _cell(row, product_index):
+            continue
+        normalized = empty.copy()
+        for field, index in columns.items():
+            normalized[field] = _cell(row, index)
+        yield normalized
+
+
+def _to_decimal(value):
+    try:
+        number = Decimal(value.replace(',', ''))
+    except (InvalidOperation, ValueError):
+        return None
+    return number if number.is_finite() else None
+
+
+def aggregate_products(rows):
+    """
+    Fold sales rows into one dict per product (first-seen order): quantities and sales
+    summed, popularity fields from the first row that has them. Values stay strings, as
+    stored in the packaging draft; a field no row had a number for keeps its first value.
+    """
+    products = {}
+    totals = {}
+    for row in rows:
+        name = row['product_name']
+        product = products.get(name)
+        if product is None:
+            products[name] = dict(row)
+            totals[name] = {field: _to_decimal(row[field]) if row[field] else None for field in SUMMED_FIELDS}
+            continue
+        for field in SUMMED_FIELDS:
+            value = _to_decimal(row[field]) if row[field] else None
+            if value is not None:
+                current = totals[name][field]
+                totals[name][field] = value if current is None else current + value
+        for field in ('popularity', 'popularity_category'):
+            if not product[field]:
+                product[field] = row[field]
+
+    for name, product in products.items():
+        for field in SUMMED_FIELDS:
+            if totals[name][field] is not None:
+                product[field] = str(totals[name][field])
+    return list(products.values())
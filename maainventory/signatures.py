@@ -0,0 +1,57 @@
+"""
+Signature images (supplier invoice and delivery signatures).
+
+Signatures are stored as PNG bytes in a BinaryField that the model manager defers,
+so listing or rendering signatures never pulls the image. The image itself is
+streamed by a dedicated endpoint; signatures never change once written, so the
+response is cacheable and revalidation is answered before the blob is read.
+"""
+
+import base64
+import binascii
+from io import BytesIO
+
+from django.http import FileResponse, Http404
+from django.utils.cache import get_conditional_response
+
+
+SIGNATURE_CONTENT_TYPE = 'image/png'
+SIGNATURE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+
+def decode_signature_data(value):
+    """
+    Signature pad output (base64 or a data:image/png;base64,... URL) -> PNG bytes.
+    Raises ValueError when the data is not valid base64.
+    """
+    if value.startswith('data:') and ',' in value:
+        value = value.split(',', 1)[1]
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError('Invalid signature data')
+
+
+def signature_etag(signature):
+    return f'"sig-{signature.pk}-{int(signature.signed_at.timestamp())}"'
+
+
+def signature_image_response(request, signatures):
+    """
+    Stream the image of the first signature in `signatures` (a queryset).
+    The metadata query is answered first so a matching If-None-Match never loads the image.
+    """
+    signature = signatures.only('id', 'signed_at').first()
+    if signature is None:
+        raise Http404('No signature')
+
+    etag = signature_etag(signature)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        image = signatures.model.objects.filter(pk=signature.pk).values_list('signature_image', flat=True).first()
+        if not image:
+            raise Http404('No signature image')
+        response = FileResponse(BytesIO(bytes(image)), content_type=SIGNATURE_CONTENT_TYPE)
+    response['ETag'] = etag
+    response['Cache-Control'] = SIGNATURE_CACHE_CONTROL
+    return response
@@ -0,0 +1,176 @@
+"""
+Warehouse stock as of any moment, from StockLedger checkpoints.
+
+checkpoint_stock_ledger stores the balance of every item/variation/location as of local
+midnight, computed from the previous checkpoint plus the ledger rows since (the first
+checkpoint replays the whole ledger once). stock_as_of() then answers "what was on hand
+at T" from the latest checkpoint at or before T plus the ledger rows between the two,
+so the cost depends on the activity since the checkpoint, not on the ledger's age.
+
+A ledger row moves stock into to_location and/or out of from_location: with only one of
+them set, qty_change (signed) applies to that location; with both set it is a transfer
+of abs(qty_change). Rows with neither are not location stock and are ignored.
+
+verify_stock_balances recomputes the current balances the same way and records the
+StockBalance rows that disagree as StockBalanceDrift.
+"""
+
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Max, Sum, When
+from django.db.models.functions import Abs
+from django.utils import timezone
+
+from .models import Item, StockBalance, StockBalanceDrift, StockCheckpoint, StockLedger
+from .rollups import local_midnight
+
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+QTY = DecimalField(max_digits=12, decimal_places=2)
+
+_INTO = Case(When(from_location__isnull=False, then=Abs('qty_change')), default=F('qty_change'), output_field=QTY)
+_OUT_OF = Case(When(to_location__isnull=False, then=-Abs('qty_change')), default=F('qty_change'), output_field=QTY)
+
+
+def _add(balances, rows):
+    for item_id, variation_id, location_id, qty in rows:
+        key = (item_id, variation_id, location_id)
+        balances[key] = balances.get(key, ZERO) + (qty or ZERO)
+
+
+def _ledger_deltas(balances, since=None, until=None, location_ids=None, item_ids=None):
+    """Add the per item/variation/location effect of ledger rows in [since, until) to `balances`."""
+    ledger = StockLedger.objects.all()
+    if since is not None:
+        ledger = ledger.filter(created_at__gte=since)
+    if until is not None:
+        ledger = ledger.filter(created_at__lt=until)
+    if item_ids is not None:
+        ledger = ledger.filter(item_id__in=item_ids)
+    for side, effect in (('to_location', _INTO), ('from_location', _OUT_OF)):
+        rows = ledger.filter(**{f'{side}__isnull': False})
+        if location_ids is not None:
+            rows = rows.filter(**{f'{side}__in': location_ids})
+        _add(balances, (
+            rows.order_by().values('item_id', 'variation_id', side)
+            .annotate(total=Sum(effect))
+            .values_list('item_id', 'variation_id', side, 'total')
+        ))
+
+
+def _checkpoint_before(at=None, inclusive=True):
+    checkpoints = StockCheckpoint.objects.all()
+    if at is not None:
+        checkpoints = checkpoints.filter(taken_at__lte=at) if inclusive else checkpoints.filter(taken_at__lt=at)
+    return checkpoints.aggregate(Max('taken_at'))['taken_at__max']
+
+
+def _balances(at=None, location_ids=None, item_ids=None):
+    """
+    {(item_id, variation_id, location_id): qty} from the latest checkpoint at or before
+    `at` plus the ledger since (at=None: everything committed so far).
+    """
+    balances = {}
+    checkpoint_at = _checkpoint_before(at)
+    if checkpoint_at is not None:
+        rows = StockCheckpoint.objects.filter(taken_at=checkpoint_at)
+        if location_ids is not None:
+            rows = rows.filter(location_id__in=location_ids)
+        if item_ids is not None:
+            rows = rows.filter(item_id__in=item_ids)
+        _add(balances, rows.values_list('item_id', 'variation_id', 'location_id', 'quantity'))
+    _ledger_deltas(balances, since=checkpoint_at, until=at, location_ids=location_ids, item_ids=item_ids)
+    return balances
+
+
+# ============================================================================
+# Checkpoints
+# ============================================================================
+
+def take_checkpoint(day=None):
+    """
+    Store ledger balances as of the start of `day` (default: today, local time). Returns
+    the number of rows written, or None when that checkpoint already exists.
+    """
+    taken_at = local_midnight(day or timezone.localdate())
+    with transaction.atomic():
+        if StockCheckpoint.objects.filter(taken_at=taken_at).exists():
+            return None
+        balances = {}
+        previous_at = _checkpoint_before(taken_at, inclusive=False)
+        if previous_at is not None:
+            _add(balances, StockCheckpoint.objects.filter(taken_at=previous_at).values_list(
+                'item_id', 'variation_id', 'location_id', 'quantity',
+            ))
+        _ledger_deltas(balances, since=previous_at, until=taken_at)
+        rows = [
+            StockCheckpoint(taken_at=taken_at, item_id=item_id, variation_id=variation_id, location_id=location_id, quantity=qty)
+            for (item_id, variation_id, location_id), qty in balances.items() if qty
+        ]
+        StockCheckpoint.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+# ============================================================================
+# Stock and value as of a moment
+# ============================================================================
+
+def stock_as_of(at, location_ids=None, item_ids=None):
+    """
+    Warehouse stock as of the aware datetime `at`:
+    {'rows': [{'item_id', 'variation_id', 'location_id', 'quantity', 'value'}], 'total_value'}.
+    Value is quantity x the item's current price_per_unit (as on the reports page); zero
+    balances are omitted.
+    """
+    balances = {key: qty for key, qty in _balances(at, location_ids, item_ids).items() if qty}
+    prices = dict(
+        Item.objects.filter(id__in={item_id for item_id, _, _ in balances}).values_list('id', 'price_per_unit')
+    )
+    rows = []
+    total_value = ZERO
+    for (item_id, variation_id, location_id), qty in balances.items():
+        value = (qty * (prices.get(item_id) or ZERO)).quantize(CENT)
+        total_value += value
+        rows.append({'item_id': item_id, 'variation_id': variation_id, 'location_id': location_id, 'quantity': qty, 'value': value})
+    return {'rows': rows, 'total_value': total_value}
+
+
+# ============================================================================
+# Verification
+# ============================================================================
+
+def verify_balances():
+    """
+    Recompute current balances from the ledger, compare them with StockBalance and replace
+    StockBalanceDrift with the disagreements. Returns the number of drifting rows.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Ledger and balances read from one snapshot, so in-flight movements don't show as drift
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        ledger = _balances()
+        drifts = []
+        for item_id, variation_id, location_id, qty_on_hand in StockBalance.objects.values_list(
+            'item_id', 'variation_id', 'location_id', 'qty_on_hand',
+        ):
+            expected = ledger.pop((item_id, variation_id, location_id), ZERO)
+            if expected != qty_on_hand:
+                drifts.append((item_id, variation_id, location_id, expected, qty_on_hand))
+        # Ledger stock with no StockBalance row at all
+        drifts.extend(
+            (item_id, variation_id, location_id, qty, ZERO)
+            for (item_id, variation_id, location_id), qty in ledger.items() if qty
+        )
+        StockBalanceDrift.objects.all().delete()
+        StockBalanceDrift.objects.bulk_create([
+            StockBalanceDrift(
+                detected_at=now, item_id=item_id, variation_id=variation_id, location_id=location_id,
+                ledger_qty=ledger_qty, balance_qty=balance_qty,
+            )
+            for item_id, variation_id, location_id, ledger_qty, balance_qty in drifts
+        ], batch_size=1000)
+    return len(drifts)
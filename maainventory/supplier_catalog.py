@@ -0,0 +1,61 @@
+"""
+Per-supplier item catalog used by the price-discussion modal.
+
+The suppliers page no longer embeds every supplier's items; the modal fetches one
+supplier's list on demand. Lists are cached per supplier and dropped whenever one of
+its SupplierItems (or an Item they point at) is saved or deleted.
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .models import Item, SupplierItem
+
+
+SUPPLIER_ITEMS_CACHE_TIMEOUT = 60 * 30
+
+
+def supplier_items_cache_key(supplier_id):
+    return f'supplier_items:{supplier_id}'
+
+
+def get_supplier_items(supplier_id):
+    """Active items for one supplier, as plain dicts (cached)."""
+    key = supplier_items_cache_key(supplier_id)
+    items = cache.get(key)
+    if items is None:
+        items = [
+            {
+                'id': supplier_item.id,
+                'item_code': supplier_item.item.item_code,
+                'item_name': supplier_item.item.name,
+                'variation': supplier_item.variation.variation_name if supplier_item.variation else None,
+                'current_price': float(supplier_item.price_per_unit),
+                'base_unit': supplier_item.base_unit.abbreviation if supplier_item.base_unit else supplier_item.item.base_unit,
+            }
+            for supplier_item in SupplierItem.objects.filter(
+                supplier_id=supplier_id, is_active=True
+            ).select_related('item', 'variation', 'base_unit').order_by('item__item_code')
+        ]
+        cache.set(key, items, SUPPLIER_ITEMS_CACHE_TIMEOUT)
+    return items
+
+
+def invalidate_supplier_items(supplier_ids):
+    cache.delete_many([supplier_items_cache_key(supplier_id) for supplier_id in supplier_ids])
+
+
+def _supplier_item_changed(sender, instance, **kwargs):
+    invalidate_supplier_items([instance.supplier_id])
+
+
+def _item_changed(sender, instance, **kwargs):
+    supplier_ids = SupplierItem.objects.filter(item_id=instance.pk).values_list('supplier_id', flat=True).distinct()
+    invalidate_supplier_items(list(supplier_ids))
+
+
+def connect_signals():
+    """Called from MaainventoryConfig.ready()."""
+    post_save.connect(_supplier_item_changed, sender=SupplierItem, dispatch_uid='supplier_catalog_supplier_item_saved')
+    post_delete.connect(_supplier_item_changed, sender=SupplierItem, dispatch_uid='supplier_catalog_supplier_item_deleted')
+    post_save.connect(_item_changed, sender=Item, dispatch_uid='supplier_catalog_item_saved')
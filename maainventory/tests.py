@@ -1,3 +1,629 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from http.server import ThreadingHTTPServer
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .foodics_sync import FoodicsError, sync_foodics
+from .management.commands.foodics_mock_server import Handler, mock_orders
+from .models import (
+    Branch, BranchInventory, BranchInventoryMovement, BranchPackagingRule, BranchPackagingRuleItem, Brand,
+    FoodicsBranchMapping, IntegrationFoodics, InventoryLocation, Item, ItemConsumptionDaily, ItemRequest,
+    Request, RequestItem, StockBalance, StockLedger, Supplier, SupplierCategory, SupplierItem, SupplierOrder,
+    SupplierOrderItem, SupplierPriceDiscussion, UserProfile,
+)
+from .reporting import SECTIONS, compute_sections
+from .rollups import refresh_daily_facts, refresh_supplier_spend
+
+
+# ============================================================================
+# Reports: query layer vs the original per-row loops
+# ============================================================================
+
+def legacy_report_context(start_date, end_date):
+    """
+    The reports page context as views.reports computed it before the query layer
+    (reporting.py): one query per supplier/order/row, summed in Python. Kept as the
+    reference the sections are checked against; only request parsing and rendering
+    are left out.
+    """
+    created_date_range = (start_date, end_date)
+    discussed_date_range = (start_date, end_date)
+    consumption_date_range = (start_date, end_date)
+
+    # Supplier Spending Report
+    supplier_spending = []
+    suppliers = Supplier.objects.filter(is_active=True).select_related('category')
+
+    for supplier in suppliers:
+        orders = SupplierOrder.objects.filter(supplier=supplier, created_at__date__range=created_date_range)
+        total_spent = Decimal('0.00')
+        order_count = 0
+        for order in orders:
+            order_items = SupplierOrderItem.objects.filter(supplier_order=order)
+            for item in order_items:
+                total_spent += item.qty_ordered * item.price_per_unit
+            if order_items.exists():
+                order_count += 1
+
+        if total_spent > 0:
+            supplier_spending.append({
+                'supplier_name': supplier.name,
+                'category': supplier.category.name if supplier.category else 'Uncategorized',
+                'total_spent': float(total_spent),
+                'order_count': order_count,
+                'avg_order_value': float(total_spent / order_count) if order_count > 0 else 0,
+            })
+    supplier_spending.sort(key=lambda x: x['total_spent'], reverse=True)
+
+    # Purchase Order Financial Summary
+    po_summary = {
+        'total_orders': SupplierOrder.objects.filter(created_at__date__range=created_date_range).count(),
+        'total_value': Decimal('0.00'),
+        'by_status': {},
+        'avg_order_value': Decimal('0.00'),
+    }
+    status_counts = {}
+    for order in SupplierOrder.objects.filter(created_at__date__range=created_date_range):
+        status = order.get_status_display()
+        status_counts[status] = status_counts.get(status, 0) + 1
+        order_items = SupplierOrderItem.objects.filter(supplier_order=order)
+        po_summary['total_value'] += sum(item.qty_ordered * item.price_per_unit for item in order_items)
+    po_summary['by_status'] = status_counts
+    if po_summary['total_orders'] > 0:
+        po_summary['avg_order_value'] = po_summary['total_value'] / po_summary['total_orders']
+
+    # Stock Level Report
+    stock_levels = []
+    for location in InventoryLocation.objects.filter(type='WAREHOUSE'):
+        stock_balances = StockBalance.objects.filter(location=location, item__is_active=True).select_related('item')
+        location_total_value = Decimal('0.00')
+        low_stock_count = 0
+        for balance in stock_balances:
+            location_total_value += balance.qty_on_hand * (balance.item.price_per_unit or Decimal('0'))
+            if balance.qty_on_hand < balance.item.min_stock_qty:
+                low_stock_count += 1
+        stock_levels.append({
+            'location_name': location.name,
+            'total_items': stock_balances.count(),
+            'low_stock_count': low_stock_count,
+            'total_value': float(location_total_value),
+        })
+
+    # Low Stock Items
+    low_stock_items = []
+    for stock in StockBalance.objects.filter(
+        item__is_active=True, location__type='WAREHOUSE'
+    ).select_related('item', 'variation', 'location'):
+        if stock.qty_on_hand < stock.item.min_stock_qty:
+            low_stock_items.append({
+                'item_code': stock.item.item_code,
+                'item_name': stock.item.name,
+                'variation': stock.variation.variation_name if stock.variation else None,
+                'location': stock.location.name,
+                'current_stock': float(stock.qty_on_hand),
+                'min_stock': float(stock.item.min_stock_qty),
+                'shortage': float(stock.item.min_stock_qty - stock.qty_on_hand),
+                'base_unit': stock.item.base_unit,
+            })
+
+    # Stock Movement Report
+    stock_movements = StockLedger.objects.filter(
+        created_at__date__range=created_date_range
+    ).select_related('item', 'from_location', 'to_location')[:100]
+    movement_summary = {
+        'total_movements': StockLedger.objects.filter(created_at__date__range=created_date_range).count(),
+        'by_reason': {},
+        'incoming': Decimal('0.00'),
+        'outgoing': Decimal('0.00'),
+    }
+    for movement in StockLedger.objects.filter(created_at__date__range=created_date_range):
+        reason = movement.get_reason_display()
+        movement_summary['by_reason'][reason] = movement_summary['by_reason'].get(reason, 0) + 1
+        if movement.qty_change > 0:
+            movement_summary['incoming'] += movement.qty_change
+        else:
+            movement_summary['outgoing'] += abs(movement.qty_change)
+
+    # Request Performance Report
+    requests_data = Request.objects.filter(created_at__date__range=created_date_range).select_related('branch')
+    request_summary = {
+        'total_requests': requests_data.count(),
+        'by_status': {},
+        'by_branch': {},
+        'avg_fulfillment_days': None,
+        'approval_rate': None,
+    }
+    fulfillment_times = []
+    approved_count = 0
+    rejected_count = 0
+    for req in requests_data:
+        status = req.get_status_display()
+        request_summary['by_status'][status] = request_summary['by_status'].get(status, 0) + 1
+        request_summary['by_branch'][req.branch.name] = request_summary['by_branch'].get(req.branch.name, 0) + 1
+        if req.status in ('Approved', 'WarehouseProcessing', 'ReadyForDelivery', 'InProcess', 'OutForDelivery', 'Delivered', 'Completed'):
+            approved_count += 1
+        elif req.status == 'Rejected':
+            rejected_count += 1
+        if req.status == 'Completed' and req.approved_at:
+            days = (req.updated_at.date() - req.approved_at.date()).days
+            if days >= 0:
+                fulfillment_times.append(days)
+    if fulfillment_times:
+        request_summary['avg_fulfillment_days'] = sum(fulfillment_times) / len(fulfillment_times)
+    total_reviewed = approved_count + rejected_count
+    if total_reviewed > 0:
+        request_summary['approval_rate'] = (approved_count / total_reviewed) * 100
+
+    # Most Requested Items
+    requested_items = RequestItem.objects.filter(
+        request__created_at__date__range=created_date_range
+    ).values('item__item_code', 'item__name').annotate(
+        total_requested=Sum('qty_requested'),
+        request_count=Count('request', distinct=True),
+    ).order_by('-total_requested')[:20]
+
+    # Purchase Order Status Report
+    po_status_report = {
+        'total_orders': SupplierOrder.objects.filter(created_at__date__range=created_date_range).count(),
+        'by_status': {},
+        'by_supplier': {},
+        'avg_delivery_days': None,
+    }
+    for order in SupplierOrder.objects.filter(created_at__date__range=created_date_range).select_related('supplier'):
+        status = order.get_status_display()
+        po_status_report['by_status'][status] = po_status_report['by_status'].get(status, 0) + 1
+        po_status_report['by_supplier'][order.supplier.name] = po_status_report['by_supplier'].get(order.supplier.name, 0) + 1
+
+    # Item Request Report
+    item_requests_data = ItemRequest.objects.filter(created_at__date__range=created_date_range).select_related('supplier')
+    item_request_summary = {
+        'total_requests': item_requests_data.count(),
+        'by_status': {},
+        'by_supplier': {},
+        'avg_delivery_days_min': None,
+        'avg_delivery_days_max': None,
+    }
+    delivery_days_min_list = []
+    delivery_days_max_list = []
+    for ir in item_requests_data:
+        status = ir.get_status_display()
+        item_request_summary['by_status'][status] = item_request_summary['by_status'].get(status, 0) + 1
+        item_request_summary['by_supplier'][ir.supplier.name] = item_request_summary['by_supplier'].get(ir.supplier.name, 0) + 1
+        if ir.delivery_days_min:
+            delivery_days_min_list.append(ir.delivery_days_min)
+        if ir.delivery_days_max:
+            delivery_days_max_list.append(ir.delivery_days_max)
+    if delivery_days_min_list:
+        item_request_summary['avg_delivery_days_min'] = sum(delivery_days_min_list) / len(delivery_days_min_list)
+    if delivery_days_max_list:
+        item_request_summary['avg_delivery_days_max'] = sum(delivery_days_max_list) / len(delivery_days_max_list)
+
+    # Item Consumption Report
+    consumption_data = ItemConsumptionDaily.objects.filter(date__range=consumption_date_range).select_related('item', 'branch')
+    consumption_summary = {
+        'total_records': consumption_data.count(),
+        'total_consumed': Decimal('0.00'),
+        'by_branch': {},
+        'by_item': {},
+        'top_items': [],
+    }
+    for record in consumption_data:
+        consumption_summary['total_consumed'] += record.qty_consumed
+        branch_name = record.branch.name
+        consumption_summary['by_branch'][branch_name] = consumption_summary['by_branch'].get(branch_name, Decimal('0')) + record.qty_consumed
+        item_code = record.item.item_code
+        consumption_summary['by_item'][item_code] = consumption_summary['by_item'].get(item_code, Decimal('0')) + record.qty_consumed
+    for item_code, qty in sorted(consumption_summary['by_item'].items(), key=lambda x: x[1], reverse=True)[:10]:
+        item = Item.objects.filter(item_code=item_code).first()
+        if item:
+            consumption_summary['top_items'].append({
+                'item_code': item_code,
+                'item_name': item.name,
+                'total_consumed': float(qty),
+                'base_unit': item.base_unit,
+            })
+
+    # Supplier Performance Report
+    supplier_performance = []
+    for supplier in suppliers:
+        orders = SupplierOrder.objects.filter(supplier=supplier, created_at__date__range=created_date_range)
+        if orders.exists():
+            total_orders = orders.count()
+            received_orders = orders.filter(status='Received').count()
+            supplier_performance.append({
+                'supplier_name': supplier.name,
+                'total_orders': total_orders,
+                'received_orders': received_orders,
+                'completion_rate': (received_orders / total_orders * 100) if total_orders > 0 else 0,
+                'item_requests': ItemRequest.objects.filter(supplier=supplier, created_at__date__range=created_date_range).count(),
+            })
+
+    # Latest Price Discussions
+    price_discussions_list = []
+    for discussion in SupplierPriceDiscussion.objects.filter(
+        discussed_date__date__range=discussed_date_range
+    ).select_related('supplier_item', 'supplier_item__supplier', 'supplier_item__item').order_by('-discussed_date')[:50]:
+        if discussion.old_price:
+            price_diff = discussion.discussed_price - discussion.old_price
+        else:
+            price_diff = discussion.discussed_price - discussion.supplier_item.price_per_unit
+        price_discussions_list.append({
+            'discussion': discussion,
+            'old_price': float(discussion.old_price) if discussion.old_price else None,
+            'new_price': float(discussion.discussed_price),
+            'price_difference': float(price_diff),
+        })
+
+    discussions_by_supplier = {}
+    for discussion in SupplierPriceDiscussion.objects.filter(
+        discussed_date__date__range=discussed_date_range
+    ).select_related('supplier_item__supplier'):
+        supplier_name = discussion.supplier_item.supplier.name
+        discussions_by_supplier[supplier_name] = discussions_by_supplier.get(supplier_name, 0) + 1
+
+    price_trends = []
+    for supplier_item in SupplierItem.objects.filter(
+        price_discussions__discussed_date__date__range=discussed_date_range
+    ).distinct().select_related('supplier', 'item', 'variation'):
+        discussions = SupplierPriceDiscussion.objects.filter(
+            supplier_item=supplier_item, discussed_date__date__range=discussed_date_range
+        ).order_by('discussed_date')
+        first_price = float(discussions.first().discussed_price)
+        last_price = float(discussions.last().discussed_price)
+        price_change = last_price - first_price
+        price_trends.append({
+            'supplier_name': supplier_item.supplier.name,
+            'item_code': supplier_item.item.item_code,
+            'item_name': supplier_item.item.name,
+            'variation': supplier_item.variation.variation_name if supplier_item.variation else None,
+            'current_price': float(supplier_item.price_per_unit),
+            'latest_discussed_price': last_price,
+            'first_price': first_price,
+            'price_change': price_change,
+            'price_change_percent': ((price_change / first_price) * 100) if first_price > 0 else 0,
+            'discussion_count': discussions.count(),
+            'latest_discussion_date': discussions.last().discussed_date.date(),
+        })
+    price_trends.sort(key=lambda x: x['latest_discussion_date'], reverse=True)
+
+    return {
+        'supplier_spending': supplier_spending[:20],
+        'po_summary': {
+            'total_orders': po_summary['total_orders'],
+            'total_value': float(po_summary['total_value']),
+            'avg_order_value': float(po_summary['avg_order_value']),
+            'by_status': po_summary['by_status'],
+        },
+        'stock_levels': stock_levels,
+        'low_stock_items': low_stock_items[:50],
+        'stock_movements': list(stock_movements),
+        'movement_summary': {
+            'total_movements': movement_summary['total_movements'],
+            'by_reason': movement_summary['by_reason'],
+            'incoming': float(movement_summary['incoming']),
+            'outgoing': float(movement_summary['outgoing']),
+        },
+        'request_summary': request_summary,
+        'requested_items': list(requested_items),
+        'po_status_report': po_status_report,
+        'item_request_summary': item_request_summary,
+        'consumption_summary': {
+            'total_records': consumption_summary['total_records'],
+            'total_consumed': float(consumption_summary['total_consumed']),
+            'by_branch': {k: float(v) for k, v in consumption_summary['by_branch'].items()},
+            'top_items': consumption_summary['top_items'],
+        },
+        'supplier_performance': supplier_performance[:20],
+        'price_discussions': price_discussions_list,
+        'discussions_by_supplier': discussions_by_supplier,
+        'price_trends': price_trends[:30],
+    }
+
+
+def _plain(value):
+    """Numbers as floats rounded to 6 places (Decimal vs float, Avg vs sum/len), recursively."""
+    if isinstance(value, (Decimal, float)):
+        return round(float(value), 6)
+    if isinstance(value, dict):
+        return {key: _plain(entry) for key, entry in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(entry) for entry in value]
+    return value
+
+
+def _only(rows, keys):
+    return [{key: row[key] for key in keys} for row in rows]
+
+
+def _legacy_section(legacy, name):
+    """The legacy context entries of one section, in the section's (plain value) shape."""
+    if name == 'stock_movements':
+        return {
+            'stock_movements': [
+                {
+                    'created_at': movement.created_at,
+                    'item': {'item_code': movement.item.item_code, 'name': movement.item.name},
+                    'from_location': {'name': movement.from_location.name} if movement.from_location else None,
+                    'to_location': {'name': movement.to_location.name} if movement.to_location else None,
+                    'qty_change': float(movement.qty_change),
+                    'reason': movement.get_reason_display(),
+                }
+                for movement in legacy['stock_movements']
+            ],
+            'movement_summary': legacy['movement_summary'],
+        }
+    if name == 'price_discussions':
+        return {
+            'price_discussions': [
+                {
+                    'discussed_date': row['discussion'].discussed_date,
+                    'item_code': row['discussion'].supplier_item.item.item_code,
+                    'old_price': row['old_price'],
+                    'new_price': row['new_price'],
+                    'price_difference': row['price_difference'],
+                }
+                for row in legacy['price_discussions']
+            ],
+            'discussions_by_supplier': legacy['discussions_by_supplier'],
+            'price_trends': legacy['price_trends'],
+        }
+    return {key: legacy[key] for key in SECTION_KEYS[name]}
+
+
+def _section(section_context, name):
+    """The section's entries restricted to what the legacy page had (new fields are dropped)."""
+    if name == 'supplier_performance':
+        return {'supplier_performance': _only(section_context['supplier_performance'], (
+            'supplier_name', 'total_orders', 'received_orders', 'completion_rate', 'item_requests',
+        ))}
+    if name == 'price_discussions':
+        # price_trends_chart replaced the per-discussion JSON history and is not compared
+        trend_keys = (
+            'supplier_name', 'item_code', 'item_name', 'variation', 'current_price', 'latest_discussed_price',
+            'first_price', 'price_change', 'price_change_percent', 'discussion_count', 'latest_discussion_date',
+        )
+        return {
+            'price_discussions': _only(section_context['price_discussions'], (
+                'discussed_date', 'item_code', 'old_price', 'new_price', 'price_difference',
+            )),
+            'discussions_by_supplier': section_context['discussions_by_supplier'],
+            'price_trends': _only(section_context['price_trends'], trend_keys),
+        }
+    return section_context
+
+
+# Context entries each section produces (sections returning several are handled above)
+SECTION_KEYS = {name: (name,) for name in SECTIONS}
+
+
+class ReportSectionsMatchLegacyTests(TestCase):
+    """
+    Every reporting section gives the same figures as the original views.reports loops.
+    The dataset sticks to what both count the same way: no Draft or Cancelled POs
+    (not spend since the rollups) and no Draft branch requests (not sent yet).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        cls.start_date = today - timedelta(days=20)
+        cls.end_date = today
+
+        def at(days_ago, hour=12):
+            return timezone.make_aware(datetime.combine(today - timedelta(days=days_ago), time(hour)))
+
+        user = User.objects.create_user(username='buyer', password='x')
+        UserProfile.objects.create(user=user, full_name='Procurement Buyer')
+        brand = Brand.objects.create(name='Brand')
+        branches = [Branch.objects.create(name=f'Branch {n}', brand=brand) for n in range(3)]
+        items = [
+            Item.objects.create(
+                item_code=f'IT{n:03d}', name=f'Item {n}', brand=brand, base_unit='pcs',
+                min_order_qty=1, min_stock_qty=10 + n, price_per_unit=[None, Decimal('1.25'), Decimal('3.00')][n % 3],
+                is_active=n != 7,
+            )
+            for n in range(12)
+        ]
+        warehouses = [InventoryLocation.objects.create(name=f'Warehouse {n}', type='WAREHOUSE') for n in range(2)]
+        for w, warehouse in enumerate(warehouses):
+            for n, item in enumerate(items):
+                StockBalance.objects.create(item=item, location=warehouse, qty_on_hand=Decimal(n * 3 + w * 7))
+
+        category = SupplierCategory.objects.create(name='Report test category')
+        order_statuses = ['Sent', 'Received', 'Received', 'Confirmed']
+        for s in range(5):
+            supplier = Supplier.objects.create(
+                name=f'Supplier {s}', email='s@example.com', phone='1', category=category if s % 2 else None,
+                is_active=s != 4,
+            )
+            for o in range(4):
+                order = SupplierOrder.objects.create(
+                    po_code=f'PO-{s}-{o}', supplier=supplier, created_by=user, status=order_statuses[(s + o) % 4],
+                )
+                SupplierOrder.objects.filter(pk=order.pk).update(created_at=at(o * 9 + s))
+                for n in range(o % 3):
+                    SupplierOrderItem.objects.create(
+                        supplier_order=order, item=items[(s + o + n) % 12],
+                        qty_ordered=Decimal(s + n + 2), price_per_unit=Decimal(f'{s + 1}.{o}5'),
+                    )
+            for r in range(2):
+                item_request = ItemRequest.objects.create(
+                    request_code=f'IR-{s}-{r}', supplier=supplier, created_by=user, status='Pending' if r else 'Ready',
+                    delivery_days_min=s + r + 1, delivery_days_max=s + r + 10,
+                )
+                ItemRequest.objects.filter(pk=item_request.pk).update(created_at=at(r * 25 + s))
+            for i in range(2):
+                supplier_item = SupplierItem.objects.create(
+                    supplier=supplier, item=items[s * 2 + i], price_per_unit=Decimal('2.00'), min_order_qty=1,
+                )
+                for d in range(s % 3 + 1):
+                    SupplierPriceDiscussion.objects.create(
+                        supplier_item=supplier_item, old_price=Decimal('2.00') if d % 2 else None,
+                        discussed_price=Decimal(f'{2 + d}.{s}{i}'), discussed_date=at(d * 11 + s + i, hour=9 + i),
+                        discussed_by=user,
+                    )
+
+        request_statuses = ['Pending', 'Approved', 'Rejected', 'Completed', 'Delivered']
+        for r in range(15):
+            req = Request.objects.create(
+                request_code=f'REQ-T-{r}', branch=branches[r % 3], requested_by=user,
+                status=request_statuses[r % 5], date_of_order=at(r * 2), approved_at=at(r * 2 + r % 4),
+            )
+            Request.objects.filter(pk=req.pk).update(created_at=at(r * 2))
+            for n in range(r % 4 + 1):
+                RequestItem.objects.create(request=req, item=items[(r + n * 5) % 12], qty_requested=Decimal(r + n + 1))
+
+        for m in range(30):
+            movement = StockLedger.objects.create(
+                item=items[m % 12], qty_change=Decimal(m % 7 - 3),
+                from_location=warehouses[0] if m % 3 == 0 else None,
+                to_location=warehouses[1] if m % 3 else None,
+                reason=['OTHER', 'DELIVERY_RECEIVED'][m % 2],
+            )
+            StockLedger.objects.filter(pk=movement.pk).update(created_at=at(m, hour=m % 24))
+
+        for d in range(25):
+            for b, branch in enumerate(branches):
+                ItemConsumptionDaily.objects.create(
+                    date=today - timedelta(days=d), branch=branch, item=items[(d + b) % 12],
+                    source='FOODICS', qty_consumed=Decimal(d * 3 + b + 1),
+                )
+
+        refresh_supplier_spend(full=True)
+        refresh_daily_facts(full=True)
+
+    def test_every_section_matches_legacy_loops(self):
+        legacy = legacy_report_context(self.start_date, self.end_date)
+        for name in SECTIONS:
+            with self.subTest(section=name):
+                section_context, _ = compute_sections(self.start_date, self.end_date, [name], max_workers=1)
+                self.assertEqual(_plain(_section(section_context, name)), _plain(_legacy_section(legacy, name)))
+
+    def test_dataset_covers_every_section(self):
+        legacy = legacy_report_context(self.start_date, self.end_date)
+        for key in (
+            'supplier_spending', 'low_stock_items', 'stock_movements', 'requested_items',
+            'supplier_performance', 'price_discussions', 'price_trends',
+        ):
+            self.assertTrue(legacy[key], key)
+        self.assertTrue(legacy['request_summary']['avg_fulfillment_days'] is not None)
+        self.assertTrue(legacy['consumption_summary']['top_items'])
+
+
+# ============================================================================
+# Foodics sync against the mock API
+# ============================================================================
+
+class MockFoodicsHandler(Handler):
+    products = ['Big Tasty', 'Fries', 'Cola']
+    orders_per_day = 30
+    page_size = 10
+    latency = 0
+
+
+class FailingFoodicsHandler(MockFoodicsHandler):
+    def do_GET(self):
+        self.send_response(500)
+        self.send_header('Retry-After', '0')  # Retry at once
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class FoodicsSyncTests(TestCase):
+    # Product -> {item index: qty per unit}; Cola has no rule
+    RULES = {'Big Tasty': {0: Decimal('1'), 1: Decimal('2')}, 'Fries': {2: Decimal('0.5')}}
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name='Foodics brand')
+        cls.items = [
+            Item.objects.create(item_code=f'PK{n}', name=f'Packaging {n}', brand=brand, base_unit='pcs', min_order_qty=1, min_stock_qty=0)
+            for n in range(3)
+        ]
+        cls.branches = [Branch.objects.create(name=f'Foodics branch {n}', brand=brand) for n in range(2)]
+        for n, branch in enumerate(cls.branches):
+            FoodicsBranchMapping.objects.create(branch=branch, foodics_branch_external_id=f'ext-{n}')
+            for item in cls.items:
+                BranchInventory.objects.create(branch=branch, brand=brand, item=item, quantity=Decimal('10000'))
+            for product_name, components in cls.RULES.items():
+                rule = BranchPackagingRule.objects.create(branch=branch, product_name=product_name)
+                for index, qty in components.items():
+                    BranchPackagingRuleItem.objects.create(rule=rule, inventory_item=cls.items[index], quantity_per_unit=qty)
+        cls.integration = IntegrationFoodics.objects.create(is_enabled=True)
+
+    def setUp(self):
+        cache.clear()  # Rule indexes are cached per branch id
+
+    def serve(self, handler):
+        """Start `handler` on a free port for this test; returns the API base URL."""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_address[1]}/v5'
+
+    def sync(self, handler=MockFoodicsHandler):
+        with override_settings(FOODICS_API_BASE_URL=self.serve(handler), FOODICS_SYNC_INITIAL_DAYS=2):
+            return sync_foodics()
+
+    def expected_consumption(self, n, day):
+        """{item id: qty} the mock's closed orders for branch n on `day` should record."""
+        expected = {}
+        orders = mock_orders(f'ext-{n}', day.isoformat(), MockFoodicsHandler.products, MockFoodicsHandler.orders_per_day)
+        for order in orders:
+            if order['status'] != 4:
+                continue
+            for line in order['products']:
+                for index, qty in self.RULES.get(line['product']['name'], {}).items():
+                    item_id = self.items[index].id
+                    expected[item_id] = expected.get(item_id, Decimal('0')) + qty * line['quantity']
+        return expected
+
+    def inventory_state(self):
+        return (
+            list(BranchInventory.objects.order_by('id').values_list('id', 'quantity')),
+            list(BranchInventoryMovement.objects.order_by('id').values_list('id', 'item_id', 'qty_change')),
+        )
+
+    def test_sync_writes_daily_totals(self):
+        summary = self.sync()
+
+        self.assertEqual(summary['branches'], 2)
+        self.assertEqual(summary['days'], 2)
+        self.assertEqual(summary['unmatched_products'], ['Cola'])
+        today = timezone.localdate()
+        for n, branch in enumerate(self.branches):
+            for day in (today - timedelta(days=1), today):
+                recorded = dict(ItemConsumptionDaily.objects.filter(
+                    branch=branch, date=day, source=ItemConsumptionDaily.SourceType.FOODICS,
+                ).values_list('item_id', 'qty_consumed'))
+                expected = self.expected_consumption(n, day)
+                self.assertTrue(expected)
+                self.assertEqual(recorded, expected)
+
+    def test_second_run_changes_nothing(self):
+        self.sync()
+        before = self.inventory_state()
+
+        summary = self.sync()
+
+        self.assertEqual((summary['rows_created'], summary['rows_updated']), (0, 0))
+        self.assertEqual(self.inventory_state(), before)
+
+    def test_failed_run_keeps_last_sync_at(self):
+        last_sync_at = timezone.now() - timedelta(hours=3)
+        IntegrationFoodics.objects.filter(pk=self.integration.pk).update(last_sync_at=last_sync_at)
+
+        with self.assertRaises(FoodicsError):
+            self.sync(FailingFoodicsHandler)
+
+        self.assertEqual(IntegrationFoodics.objects.get(pk=self.integration.pk).last_sync_at, last_sync_at)
+        self.assertFalse(ItemConsumptionDaily.objects.exists())
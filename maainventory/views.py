@@ -1,11 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import Http404, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Sum, Q, F, DecimalField, Count, Max, Prefetch
+from django.db.models import Sum, F, DecimalField, Count, Max, Prefetch
 from django.db.models.functions import Coalesce
 from decimal import Decimal
 import json
@@ -16,8 +16,8 @@ from .models import (
     Request, RequestItem, RequestStatusHistory, Branch, Brand, ValidPunchID, UserProfile, Role,
     BranchUser,
     IntegrationFoodics, ImportJob, SystemSettings, ItemPhoto, PortalToken,
-    SupplierPriceDiscussion, BranchPackagingRule, BranchPackagingItem, BranchPackagingRuleItem,
-    BranchInventory,
+    SupplierPriceDiscussion, BranchPackagingItem,
+    BranchInventory, BranchInventoryMovement, SupplierInvoiceSignature, DeliverySignature,
 )
 
 
@@ -881,6 +881,94 @@ def inventory(request):
     return render(request, "maainventory/inventory.html", context)
 
 
+@login_required
+def stock_ledger(request):
+    """Warehouse stock ledger browser: filters plus keyset pagination (see ledger.py)"""
+    from urllib.parse import urlencode
+    from .ledger import decode_cursor, filter_ledger, ledger_page
+    from .models import StockLedger
+
+    filters = {
+        'item': request.GET.get('item', '').strip(),
+        'location': request.GET.get('location', '').strip(),
+        'reason': request.GET.get('reason', '').strip(),
+        'reference_type': request.GET.get('reference_type', '').strip(),
+        'reference_id': request.GET.get('reference_id', '').strip(),
+    }
+    location_id = int(filters['location']) if filters['location'].isdigit() else None
+
+    entries = filter_ledger(
+        item=filters['item'],
+        location_id=location_id,
+        reason=filters['reason'],
+        reference_type=filters['reference_type'],
+        reference_id=filters['reference_id'],
+    )
+    rows, older_cursor, newer_cursor = ledger_page(
+        entries,
+        after=decode_cursor(request.GET.get('after')),
+        before=decode_cursor(request.GET.get('before')),
+    )
+
+    filter_query = urlencode({key: value for key, value in filters.items() if value})
+    context = {
+        'entries': rows,
+        'filters': filters,
+        'filter_query': filter_query,
+        'older_cursor': older_cursor,
+        'newer_cursor': newer_cursor,
+        'locations': InventoryLocation.objects.order_by('name'),
+        'reasons': StockLedger.ReasonType.choices,
+        'reference_types': StockLedger.ReferenceType.choices,
+    }
+    return render(request, "maainventory/stock_ledger.html", context)
+
+
+@login_required
+def stock_as_of(request):
+    """
+    Warehouse stock and value at the end of a past day, from the nearest ledger checkpoint
+    plus the movements since (see stock_checkpoints.py). GET ?date=YYYY-MM-DD[&location=<id>].
+    """
+    from datetime import datetime, timedelta
+    from .context_processors import get_branch_user_info
+    from .rollups import local_midnight
+    from .stock_checkpoints import stock_as_of as compute_stock_as_of
+
+    # Warehouse stock and value are hidden from branch users, as on the inventory and reports pages
+    is_branch_user, _ = get_branch_user_info(request.user)
+    if is_branch_user:
+        return JsonResponse({'success': False, 'error': 'You do not have permission to view warehouse stock'}, status=403)
+
+    try:
+        day = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'date must be YYYY-MM-DD'}, status=400)
+    location = request.GET.get('location', '').strip()
+    location_ids = [int(location)] if location.isdigit() else None
+
+    result = compute_stock_as_of(local_midnight(day + timedelta(days=1)), location_ids=location_ids)
+    items = Item.objects.in_bulk({row['item_id'] for row in result['rows']})
+    variations = ItemVariation.objects.in_bulk({row['variation_id'] for row in result['rows'] if row['variation_id']})
+    locations = InventoryLocation.objects.in_bulk({row['location_id'] for row in result['rows']})
+    rows = [
+        {
+            'item_id': row['item_id'],
+            'item_code': items[row['item_id']].item_code,
+            'item_name': items[row['item_id']].name,
+            'variation_id': row['variation_id'],
+            'variation_name': variations[row['variation_id']].variation_name if row['variation_id'] in variations else None,
+            'location_id': row['location_id'],
+            'location_name': locations[row['location_id']].name,
+            'quantity': str(row['quantity']),
+            'value': str(row['value']),
+        }
+        for row in result['rows']
+    ]
+    rows.sort(key=lambda row: (row['location_name'], row['item_code'], row['variation_name'] or ''))
+    return JsonResponse({'success': True, 'date': day.isoformat(), 'total_value': str(result['total_value']), 'items': rows})
+
+
 @login_required
 def delete_item(request, code):
     """Delete an item (soft delete by setting is_active=False)"""
@@ -1112,6 +1200,9 @@ def requests(request):
             requests_queryset = requests_queryset.filter(branch_id__in=user_branch_ids)
         else:
             requests_queryset = requests_queryset.none()  # No assignments = see nothing
+    else:
+        # Par-level drafts are only visible to the branch until it submits them
+        requests_queryset = requests_queryset.exclude(status=Request.StatusType.DRAFT)
 
     # Branch dropdown filter: options are all active branches from the database
     branch_id = request.GET.get('branch')
@@ -1230,25 +1321,11 @@ def create_stock_request(request):
             if not valid_items:
                 return JsonResponse({'success': False, 'error': 'Add at least one item with quantity greater than 0.'}, status=400)
 
-            # Generate request code: REQ-YYYY-NNNNNN (6 digits to differentiate from ItemRequest)
-            current_year = datetime.now().year
-            last_req = Request.objects.filter(
-                request_code__startswith=f'REQ-{current_year}-'
-            ).order_by('-request_code').first()
-
-            if last_req:
-                try:
-                    last_num = int(last_req.request_code.split('-')[-1])
-                except (ValueError, IndexError):
-                    last_num = 0
-                new_num = last_num + 1
-            else:
-                new_num = 1
-
-            request_code = f'REQ-{current_year}-{new_num:06d}'
-
             from django.db import transaction
+            from .models import RequestCodeCounter
             with transaction.atomic():
+                # REQ-YYYY-NNNNNN (6 digits to differentiate from ItemRequest)
+                request_code = RequestCodeCounter.objects.allocate(datetime.now().year)[0]
                 req = Request.objects.create(
                     request_code=request_code,
                     branch=branch,
@@ -1362,6 +1439,7 @@ def view_request(request, request_id):
     # Branch manager for this request's branch can mark as Delivered when status is In Process or Out for Delivery
     is_branch_manager_for_this_branch = is_branch_user and user_branch_ids and req.branch_id in user_branch_ids
     can_mark_delivered = req.status in ('InProcess', 'OutForDelivery') and is_branch_manager_for_this_branch
+    can_submit_draft = req.status == Request.StatusType.DRAFT and is_branch_manager_for_this_branch
 
     items_data = []
     for ri in request_items:
@@ -1437,6 +1515,7 @@ def view_request(request, request_id):
         'can_start_fulfillment': can_start_fulfillment,
         'can_mark_out_for_delivery': can_mark_out_for_delivery,
         'can_mark_delivered': can_mark_delivered,
+        'can_submit_draft': can_submit_draft,
         'can_approve': can_approve,
         'tracking_ready_by': tracking_ready_by,
         'tracking_ready_at': tracking_ready_at,
@@ -1452,6 +1531,65 @@ def view_request(request, request_id):
     return render(request, 'maainventory/view_request.html', context)
 
 
+@login_required
+def submit_draft_request(request, request_id):
+    """
+    Submit a par-level draft request to procurement (branch manager for that branch only).
+    Optional JSON body {"items": [{"request_item_id": int, "quantity": number}]} adjusts the
+    suggested quantities; a quantity of 0 removes the item.
+    """
+    from decimal import InvalidOperation
+    from .context_processors import get_branch_user_info
+    from .par_levels import submit_draft
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+
+    req = get_object_or_404(Request, id=request_id)
+    is_branch_user, user_branch_ids = get_branch_user_info(request.user)
+    if not is_branch_user or req.branch_id not in (user_branch_ids or []):
+        return JsonResponse({'success': False, 'error': 'Only the branch manager for this branch can submit this request'}, status=403)
+
+    try:
+        data = json.loads(request.body) if request.body else {}
+        quantities = {
+            int(row['request_item_id']): Decimal(str(row['quantity']))
+            for row in (data.get('items') or [])
+        }
+    except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError, InvalidOperation):
+        return JsonResponse({'success': False, 'error': 'Invalid items'}, status=400)
+    if any(not qty.is_finite() or qty < 0 for qty in quantities.values()):
+        return JsonResponse({'success': False, 'error': 'Quantities cannot be negative'}, status=400)
+
+    try:
+        req = submit_draft(req, request.user, quantities)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    messages.success(request, f'Stock request {req.request_code} submitted for approval.')
+    return JsonResponse({'success': True, 'request_code': req.request_code})
+
+
+@login_required
+def discard_draft_request(request, request_id):
+    """Delete a par-level draft request (branch manager for that branch only)."""
+    from .context_processors import get_branch_user_info
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+
+    req = get_object_or_404(Request, id=request_id)
+    is_branch_user, user_branch_ids = get_branch_user_info(request.user)
+    if not is_branch_user or req.branch_id not in (user_branch_ids or []):
+        return JsonResponse({'success': False, 'error': 'Only the branch manager for this branch can discard this request'}, status=403)
+
+    deleted, _ = Request.objects.filter(id=req.id, status=Request.StatusType.DRAFT).delete()
+    if not deleted:
+        return JsonResponse({'success': False, 'error': 'Only draft requests can be discarded.'}, status=400)
+    messages.success(request, f'Draft request {req.request_code} discarded.')
+    return JsonResponse({'success': True, 'redirect_url': '/requests/'})
+
+
 @login_required
 def approve_reject_request(request, request_id):
     """
@@ -1672,6 +1810,10 @@ def mark_request_out_for_delivery(request, request_id):
                 notes='Logistics marked Out for Delivery.'
             )
 
+            # Delivery bill PDF is rendered by the render_documents worker
+            from .documents import enqueue_delivery_bill
+            enqueue_delivery_bill(req)
+
         messages.success(request, f'Request {req.request_code} is now Out for Delivery.')
         return JsonResponse({
             'success': True,
@@ -1715,6 +1857,7 @@ def mark_request_delivered(request, request_id):
 
     from django.db import transaction
     from django.utils import timezone
+    from .branch_ledger import movement, record_movements
 
     try:
         with transaction.atomic():
@@ -1731,6 +1874,7 @@ def mark_request_delivered(request, request_id):
             )
 
             # Add fulfilled quantities to branches_inventory (Branches page source of truth)
+            movements = []
             for ri in req.items.all():
                 qty = ri.qty_fulfilled or 0
                 if qty <= 0:
@@ -1747,6 +1891,11 @@ def mark_request_delivered(request, request_id):
                 if not created:
                     inv.quantity += qty
                     inv.save(update_fields=['quantity', 'updated_at'])
+                movements.append(movement(
+                    req.branch_id, ri.item_id, ri.variation_id, qty,
+                    BranchInventoryMovement.ReasonType.DELIVERY, BranchInventoryMovement.ReferenceType.REQUEST, req.id, request.user,
+                ))
+            record_movements(movements)
 
         messages.success(request, f'Request {req.request_code} marked as delivered. Items are now shown for branch "{req.branch.name}" on the Branches page.')
         return JsonResponse({
@@ -1915,6 +2064,10 @@ def new_request(request):
                 # Log error but don't fail the order creation
                 print(f"Error sending email: {email_error}")
             
+            # PDF copy of the invoice is rendered by the render_documents worker
+            from .documents import enqueue_invoice_pdf
+            enqueue_invoice_pdf(supplier_order)
+            
             return JsonResponse({
                 'success': True,
                 'po_code': po_code,
@@ -2363,46 +2516,58 @@ def suppliers(request):
     
     is_procurement = user_role and 'Procurement' in user_role
     
-    # Get all active suppliers
-    suppliers_queryset = Supplier.objects.filter(is_active=True).annotate(
-        total_items=Count('supplier_items', filter=Q(supplier_items__is_active=True)),
-        active_orders_count=Count('orders', filter=Q(orders__status__in=['Draft', 'Sent', 'Confirmed', 'InProduction', 'Ready', 'PartiallyReceived'])),
+    # All per-supplier figures come from one annotated query (correlated subqueries,
+    # so the counts are not multiplied by each other's joins)
+    from django.db.models import Exists, OuterRef, Subquery, IntegerField
+    from django.utils import timezone
+    
+    def count_subquery(queryset):
+        return Coalesce(Subquery(
+            queryset.order_by().values('supplier_id').annotate(c=Count('id')).values('c'),
+            output_field=IntegerField(),
+        ), 0)
+    
+    signed_orders = SupplierInvoiceSignature.objects.filter(supplier_order=OuterRef('pk'))
+    pending_invoice_orders = SupplierOrder.objects.filter(
+        supplier=OuterRef('pk')
+    ).filter(Exists(signed_orders)).exclude(status='Received')
+    hold_locations = InventoryLocation.objects.filter(type='SUPPLIER_HOLD', supplier=OuterRef('pk'))
+    hold_totals = StockBalance.objects.filter(
+        location__type='SUPPLIER_HOLD', location__supplier=OuterRef('pk')
+    ).order_by().values('location__supplier_id').annotate(total=Sum('qty_on_hand')).values('total')
+    
+    suppliers_queryset = Supplier.objects.filter(is_active=True).select_related('category').annotate(
+        total_items=count_subquery(SupplierItem.objects.filter(supplier=OuterRef('pk'), is_active=True)),
+        active_orders_count=count_subquery(SupplierOrder.objects.filter(
+            supplier=OuterRef('pk'),
+            status__in=['Draft', 'Sent', 'Confirmed', 'InProduction', 'Ready', 'PartiallyReceived'],
+        )),
+        pending_invoices=count_subquery(pending_invoice_orders),
+        has_hold_location=Exists(hold_locations),
+        hold_total=Coalesce(Subquery(hold_totals, output_field=DecimalField(max_digits=14, decimal_places=2)), Decimal('0'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        last_ordered_at=Max('orders__created_at'),
     ).order_by('name')
     
+    # Paginate suppliers (only the current page is fetched)
+    paginator = Paginator(suppliers_queryset, 10)  # 10 items per page
+    page_number = request.GET.get('page', 1)
+    page_obj = paginator.get_page(page_number)
+    
+    # Lifetime spend for this page's suppliers (monthly rollup + current month)
+    from .rollups import spend_by_supplier
+    spend = spend_by_supplier(supplier_ids=[supplier.id for supplier in page_obj.object_list])
+    
     # Build suppliers list for template
     suppliers_list = []
-    for supplier in suppliers_queryset:
-        # Get total spend from completed orders (simplified - would need SupplierSpendMonthly or calculate from orders)
-        # For now, we'll use a placeholder
-        total_spend = "0.00"  # TODO: Calculate from SupplierOrder history
-        
-        # Get pending invoices count (orders with invoice signatures but not fully received)
-        pending_invoices = SupplierOrder.objects.filter(
-            supplier=supplier,
-            invoice_signatures__isnull=False
-        ).exclude(status='Received').count()
-        
-        # Get items held at supplier
-        supplier_hold_location = InventoryLocation.objects.filter(
-            type='SUPPLIER_HOLD',
-            supplier=supplier
-        ).first()
+    for supplier in page_obj.object_list:
+        total_spend = spend.get(supplier.id, {}).get('total_spent', Decimal('0'))
         
+        # Items held at supplier
         supplier_hold_qty = "0"
-        if supplier_hold_location:
-            hold_total = StockBalance.objects.filter(
-                location=supplier_hold_location
-            ).aggregate(
-                total=Coalesce(Sum('qty_on_hand'), Decimal('0'), output_field=DecimalField())
-            )['total'] or Decimal('0')
-            supplier_hold_qty = f"{hold_total:,.0f}" if hold_total > 0 else "No"
+        if supplier.has_hold_location:
+            supplier_hold_qty = f"{supplier.hold_total:,.0f}" if supplier.hold_total > 0 else "No"
         
-        # Get last order date
-        last_order = SupplierOrder.objects.filter(
-            supplier=supplier
-        ).order_by('-created_at').first()
-        
-        last_ordered_date = last_order.created_at.date() if last_order else None
+        last_ordered_date = timezone.localtime(supplier.last_ordered_at).date() if supplier.last_ordered_at else None
         
         suppliers_list.append({
             "code": f"SUP-{supplier.id:03d}",
@@ -2416,62 +2581,59 @@ def suppliers(request):
             "delivery_days": supplier.delivery_days if isinstance(supplier.delivery_days, str) else (', '.join(supplier.delivery_days.keys()) if isinstance(supplier.delivery_days, dict) else str(supplier.delivery_days)),
             "total_items": supplier.total_items,
             "active_orders": supplier.active_orders_count,
-            "total_spend": total_spend,
-            "pending_invoices": pending_invoices,
+            "total_spend": f"{total_spend:,.2f}",
+            "pending_invoices": supplier.pending_invoices,
             "supplier_hold": supplier_hold_qty,
             "last_ordered_date": last_ordered_date.strftime("%Y-%m-%d") if last_ordered_date else "—",
             "id": supplier.id,
         })
-
-    # Paginate suppliers
-    paginator = Paginator(suppliers_list, 10)  # 10 items per page
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    page_obj.object_list = suppliers_list
 
     # Get all active categories for dropdown
     categories = SupplierCategory.objects.filter(is_active=True).order_by('name')
     
-    # Get supplier items for price discussion modal (grouped by supplier)
-    # Get ALL suppliers (not just paginated) for the dropdown
-    all_suppliers = Supplier.objects.filter(is_active=True).order_by('name')
-    supplier_items_by_supplier = {}
-    
-    for supplier in all_suppliers:
-        items = SupplierItem.objects.filter(
-            supplier=supplier,
-            is_active=True
-        ).select_related('item', 'variation', 'base_unit').order_by('item__item_code')
-        
-        supplier_items_by_supplier[supplier.id] = [
-            {
-                'id': item.id,
-                'item_code': item.item.item_code,
-                'item_name': item.item.name,
-                'variation': item.variation.variation_name if item.variation else None,
-                'current_price': float(item.price_per_unit),
-                'base_unit': item.base_unit.abbreviation if item.base_unit else item.item.base_unit
-            }
-            for item in items
-        ]
-    
-    # Also create a list of all suppliers for the dropdown
-    all_suppliers_list = [
-        {'id': s.id, 'name': s.name}
-        for s in all_suppliers
-    ]
+    # Supplier dropdown for the price discussion modal; items are fetched per supplier
+    # from supplier_items_api when one is selected
+    all_suppliers_list = list(Supplier.objects.filter(is_active=True).order_by('name').values('id', 'name'))
     
     context = {
         "items": page_obj,
         "page_obj": page_obj,
         "is_procurement": is_procurement,
         "categories": categories,
-        "supplier_items_json": json.dumps(supplier_items_by_supplier),
         "all_suppliers": all_suppliers_list,
     }
 
     return render(request, "maainventory/suppliers.html", context)
 
 
+@login_required
+def supplier_items_api(request, supplier_id):
+    """Active items for one supplier (price discussion modal). Cached per supplier."""
+    from .context_processors import get_branch_user_info
+    from .supplier_catalog import get_supplier_items
+    
+    # Branch users have no access to the suppliers area (middleware) or its prices
+    is_branch_user, _ = get_branch_user_info(request.user)
+    user_profile = getattr(request.user, 'profile', None)
+    user_role = user_profile.role.name if user_profile and user_profile.role else None
+    if is_branch_user or (user_role and 'Warehouse' in user_role):
+        return JsonResponse({'success': False, 'error': 'You do not have permission to view supplier items'}, status=403)
+    
+    from django.utils.cache import get_conditional_response
+    import hashlib
+    
+    # Browsers revalidate (prices change after a discussion); unchanged lists get a 304
+    body = json.dumps({'items': get_supplier_items(supplier_id)})
+    etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @login_required
 def delete_supplier(request, code):
     """Delete a supplier (Procurement Manager or IT only)"""
@@ -2782,7 +2944,12 @@ def purchase_orders(request):
 
 @login_required
 def mark_order_received(request, order_id):
-    """Mark purchase order as received and add items to inventory (Warehouse Staff only)"""
+    """
+    Receive a purchase order into warehouse inventory (Warehouse Staff only).
+    Optional JSON body: {"note": str, "lines": {order_item_id: qty_received_now}}.
+    Without "lines" everything still outstanding is received; with "lines" only the
+    listed quantities are booked and the order becomes Partially Received until complete.
+    """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
     
@@ -2793,16 +2960,15 @@ def mark_order_received(request, order_id):
         return JsonResponse({'success': False, 'error': 'Only warehouse staff can mark orders as received'}, status=403)
     
     try:
-        import json
-        from django.db import transaction
-        from .models import SupplierOrder, SupplierOrderItem, StockBalance, StockLedger, InventoryLocation
-        from django.utils import timezone
+        from .receiving import receive_orders
         
-        # Get note from request body if provided
+        # Get note and per-line quantities from request body if provided
         note = ''
+        lines = None
         try:
             data = json.loads(request.body)
             note = data.get('note', '').strip()
+            lines = data.get('lines') or None
         except (json.JSONDecodeError, AttributeError):
             pass
         
@@ -2812,54 +2978,12 @@ def mark_order_received(request, order_id):
         if order.status == 'Received':
             return JsonResponse({'success': False, 'error': 'Order has already been marked as received'})
         
-        # Get warehouse location
-        warehouse_location, created = InventoryLocation.objects.get_or_create(
-            type='WAREHOUSE',
-            defaults={'name': 'Main Warehouse'}
-        )
+        try:
+            result = receive_orders({order.id: lines}, request.user, note=note)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
         
-        with transaction.atomic():
-            # Get all order items
-            order_items = SupplierOrderItem.objects.filter(supplier_order=order).select_related('item', 'variation')
-            
-            # Process each item
-            for order_item in order_items:
-                # Update or create stock balance
-                stock_balance, created = StockBalance.objects.get_or_create(
-                    item=order_item.item,
-                    variation=order_item.variation,
-                    location=warehouse_location,
-                    defaults={'qty_on_hand': Decimal('0.00')}
-                )
-                
-                # Add quantity to stock
-                stock_balance.qty_on_hand += order_item.qty_ordered
-                stock_balance.save()
-                
-                # Create ledger entry for audit trail
-                ledger_notes = f'Received from PO {order.po_code} - Supplier: {order.supplier.name}'
-                if note:
-                    ledger_notes += f'\nWarehouse Note: {note}'
-                
-                StockLedger.objects.create(
-                    item=order_item.item,
-                    variation=order_item.variation,
-                    to_location=warehouse_location,
-                    qty_change=order_item.qty_ordered,
-                    reason='DELIVERY_RECEIVED',
-                    reference_type='SUPPLIER_ORDER',
-                    reference_id=str(order.id),
-                    notes=ledger_notes,
-                    created_by=request.user
-                )
-                
-                # Update qty_received on order item
-                order_item.qty_received = order_item.qty_ordered
-                order_item.save()
-            
-            # Update order status to Received
-            order.status = 'Received'
-            order.save()
+        order_status = result['orders'][0]['status']
         
         # Send email if note is provided
         if note:
@@ -2869,10 +2993,16 @@ def mark_order_received(request, order_id):
                 # Log error but don't fail the order processing
                 print(f"Error sending receiving note email: {email_error}")
         
-        messages.success(request, f'Purchase order {order.po_code} marked as received. All items have been added to inventory.')
+        if order_status == SupplierOrder.StatusType.RECEIVED:
+            messages.success(request, f'Purchase order {order.po_code} marked as received. All items have been added to inventory.')
+            message = f'Purchase order {order.po_code} marked as received successfully!'
+        else:
+            messages.success(request, f'Purchase order {order.po_code} partially received. {result["lines_received"]} line(s) added to inventory.')
+            message = f'Purchase order {order.po_code} partially received ({result["lines_received"]} line(s)).'
         return JsonResponse({
             'success': True,
-            'message': f'Purchase order {order.po_code} marked as received successfully!'
+            'message': message,
+            'status': order_status,
         })
         
     except Exception as e:
@@ -2881,6 +3011,49 @@ def mark_order_received(request, order_id):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+@login_required
+def receive_purchase_orders(request):
+    """
+    Receive several purchase orders in one go (Warehouse Staff only).
+    JSON body: {"orders": {order_id: null | {order_item_id: qty}}, "note": str}.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    
+    user_profile = getattr(request.user, 'profile', None)
+    user_role = user_profile.role.name if user_profile and user_profile.role else None
+    if not (user_role and 'Warehouse' in user_role):
+        return JsonResponse({'success': False, 'error': 'Only warehouse staff can mark orders as received'}, status=403)
+    
+    from .receiving import receive_orders
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    
+    receipts = data.get('orders') or {}
+    note = (data.get('note') or '').strip()
+    if not isinstance(receipts, dict) or not receipts:
+        return JsonResponse({'success': False, 'error': 'No purchase orders to receive'}, status=400)
+    
+    try:
+        result = receive_orders(receipts, request.user, note=note)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    
+    return JsonResponse({
+        'success': True,
+        'orders': result['orders'],
+        'lines_received': result['lines_received'],
+        'qty_received': str(result['qty_received']),
+    })
+
+
 @login_required
 def send_receiving_note(request, order_id):
     """Send receiving note email to supplier and order creator (Warehouse Staff only)
@@ -2977,6 +3150,9 @@ def send_receiving_note(request, order_id):
                 expires_at=expires_at
             )
             
+            from .documents import enqueue_invoice_pdf
+            enqueue_invoice_pdf(new_order)
+            
             # Step 3: Send single email with cancellation notice and new invoice link
             try:
                 send_receiving_note_email(old_order, new_order, note, request)
@@ -3021,12 +3197,14 @@ def view_purchase_order(request, order_id):
         line_total = item.qty_ordered * item.price_per_unit
         subtotal += line_total
         items_with_totals.append({
+            'id': item.id,
             'item': item.item,
             'variation': item.variation,
             'quantity': item.qty_ordered,
             'price': item.price_per_unit,
             'line_total': line_total,
             'qty_received': item.qty_received,
+            'qty_outstanding': max(item.qty_ordered - item.qty_received, Decimal('0')),
         })
     
     total = subtotal
@@ -3051,11 +3229,14 @@ def view_invoice_by_token(request, token):
     """
     View invoice using secure token (public endpoint, no login required)
     
-    Validates token and shows invoice if valid.
+    Validates token and shows invoice if valid. Sent invoices are served from a stored
+    snapshot (see invoices.py), so repeat views are one indexed lookup or a 304.
     """
-    from .models import SupplierInvoiceSignature
-    from django.utils import timezone
-    from django.http import HttpResponse
+    from .invoices import get_current_snapshot, build_snapshot, invoice_response
+    
+    snapshot = get_current_snapshot(token=token)
+    if snapshot is not None:
+        return invoice_response(request, snapshot.etag, snapshot.html)
     
     # Get token from database
     try:
@@ -3076,37 +3257,8 @@ def view_invoice_by_token(request, token):
     #         'error_message': 'This invoice link has already been used. Please contact the procurement department for assistance.'
     #     }, status=403)
     
-    order = portal_token.supplier_order
-    
-    # Check if invoice is already signed
-    signature = order.invoice_signatures.first()
-    is_signed = signature is not None
-    
-    # Prepare items with line totals
-    items_with_totals = []
-    subtotal = 0
-    
-    for item in order.items.all():
-        line_total = item.qty_ordered * item.price_per_unit
-        subtotal += line_total
-        items_with_totals.append({
-            'item': item,
-            'line_total': line_total
-        })
-    
-    total = subtotal
-    
-    context = {
-        'order': order,
-        'items_with_totals': items_with_totals,
-        'subtotal': subtotal,
-        'total': total,
-        'signature': signature,
-        'is_signed': is_signed,
-        'portal_token': portal_token,  # Pass token to template for signature linking
-    }
-    
-    return render(request, 'maainventory/invoice.html', context)
+    etag, html = build_snapshot(portal_token.supplier_order, portal_token)
+    return invoice_response(request, etag, html)
 
 
 def view_invoice(request, order_id):
@@ -3116,39 +3268,48 @@ def view_invoice(request, order_id):
     This view is PUBLICLY ACCESSIBLE (no login required) so suppliers can view
     invoices directly from email links without needing to log in.
     """
-    from .models import SupplierInvoiceSignature
-    from django.utils import timezone
-    
-    order = get_object_or_404(SupplierOrder.objects.select_related('created_by__profile', 'supplier'), id=order_id)
+    from .invoices import get_current_snapshot, build_snapshot, invoice_response
     
-    # Check if invoice is already signed
-    signature = order.invoice_signatures.first()
-    is_signed = signature is not None
+    snapshot = get_current_snapshot(order_id=order_id)
+    if snapshot is not None:
+        return invoice_response(request, snapshot.etag, snapshot.html)
     
-    # Prepare items with line totals
-    items_with_totals = []
-    subtotal = 0
-    
-    for item in order.items.all():
-        line_total = item.qty_ordered * item.price_per_unit
-        subtotal += line_total
-        items_with_totals.append({
-            'item': item,
-            'line_total': line_total
-        })
-    
-    total = subtotal  # Add tax/shipping if needed later
+    order = get_object_or_404(SupplierOrder.objects.select_related('created_by__profile', 'supplier'), id=order_id)
     
-    context = {
-        'order': order,
-        'items_with_totals': items_with_totals,
-        'subtotal': subtotal,
-        'total': total,
-        'signature': signature,
-        'is_signed': is_signed,
-    }
+    etag, html = build_snapshot(order)
+    return invoice_response(request, etag, html)
+
+
+def invoice_signature_image(request, order_id=None, token=None):
+    """
+    Supplier signature PNG for an invoice (public, like the invoice itself).
+    Streamed from the deferred signature_image column with long-lived caching headers.
+    """
+    from .signatures import signature_image_response
     
-    return render(request, 'maainventory/invoice.html', context)
+    signatures = SupplierInvoiceSignature.objects.order_by('-signed_at')
+    if token:
+        signatures = signatures.filter(supplier_order__portal_tokens__token=token)
+    else:
+        signatures = signatures.filter(supplier_order_id=order_id)
+    return signature_image_response(request, signatures)
+
+
+@login_required
+def delivery_signature_image(request, signature_id):
+    """Branch manager delivery signature PNG (streamed, cacheable). Branch users only see their branch's."""
+    from django.http import Http404, HttpResponseForbidden
+    from .context_processors import get_branch_user_info
+    from .signatures import signature_image_response
+
+    signatures = DeliverySignature.objects.filter(id=signature_id)
+    branch_id = signatures.values_list('request__branch_id', flat=True).first()
+    if branch_id is None:
+        raise Http404('No signature')
+    is_branch_user, user_branch_ids = get_branch_user_info(request.user)
+    if is_branch_user and (not user_branch_ids or branch_id not in user_branch_ids):
+        return HttpResponseForbidden('You do not have access to this signature.')
+    return signature_image_response(request, signatures)
 
 
 @csrf_exempt
@@ -3195,17 +3356,18 @@ def submit_invoice_signature(request, order_id=None, token=None):
         if not signature_data:
             return JsonResponse({'success': False, 'error': 'Signature data required'}, status=400)
         
-        # Extract base64 string from data URL if it includes the prefix
-        # Format: data:image/png;base64,iVBORw0KGgo...
-        if signature_data.startswith('data:image'):
-            # Extract just the base64 part after the comma
-            signature_data = signature_data.split(',', 1)[1] if ',' in signature_data else signature_data
+        # Decode the data URL (data:image/png;base64,iVBORw0KGgo...) to PNG bytes
+        from .signatures import decode_signature_data
+        try:
+            signature_image = decode_signature_data(signature_data)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
         
         # Create signature record
         signature = SupplierInvoiceSignature.objects.create(
             supplier_order=order,
             supplier_name_signed=supplier_name,
-            signature_data=signature_data,  # Store only the base64 string
+            signature_image=signature_image,
             signed_at=timezone.now(),
             token=portal_token  # Link signature to token if available
         )
@@ -3219,6 +3381,10 @@ def submit_invoice_signature(request, order_id=None, token=None):
         order.status = 'Signed'
         order.save()
         
+        # Re-render the invoice PDF with the signature (links it via invoice_file_url)
+        from .documents import enqueue_invoice_pdf
+        enqueue_invoice_pdf(order)
+        
         return JsonResponse({
             'success': True,
             'message': 'Signature submitted successfully',
@@ -3231,24 +3397,14 @@ def submit_invoice_signature(request, order_id=None, token=None):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
-@login_required
-def reports(request):
-    """Comprehensive reports page with all report types"""
+def _report_date_range(request):
+    """
+    (start_date, end_date, days_back) for the reports page and its exports.
+    - If start/end are provided (MM/DD/YYYY), use them
+    - Otherwise fall back to "days" (last N days)
+    """
     from datetime import datetime, timedelta
-    from decimal import Decimal
-    from django.db.models import Avg, Min, Max, Count
-    from .models import (
-        Supplier, SupplierOrder, SupplierOrderItem, SupplierSpendMonthly,
-        Item, StockBalance, InventoryLocation, StockLedger,
-        Request, RequestItem, Branch, Brand,
-        ItemRequest, ItemRequestItem, SupplierStock,
-        ItemConsumptionDaily, SupplierCategory, SupplierItem,
-        SupplierPriceDiscussion
-    )
-    
-    # Get date range from query params
-    # - If start/end are provided (MM/DD/YYYY), use them
-    # - Otherwise fall back to "days" (last N days)
+
     today = datetime.now().date()
 
     def _parse_date(value: str):
@@ -3282,405 +3438,25 @@ def reports(request):
         except Exception:
             days_back = 30
         start_date = end_date - timedelta(days=days_back)
+    return start_date, end_date, days_back
 
-    created_date_range = (start_date, end_date)
-    discussed_date_range = (start_date, end_date)
-    consumption_date_range = (start_date, end_date)
-    
-    # ========================================================================
-    # 1. FINANCIAL & SPENDING REPORTS
-    # ========================================================================
-    
-    # Supplier Spending Report
-    supplier_spending = []
-    suppliers = Supplier.objects.filter(is_active=True).select_related('category')
-    
-    for supplier in suppliers:
-        # Get orders in date range
-        orders = SupplierOrder.objects.filter(
-            supplier=supplier,
-            created_at__date__range=created_date_range
-        )
-        
-        # Calculate total spent
-        total_spent = Decimal('0.00')
-        order_count = 0
-        for order in orders:
-            order_items = SupplierOrderItem.objects.filter(supplier_order=order)
-            for item in order_items:
-                total_spent += item.qty_ordered * item.price_per_unit
-            if order_items.exists():
-                order_count += 1
-        
-        if total_spent > 0:
-            supplier_spending.append({
-                'supplier_name': supplier.name,
-                'category': supplier.category.name if supplier.category else 'Uncategorized',
-                'total_spent': float(total_spent),
-                'order_count': order_count,
-                'avg_order_value': float(total_spent / order_count) if order_count > 0 else 0
-            })
-    
-    # Sort by total spent descending
-    supplier_spending.sort(key=lambda x: x['total_spent'], reverse=True)
-    
-    # Purchase Order Financial Summary
-    po_summary = {
-        'total_orders': SupplierOrder.objects.filter(created_at__date__range=created_date_range).count(),
-        'total_value': Decimal('0.00'),
-        'by_status': {},
-        'avg_order_value': Decimal('0.00')
-    }
-    
-    all_orders = SupplierOrder.objects.filter(created_at__date__range=created_date_range)
-    status_counts = {}
-    for order in all_orders:
-        status = order.get_status_display()
-        status_counts[status] = status_counts.get(status, 0) + 1
-        
-        order_items = SupplierOrderItem.objects.filter(supplier_order=order)
-        order_value = sum(item.qty_ordered * item.price_per_unit for item in order_items)
-        po_summary['total_value'] += order_value
-    
-    po_summary['by_status'] = status_counts
-    if po_summary['total_orders'] > 0:
-        po_summary['avg_order_value'] = po_summary['total_value'] / po_summary['total_orders']
-    
-    # ========================================================================
-    # 2. INVENTORY REPORTS
-    # ========================================================================
-    
-    # Stock Level Report
-    stock_levels = []
-    warehouse_locations = InventoryLocation.objects.filter(type='WAREHOUSE')
-    
-    for location in warehouse_locations:
-        stock_balances = StockBalance.objects.filter(
-            location=location,
-            item__is_active=True
-        ).select_related('item', 'variation', 'item__brand')
-        
-        location_total_value = Decimal('0.00')
-        low_stock_count = 0
-        
-        for balance in stock_balances:
-            item_value = balance.qty_on_hand * (balance.item.price_per_unit or Decimal('0'))
-            location_total_value += item_value
-            
-            # Check if low stock
-            if balance.qty_on_hand < balance.item.min_stock_qty:
-                low_stock_count += 1
-        
-        stock_levels.append({
-            'location_name': location.name,
-            'total_items': stock_balances.count(),
-            'low_stock_count': low_stock_count,
-            'total_value': float(location_total_value)
-        })
-    
-    # Low Stock Items
-    low_stock_items = []
-    all_stock = StockBalance.objects.filter(
-        item__is_active=True,
-        location__type='WAREHOUSE'
-    ).select_related('item', 'variation', 'location')
-    
-    for stock in all_stock:
-        if stock.qty_on_hand < stock.item.min_stock_qty:
-            shortage = stock.item.min_stock_qty - stock.qty_on_hand
-            low_stock_items.append({
-                'item_code': stock.item.item_code,
-                'item_name': stock.item.name,
-                'variation': stock.variation.variation_name if stock.variation else None,
-                'location': stock.location.name,
-                'current_stock': float(stock.qty_on_hand),
-                'min_stock': float(stock.item.min_stock_qty),
-                'shortage': float(shortage),
-                'base_unit': stock.item.base_unit
-            })
-    
-    # Stock Movement Report
-    stock_movements = StockLedger.objects.filter(
-        created_at__date__range=created_date_range
-    ).select_related('item', 'variation', 'from_location', 'to_location', 'created_by')[:100]
-    
-    movement_summary = {
-        'total_movements': StockLedger.objects.filter(created_at__date__range=created_date_range).count(),
-        'by_reason': {},
-        'incoming': Decimal('0.00'),
-        'outgoing': Decimal('0.00')
-    }
-    
-    for movement in StockLedger.objects.filter(created_at__date__range=created_date_range):
-        reason = movement.get_reason_display()
-        movement_summary['by_reason'][reason] = movement_summary['by_reason'].get(reason, 0) + 1
-        
-        if movement.qty_change > 0:
-            movement_summary['incoming'] += movement.qty_change
-        else:
-            movement_summary['outgoing'] += abs(movement.qty_change)
-    
-    # ========================================================================
-    # 3. OPERATIONAL REPORTS
-    # ========================================================================
-    
-    # Request Performance Report
-    requests_data = Request.objects.filter(
-        created_at__date__range=created_date_range
-    ).select_related('branch', 'branch__brand', 'requested_by', 'approved_by')
-    
-    request_summary = {
-        'total_requests': requests_data.count(),
-        'by_status': {},
-        'by_branch': {},
-        'avg_fulfillment_days': None,
-        'approval_rate': None
-    }
-    
-    fulfillment_times = []
-    approved_count = 0
-    rejected_count = 0
-    
-    for req in requests_data:
-        status = req.get_status_display()
-        request_summary['by_status'][status] = request_summary['by_status'].get(status, 0) + 1
-        
-        branch_name = req.branch.name
-        request_summary['by_branch'][branch_name] = request_summary['by_branch'].get(branch_name, 0) + 1
-        
-        if req.status in ('Approved', 'WarehouseProcessing', 'ReadyForDelivery', 'InProcess', 'OutForDelivery', 'Delivered', 'Completed'):
-            approved_count += 1
-        elif req.status == 'Rejected':
-            rejected_count += 1
-        
-        # Calculate fulfillment time for completed requests
-        if req.status == 'Completed' and req.approved_at:
-            days = (req.updated_at.date() - req.approved_at.date()).days
-            if days >= 0:
-                fulfillment_times.append(days)
-    
-    if fulfillment_times:
-        request_summary['avg_fulfillment_days'] = sum(fulfillment_times) / len(fulfillment_times)
-    
-    total_reviewed = approved_count + rejected_count
-    if total_reviewed > 0:
-        request_summary['approval_rate'] = (approved_count / total_reviewed) * 100
-    
-    # Most Requested Items
-    requested_items = RequestItem.objects.filter(
-        request__created_at__date__range=created_date_range
-    ).values('item__item_code', 'item__name').annotate(
-        total_requested=Sum('qty_requested'),
-        request_count=Count('request', distinct=True)
-    ).order_by('-total_requested')[:20]
-    
-    # Purchase Order Status Report
-    po_status_report = {
-        'total_orders': SupplierOrder.objects.filter(created_at__date__range=created_date_range).count(),
-        'by_status': {},
-        'by_supplier': {},
-        'avg_delivery_days': None
-    }
-    
-    delivery_times = []
-    for order in SupplierOrder.objects.filter(created_at__date__range=created_date_range).select_related('supplier'):
-        status = order.get_status_display()
-        po_status_report['by_status'][status] = po_status_report['by_status'].get(status, 0) + 1
-        
-        supplier_name = order.supplier.name
-        po_status_report['by_supplier'][supplier_name] = po_status_report['by_supplier'].get(supplier_name, 0) + 1
-    
-    # Item Request Report
-    item_requests_data = ItemRequest.objects.filter(
-        created_at__date__range=created_date_range
-    ).select_related('supplier', 'created_by')
-    
-    item_request_summary = {
-        'total_requests': item_requests_data.count(),
-        'by_status': {},
-        'by_supplier': {},
-        'avg_delivery_days_min': None,
-        'avg_delivery_days_max': None
-    }
-    
-    delivery_days_min_list = []
-    delivery_days_max_list = []
-    
-    for ir in item_requests_data:
-        status = ir.get_status_display()
-        item_request_summary['by_status'][status] = item_request_summary['by_status'].get(status, 0) + 1
-        
-        supplier_name = ir.supplier.name
-        item_request_summary['by_supplier'][supplier_name] = item_request_summary['by_supplier'].get(supplier_name, 0) + 1
-        
-        if ir.delivery_days_min:
-            delivery_days_min_list.append(ir.delivery_days_min)
-        if ir.delivery_days_max:
-            delivery_days_max_list.append(ir.delivery_days_max)
-    
-    if delivery_days_min_list:
-        item_request_summary['avg_delivery_days_min'] = sum(delivery_days_min_list) / len(delivery_days_min_list)
-    if delivery_days_max_list:
-        item_request_summary['avg_delivery_days_max'] = sum(delivery_days_max_list) / len(delivery_days_max_list)
-    
-    # ========================================================================
-    # 4. ANALYTICS REPORTS
-    # ========================================================================
-    
-    # Item Consumption Report (from Foodics)
-    consumption_data = ItemConsumptionDaily.objects.filter(
-        date__range=consumption_date_range
-    ).select_related('item', 'branch', 'branch__brand', 'variation')
-    
-    consumption_summary = {
-        'total_records': consumption_data.count(),
-        'total_consumed': Decimal('0.00'),
-        'by_branch': {},
-        'by_item': {},
-        'top_items': []
-    }
-    
-    for record in consumption_data:
-        consumption_summary['total_consumed'] += record.qty_consumed
-        
-        branch_name = record.branch.name
-        consumption_summary['by_branch'][branch_name] = consumption_summary['by_branch'].get(branch_name, Decimal('0')) + record.qty_consumed
-        
-        item_code = record.item.item_code
-        consumption_summary['by_item'][item_code] = consumption_summary['by_item'].get(item_code, Decimal('0')) + record.qty_consumed
-    
-    # Get top consumed items
-    top_consumed = sorted(
-        consumption_summary['by_item'].items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:10]
-    
-    for item_code, qty in top_consumed:
-        item = Item.objects.filter(item_code=item_code).first()
-        if item:
-            consumption_summary['top_items'].append({
-                'item_code': item_code,
-                'item_name': item.name,
-                'total_consumed': float(qty),
-                'base_unit': item.base_unit
-            })
-    
-    # Supplier Performance Report
-    supplier_performance = []
-    for supplier in suppliers:
-        orders = SupplierOrder.objects.filter(supplier=supplier, created_at__date__range=created_date_range)
-        
-        if orders.exists():
-            total_orders = orders.count()
-            received_orders = orders.filter(status='Received').count()
-            on_time_count = 0  # Would need delivery date tracking for accurate calculation
-            
-            item_requests = ItemRequest.objects.filter(
-                supplier=supplier,
-                created_at__date__range=created_date_range
-            )
-            
-            supplier_performance.append({
-                'supplier_name': supplier.name,
-                'total_orders': total_orders,
-                'received_orders': received_orders,
-                'completion_rate': (received_orders / total_orders * 100) if total_orders > 0 else 0,
-                'item_requests': item_requests.count(),
-                'avg_response_days': None  # Would need tracking for accurate calculation
-            })
-    
-    # ========================================================================
-    # 5. PRICE DISCUSSION REPORTS
-    # ========================================================================
-    
-    # Latest Price Discussions
-    price_discussions_list = []
-    price_discussions_qs = SupplierPriceDiscussion.objects.filter(
-        discussed_date__date__range=discussed_date_range
-    ).select_related('supplier_item', 'supplier_item__supplier', 'supplier_item__item', 'discussed_by').order_by('-discussed_date')[:50]
-    
-    for discussion in price_discussions_qs:
-        # Calculate price difference: from old_price to discussed_price
-        if discussion.old_price:
-            price_diff = discussion.discussed_price - discussion.old_price
-        else:
-            # Fallback: compare with current price if old_price wasn't recorded
-            price_diff = discussion.discussed_price - discussion.supplier_item.price_per_unit
-        
-        price_discussions_list.append({
-            'discussion': discussion,
-            'old_price': float(discussion.old_price) if discussion.old_price else None,
-            'new_price': float(discussion.discussed_price),
-            'price_difference': float(price_diff)
-        })
-    
-    # Price discussions by supplier
-    discussions_by_supplier = {}
-    for discussion in SupplierPriceDiscussion.objects.filter(
-        discussed_date__date__range=discussed_date_range
-    ).select_related('supplier_item__supplier'):
-        supplier_name = discussion.supplier_item.supplier.name
-        if supplier_name not in discussions_by_supplier:
-            discussions_by_supplier[supplier_name] = 0
-        discussions_by_supplier[supplier_name] += 1
-    
-    # Price change trends - get discussions grouped by supplier_item
-    price_trends = []
-    supplier_items_with_discussions = SupplierItem.objects.filter(
-        price_discussions__discussed_date__date__range=discussed_date_range
-    ).distinct().select_related('supplier', 'item', 'variation')
-    
-    for supplier_item in supplier_items_with_discussions:
-        discussions = SupplierPriceDiscussion.objects.filter(
-            supplier_item=supplier_item,
-            discussed_date__date__range=discussed_date_range
-        ).order_by('discussed_date')
-        
-        if discussions.exists():
-            # Get price history
-            price_history = []
-            for disc in discussions:
-                price_history.append({
-                    'date': disc.discussed_date.date(),
-                    'price': float(disc.discussed_price),
-                    'discussed_by': disc.discussed_by.profile.full_name if hasattr(disc.discussed_by, 'profile') and disc.discussed_by.profile.full_name else disc.discussed_by.username,
-                    'notes': disc.notes or ''
-                })
-            
-            # Calculate price change
-            first_price = price_history[0]['price']
-            last_price = price_history[-1]['price']
-            price_change = last_price - first_price
-            price_change_percent = ((price_change / first_price) * 100) if first_price > 0 else 0
-            
-            # Format price history for JSON serialization
-            price_history_json = []
-            for disc in discussions:
-                price_history_json.append({
-                    'date': disc.discussed_date.date().isoformat(),
-                    'price': float(disc.discussed_price),
-                    'discussed_by': disc.discussed_by.profile.full_name if hasattr(disc.discussed_by, 'profile') and disc.discussed_by.profile.full_name else disc.discussed_by.username,
-                    'notes': disc.notes or ''
-                })
-            
-            price_trends.append({
-                'supplier_name': supplier_item.supplier.name,
-                'item_code': supplier_item.item.item_code,
-                'item_name': supplier_item.item.name,
-                'variation': supplier_item.variation.variation_name if supplier_item.variation else None,
-                'current_price': float(supplier_item.price_per_unit),
-                'latest_discussed_price': last_price,
-                'first_price': first_price,
-                'price_change': price_change,
-                'price_change_percent': price_change_percent,
-                'discussion_count': discussions.count(),
-                'latest_discussion_date': discussions.last().discussed_date.date(),
-                'price_history': price_history_json
-            })
-    
-    # Sort by latest discussion date
-    price_trends.sort(key=lambda x: x['latest_discussion_date'], reverse=True)
+
+@login_required
+def reports(request):
+    """
+    Comprehensive reports page with all report types. Sections are computed in the
+    background (report_runs.py); until the run for this range and role completes the
+    page shows its progress and polls report_run_status.
+    """
+    from urllib.parse import urlencode
+    from .models import ReportRun
+    from .report_runs import get_or_start_run, load_report_result, run_progress, user_report_role
+
+    start_date, end_date, days_back = _report_date_range(request)
+    run = get_or_start_run(start_date, end_date, user_report_role(request.user), request.user)
+    report_ready = run.status == ReportRun.StatusType.COMPLETED
+    report = load_report_result(run) if report_ready else {}
+    price_trends_chart = report.pop('price_trends_chart', [])
     
     context = {
         'start_date': start_date,
@@ -3689,56 +3465,56 @@ def reports(request):
         # used by <input type="date">
         'start_date_input': start_date.isoformat() if start_date else "",
         'end_date_input': end_date.isoformat() if end_date else "",
-        
-        # Financial Reports
-        'supplier_spending': supplier_spending[:20],  # Top 20
-        'po_summary': {
-            'total_orders': po_summary['total_orders'],
-            'total_value': float(po_summary['total_value']),
-            'avg_order_value': float(po_summary['avg_order_value']),
-            'by_status': po_summary['by_status']
-        },
-        
-        # Inventory Reports
-        'stock_levels': stock_levels,
-        'low_stock_items': low_stock_items[:50],  # Top 50
-        'stock_movements': list(stock_movements),
-        'movement_summary': {
-            'total_movements': movement_summary['total_movements'],
-            'by_reason': movement_summary['by_reason'],
-            'incoming': float(movement_summary['incoming']),
-            'outgoing': float(movement_summary['outgoing'])
-        },
-        
-        # Operational Reports
-        'request_summary': request_summary,
-        'requested_items': list(requested_items),
-        'po_status_report': po_status_report,
-        'item_request_summary': item_request_summary,
-        
-        # Analytics Reports
-        'consumption_summary': {
-            'total_records': consumption_summary['total_records'],
-            'total_consumed': float(consumption_summary['total_consumed']),
-            'by_branch': {k: float(v) for k, v in consumption_summary['by_branch'].items()},
-            'top_items': consumption_summary['top_items']
-        },
-        'supplier_performance': supplier_performance[:20],  # Top 20
-        
-        # Price Discussion Reports
-        'price_discussions': price_discussions_list,
-        'discussions_by_supplier': discussions_by_supplier,
-        'price_trends': price_trends[:30],  # Top 30
-        'price_trends_json': json.dumps([{
-            'label': f"{t['item_code']} - {t['item_name']}",
-            'supplier': t['supplier_name'],
-            'history': t['price_history']
-        } for t in price_trends[:10]])
+        'report_run': run,
+        'report_ready': report_ready,
+        'report_progress': None if report_ready else run_progress(run),
+        'export_query': urlencode({'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}),
+        **report,
+        'price_trends_json': json.dumps(price_trends_chart),
     }
     
     return render(request, "maainventory/reports.html", context)
 
 
+@login_required
+def report_export(request, section):
+    """Download one reports page section as CSV (streamed) or XLSX (?format=xlsx), for the same date range"""
+    from .report_exports import EXPORTS, csv_response, xlsx_response
+
+    if section not in EXPORTS:
+        raise Http404("Unknown report section")
+    title, columns, rows = EXPORTS[section]
+    start_date, end_date, _ = _report_date_range(request)
+    filename = f'{section}_{start_date.isoformat()}_{end_date.isoformat()}'
+
+    if request.GET.get('format') == 'xlsx':
+        return xlsx_response(filename, title, columns, rows(start_date, end_date))
+    return csv_response(filename, columns, rows(start_date, end_date))
+
+
+@login_required
+def report_run_status(request, run_id):
+    """Progress of a reports page run (polled by the reports page while it is computing)"""
+    from .models import ReportRun
+    from .report_runs import run_progress, user_report_role
+
+    run = ReportRun.objects.filter(id=run_id, role=user_report_role(request.user)).defer('result').first()
+    if run is None:
+        return JsonResponse({'success': False, 'error': 'Report run not found'}, status=404)
+    return JsonResponse({'success': True, **run_progress(run)})
+
+
+@login_required
+def import_job_status(request, job_id):
+    """Progress of an uploaded file being processed (polled by the page that queued it)"""
+    from .imports import job_progress
+
+    job = ImportJob.objects.filter(id=job_id, uploaded_by=request.user).defer('result').first()
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'Import job not found'}, status=404)
+    return JsonResponse({'success': True, **job_progress(job)})
+
+
 @login_required
 @csrf_exempt
 def add_price_discussion(request):
@@ -3980,84 +3756,102 @@ def procurement_settings(request):
     return render(request, 'maainventory/procurement_settings.html', context)
 
 
+def _session_import_job(request, session_key):
+    """
+    The import job whose id is stored in the session under session_key, or None.
+    A finished job is dropped from the session, so it is returned (and reported) once.
+    """
+    job_id = request.session.get(session_key)
+    if not job_id:
+        return None
+    job = ImportJob.objects.filter(id=job_id, uploaded_by=request.user).select_related('branch').first()
+    if job is None or job.status in (ImportJob.StatusType.COMPLETED, ImportJob.StatusType.FAILED):
+        del request.session[session_key]
+    return job
+
+
+def _session_packaging_draft(request, branch_id):
+    """
+    The define-rules draft whose id is stored in the session for this branch, or None.
+    Stale ids (and product lists stored by older versions) are dropped from the session.
+    """
+    from .packaging import get_draft
+
+    draft_key = f'branch_packaging_draft_{branch_id}'
+    draft_id = request.session.get(draft_key)
+    if not draft_id:
+        return None
+    draft = get_draft(draft_id, branch_id, request.user) if isinstance(draft_id, int) else None
+    if draft is None:
+        del request.session[draft_key]
+    return draft
+
+
 @login_required
 def branches(request):
     """
     Render branches page: rows are from branches_inventory table only.
     When requests are marked Delivered, quantities are added to branches_inventory;
     when consumption (e.g. packaging CSV) is recorded, quantities are decremented.
+    Only the brand tabs are rendered here; each tab loads its branch tables from
+    branch_brand_panel when first opened.
     """
+    from django.db.models import Count
+    from django.utils.text import slugify
     from .context_processors import get_branch_user_info
 
-    all_branches = Branch.objects.filter(is_active=True).select_related('brand').order_by('brand__name', 'name')
-
+    visible_branches = Branch.objects.filter(is_active=True)
     is_branch_user, user_branch_ids = get_branch_user_info(request.user)
     if is_branch_user:
-        if user_branch_ids:
-            all_branches = all_branches.filter(id__in=user_branch_ids)
-        else:
-            all_branches = all_branches.none()
+        visible_branches = visible_branches.filter(id__in=user_branch_ids)  # No assignments = see nothing
 
-    # Branches that have packaging rules (for Sync Foodics Sales: open file picker vs show modal)
-    branch_ids_with_rules = set(
-        BranchPackagingRule.objects.filter(branch__is_active=True).values_list('branch_id', flat=True).distinct()
+    branch_counts = dict(
+        visible_branches.order_by().values('brand_id').annotate(n=Count('id')).values_list('brand_id', 'n')
     )
-
-    # Per-branch: item_id -> total quantity from branches_inventory (sum across variations)
-    inv_by_branch_item = {}
-    for row in BranchInventory.objects.filter(branch__is_active=True).values('branch_id', 'item_id').annotate(total=Sum('quantity')):
-        key = (row['branch_id'], row['item_id'])
-        inv_by_branch_item[key] = row['total']
-
-    branch_data = []
-    for branch in all_branches:
-        item_ids = [iid for (bid, iid) in inv_by_branch_item.keys() if bid == branch.id]
-        items_with_qty = []
-        if item_ids:
-            for item in Item.objects.filter(id__in=item_ids, is_active=True).prefetch_related('photos').order_by('item_code'):
-                qty_available = inv_by_branch_item.get((branch.id, item.id)) or 0
-                # Image for item name column: photo_url, or first ItemPhoto (same as warehouse inventory)
-                image_url = item.photo_url
-                if not image_url and item.photos.exists():
-                    first_photo = item.photos.first()
-                    if first_photo and first_photo.photo:
-                        image_url = request.build_absolute_uri(first_photo.photo.url)
-                items_with_qty.append({
-                    'item_code': item.item_code,
-                    'name': item.name,
-                    'base_unit': item.base_unit,
-                    'min_order_qty': item.min_order_qty,
-                    'qty_available': float(qty_available),
-                    'image': image_url,
-                })
-
-        branch_data.append({
-            'id': branch.id,
-            'name': branch.name,
-            'brand': branch.brand.name,
-            'address': branch.address or '',
-            'items': items_with_qty,
-            'has_packaging_rules': branch.id in branch_ids_with_rules,
-        })
-
-    # Group branches by brand for tabs (use all brands from DB, order by name)
-    from django.utils.text import slugify
-    all_brands = Brand.objects.all().order_by('name')
-    branch_by_brand = {b['brand']: [] for b in branch_data}
-    for b in branch_data:
-        branch_by_brand[b['brand']].append(b)
     brands_with_branches = [
-        {'name': brand.name, 'slug': slugify(brand.name), 'branches': branch_by_brand.get(brand.name, [])}
-        for brand in all_brands
+        {'id': brand.id, 'name': brand.name, 'slug': slugify(brand.name), 'branch_count': branch_counts.get(brand.id, 0)}
+        for brand in Brand.objects.all().order_by('name')
     ]
 
+    # Sales file uploaded with Sync Foodics Sales: report the outcome once the worker is done
+    import_job = _session_import_job(request, 'branch_sales_import_job')
+    if import_job and import_job.status == ImportJob.StatusType.COMPLETED:
+        result = import_job.result or {}
+        unmatched = result.get('unmatched') or []
+        if unmatched:
+            messages.warning(request, f'No packaging rules found for: {", ".join(unmatched[:5])}{"..." if len(unmatched) > 5 else ""}. Configure rules for these products first.')
+        messages.success(request, f'Deducted from your branch ({import_job.branch.name}): {result.get("items_deducted", 0)} item types. Quantities on the Branches page have been updated.')
+        import_job = None
+    elif import_job and import_job.status == ImportJob.StatusType.FAILED:
+        messages.error(request, import_job.error_log or 'The sales file could not be processed.')
+        import_job = None
+
     context = {
-        'branch_data': branch_data,
         'brands_with_branches': brands_with_branches,
+        'import_job': import_job,
     }
     return render(request, 'maainventory/branches.html', context)
 
 
+@login_required
+def branch_brand_panel(request, brand_id):
+    """Branch inventory tables of one brand tab on the Branches page (JSON with rendered HTML)."""
+    from django.template.loader import render_to_string
+    from .branches_page import get_brand_branches
+    from .context_processors import get_branch_user_info
+
+    if not Brand.objects.filter(id=brand_id).exists():
+        return JsonResponse({'success': False, 'error': 'Brand not found'}, status=404)
+
+    brand_branches = get_brand_branches(brand_id)
+    is_branch_user, user_branch_ids = get_branch_user_info(request.user)
+    if is_branch_user:
+        brand_branches = [branch for branch in brand_branches if branch['id'] in user_branch_ids]
+
+    html = render_to_string('maainventory/branches_brand_panel.html', {'branches': brand_branches}, request=request)
+    return JsonResponse({'success': True, 'html': html, 'branch_count': len(brand_branches)})
+
+
 @login_required
 def branches_configure(request):
     """Packaging configuration: procurement only. Branch managers do not see this; they use 'Upload CSV to deduct' on the Branches page."""
@@ -4135,8 +3929,20 @@ def branch_packaging(request, branch_id):
     packaging_items = branch.packaging_items.order_by('display_order', 'name')
 
     # Check if we have products from a recent upload (define-rules step)
-    draft_key = f'branch_packaging_draft_{branch_id}'
-    draft_products = request.session.get(draft_key)
+    import_job = _session_import_job(request, f'branch_packaging_import_{branch_id}')
+    if import_job and import_job.status == ImportJob.StatusType.COMPLETED:
+        result = import_job.result or {}
+        if result.get('draft_id'):
+            request.session[f'branch_packaging_draft_{branch_id}'] = result['draft_id']
+            messages.success(request, f'Found {result.get("product_count", 0)} products. Define packaging rules below (select packaging items per product).')
+        else:
+            messages.warning(request, 'No valid products found in the file. Ensure a "Product" column exists.')
+        import_job = None
+    elif import_job and import_job.status == ImportJob.StatusType.FAILED:
+        messages.error(request, f'Error reading file: {import_job.error_log}')
+        import_job = None
+    draft = _session_packaging_draft(request, branch_id)
+    draft_products = draft.products if draft else None
 
     context = {
         'branch': branch,
@@ -4144,83 +3950,20 @@ def branch_packaging(request, branch_id):
         'packaging_items': packaging_items,
         'warehouse_items': warehouse_items,
         'draft_products': draft_products,
+        'import_job': import_job,
         'is_procurement': is_procurement,
         'can_process_packaging_csv': can_process_packaging_csv,
     }
     return render(request, 'maainventory/branch_packaging.html', context)
 
 
-def _parse_products_file(uploaded_file):
-    """
-    Parse CSV or Excel file to extract product list.
-    Required column: Product. Optional: Quantity, Sales, Popularity, Popularity Category.
-    Returns list of dicts: [{'product_name': str, 'qty': str, 'sales': str, 'popularity': str, 'popularity_category': str}, ...]
-    """
-    import csv
-    import io
-    from openpyxl import load_workbook
-
-    rows = []
-    filename = (uploaded_file.name or '').lower()
-
-    if filename.endswith('.csv'):
-        content = uploaded_file.read().decode('utf-8-sig', errors='replace')
-        reader = csv.DictReader(io.StringIO(content))
-        for row in reader:
-            rows.append(dict(row))
-    elif filename.endswith('.xlsx'):
-        wb = load_workbook(uploaded_file, read_only=True, data_only=True)
-        ws = wb.active
-        # Normalize headers: strip whitespace so "Product", "Quantity" match even with extra spaces/tabs
-        headers = [str(cell.value).strip() if cell.value else '' for cell in ws[1]]
-        for row in ws.iter_rows(min_row=2):
-            vals = [cell.value for cell in row]
-            rows.append(dict(zip(headers, vals)))
-        wb.close()
-    else:
-        raise ValueError('File must be CSV or Excel (.csv, .xlsx)')
-
-    def find_col(row, candidates):
-        # Match by normalized key (strip, lower) so "Product", "Quantity" work regardless of casing/spaces
-        keys = [(k, (k or '').strip().lower()) for k in row.keys() if k]
-        for c in candidates:
-            cnorm = c.strip().lower()
-            for k, knorm in keys:
-                if knorm == cnorm:
-                    return k
-        return None
-
-    result = []
-    seen_products = set()
-    for row in rows:
-        product_col = find_col(row, ['Product', 'product', 'Product Name', 'product_name'])
-        if not product_col:
-            continue
-        product_name = (row.get(product_col) or '').strip()
-        if not product_name or product_name in seen_products:
-            continue
-        seen_products.add(product_name)
-
-        qty_col = find_col(row, ['Quantity', 'quantity', 'Qty', 'qty'])
-        sales_col = find_col(row, ['Sales', 'sales'])
-        pop_col = find_col(row, ['Popularity', 'popularity'])
-        pop_cat_col = find_col(row, ['Popularity Category', 'popularity_category', 'PopularityCategory'])
-
-        result.append({
-            'product_name': product_name,
-            'qty': str(row.get(qty_col, '') or ''),
-            'sales': str(row.get(sales_col, '') or ''),
-            'popularity': str(row.get(pop_col, '') or ''),
-            'popularity_category': str(row.get(pop_cat_col, '') or ''),
-        })
-    return result
-
-
 @login_required
 def branch_upload_packaging(request, branch_id):
-    """Parse CSV/Excel to extract products, store in session, redirect to define rules form. Procurement managers and branch users can access."""
+    """Queue CSV/Excel to extract products (import job), redirect to define rules form once parsed. Procurement managers and branch users can access."""
     from django.http import HttpResponseForbidden
     from .context_processors import get_branch_user_info
+    from .imports import start_import
+    from .models import ImportJob
 
     if request.method != 'POST':
         return redirect('branch_packaging', branch_id=branch_id)
@@ -4241,24 +3984,11 @@ def branch_upload_packaging(request, branch_id):
         messages.error(request, 'Please select a CSV or Excel file to upload.')
         return redirect('branch_packaging', branch_id=branch_id)
     try:
-        products = _parse_products_file(uploaded_file)
+        job, _ = start_import(ImportJob.KindType.PACKAGING_PRODUCTS, uploaded_file, request.user, branch)
     except ValueError as e:
         messages.error(request, str(e))
         return redirect('branch_packaging', branch_id=branch_id)
-    except Exception as e:
-        messages.error(request, f'Error reading file: {e}')
-        return redirect('branch_packaging', branch_id=branch_id)
-
-    if not products:
-        messages.warning(request, 'No valid products found in the file. Ensure a "Product" column exists.')
-        return redirect('branch_packaging', branch_id=branch_id)
-
-    # Store products in session for the define-rules form
-    draft_key = f'branch_packaging_draft_{branch_id}'
-    request.session[draft_key] = products
-    request.session.modified = True
-
-    messages.success(request, f'Found {len(products)} products. Define packaging rules below (select packaging items per product).')
+    request.session[f'branch_packaging_import_{branch_id}'] = job.id
     return redirect('branch_packaging', branch_id=branch_id)
 
 
@@ -4295,6 +4025,18 @@ def branch_add_packaging_item(request, branch_id):
     return redirect('branch_packaging', branch_id=branch_id)
 
 
+def _branch_packaging_item_ids(branch_id):
+    """Items that can be used as packaging at a branch: those delivered to it (shown on /branches/)."""
+    return set(
+        RequestItem.objects.filter(
+            request__branch_id=branch_id,
+            request__status__in=['Delivered', 'Completed'],
+            qty_fulfilled__gt=0,
+            item__is_active=True,
+        ).values_list('item_id', flat=True).distinct()
+    )
+
+
 @login_required
 def branch_save_packaging_rules(request, branch_id):
     """
@@ -4302,8 +4044,10 @@ def branch_save_packaging_rules(request, branch_id):
     Maps products to warehouse inventory items (e.g., Mini Kucu Bucket = 1 Burger Box).
     Procurement managers and branch users can configure.
     """
+    import re
     from django.http import HttpResponseForbidden
     from .context_processors import get_branch_user_info
+    from .packaging import save_rule_matrix
 
     if request.method != 'POST':
         return redirect('branch_packaging', branch_id=branch_id)
@@ -4320,70 +4064,139 @@ def branch_save_packaging_rules(request, branch_id):
         if is_branch_user and (not user_branch_ids or branch.id not in user_branch_ids):
             return HttpResponseForbidden('You do not have access to this branch.')
 
-    draft_key = f'branch_packaging_draft_{branch_id}'
-    draft_products = request.session.get(draft_key)
+    draft = _session_packaging_draft(request, branch_id)
+    draft_products = draft.products if draft else None
     if not draft_products:
         messages.error(request, 'Session expired. Please upload your file again.')
         return redirect('branch_packaging', branch_id=branch_id)
 
     # Same as branch_packaging: only items delivered to this branch (shown on /branches/)
-    branch_item_ids = list(
-        RequestItem.objects.filter(
-            request__branch_id=branch.id,
-            request__status__in=['Delivered', 'Completed'],
-            qty_fulfilled__gt=0
-        ).values_list('item_id', flat=True).distinct()
-    )
-    warehouse_items = list(Item.objects.filter(id__in=branch_item_ids, is_active=True).order_by('name')) if branch_item_ids else []
-    all_items = {item.name.strip().lower(): item for item in Item.objects.filter(is_active=True)}
-    created_count = 0
-    updated_count = 0
-
-    for i, p in enumerate(draft_products):
-        product_name = p['product_name']
-        item = all_items.get(product_name.lower())
-        rule, created_flag = BranchPackagingRule.objects.update_or_create(
-            branch=branch,
-            product_name=product_name,
-            defaults={'item': item},
-        )
-        if created_flag:
-            created_count += 1
-        else:
-            updated_count += 1
+    allowed_item_ids = _branch_packaging_item_ids(branch.id)
 
-        # Clear existing rule items and rebuild from form
-        rule.rule_items.all().delete()
-        
-        # Save rules mapping to warehouse inventory items
-        for wh_item in warehouse_items:
-            use_key = f'item_use_{i}_{wh_item.id}'
-            qty_key = f'item_qty_{i}_{wh_item.id}'
-            if request.POST.get(use_key):
-                try:
-                    qty = Decimal(str(request.POST.get(qty_key, 1) or 1))
-                except (ValueError, TypeError):
-                    qty = Decimal('1')
-                if qty <= 0:
-                    qty = Decimal('1')
-                BranchPackagingRuleItem.objects.create(
-                    rule=rule,
-                    inventory_item=wh_item,
-                    quantity_per_unit=qty,
-                )
+    # One pass over the submitted keys: item_use_{product index}_{item id} / item_qty_{...}
+    matrix = {product['product_name']: {} for product in draft_products}
+    for key in request.POST:
+        match = re.fullmatch(r'item_use_(\d+)_(\d+)', key)
+        if not match:
+            continue
+        index, item_id = int(match.group(1)), int(match.group(2))
+        if index >= len(draft_products) or item_id not in allowed_item_ids:
+            continue
+        try:
+            qty = Decimal(str(request.POST.get(f'item_qty_{index}_{item_id}', 1) or 1))
+        except (ValueError, TypeError, ArithmeticError):
+            qty = Decimal('1')
+        if qty <= 0:
+            qty = Decimal('1')
+        matrix[draft_products[index]['product_name']][item_id] = qty.quantize(Decimal('0.01'))
 
-    # Clear draft from session
-    if draft_key in request.session:
-        del request.session[draft_key]
-        request.session.modified = True
+    counts = save_rule_matrix(branch, matrix)
 
-    messages.success(request, f'Packaging rules saved: {created_count} new, {updated_count} updated.')
+    # Draft is done: drop it and its id in the session
+    draft.delete()
+    del request.session[f'branch_packaging_draft_{branch_id}']
+
+    messages.success(request, f'Packaging rules saved: {counts["rules_created"]} new, {counts["rules_updated"] + counts["rules_unchanged"]} updated.')
     return redirect('branch_packaging', branch_id=branch_id)
 
 
+@login_required
+def branch_bulk_save_packaging_rules(request, branch_id):
+    """
+    Save a branch's packaging rule matrix in one request (procurement managers and branch users).
+    JSON body: {"rules": [{"product_name": str, "items": [{"item_id": int, "qty": number}]}]}.
+    Each listed product's rule is made to match exactly; products not listed are left alone.
+    Only the differences from the stored rules are written.
+    """
+    from .context_processors import get_branch_user_info
+    from .packaging import parse_rule_matrix, save_rule_matrix
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+
+    user_profile = getattr(request.user, 'profile', None)
+    user_role = user_profile.role.name if user_profile and user_profile.role else None
+    is_procurement = user_role and 'Procurement' in user_role
+
+    branch = Branch.objects.filter(id=branch_id, is_active=True).first()
+    if branch is None:
+        return JsonResponse({'success': False, 'error': 'Branch not found'}, status=404)
+
+    if not is_procurement:
+        is_branch_user, user_branch_ids = get_branch_user_info(request.user)
+        if is_branch_user and (not user_branch_ids or branch.id not in user_branch_ids):
+            return JsonResponse({'success': False, 'error': 'You do not have access to this branch.'}, status=403)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+
+    try:
+        matrix = parse_rule_matrix(data.get('rules') if isinstance(data, dict) else None, _branch_packaging_item_ids(branch.id))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    if not matrix:
+        return JsonResponse({'success': False, 'error': 'No rules to save'}, status=400)
+
+    return JsonResponse({'success': True, **save_rule_matrix(branch, matrix)})
+
+
+@login_required
+def branch_inventory_as_of(request, branch_id):
+    """
+    Branch inventory balances at the end of a past day (procurement managers and branch users).
+    GET ?date=YYYY-MM-DD. Answered from the nearest nightly snapshot plus the movements since.
+    """
+    from datetime import datetime, timedelta
+    from django.utils import timezone
+    from .branch_ledger import balances_as_of, history_starts_at
+    from .context_processors import get_branch_user_info
+    from .rollups import local_midnight
+
+    user_profile = getattr(request.user, 'profile', None)
+    user_role = user_profile.role.name if user_profile and user_profile.role else None
+    is_procurement = user_role and 'Procurement' in user_role
+
+    branch = Branch.objects.filter(id=branch_id).first()
+    if branch is None:
+        return JsonResponse({'success': False, 'error': 'Branch not found'}, status=404)
+
+    if not is_procurement:
+        is_branch_user, user_branch_ids = get_branch_user_info(request.user)
+        if not is_branch_user or branch.id not in (user_branch_ids or []):
+            return JsonResponse({'success': False, 'error': 'You do not have access to this branch.'}, status=403)
+
+    try:
+        day = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'date must be YYYY-MM-DD'}, status=400)
+
+    balances = balances_as_of(branch.id, local_midnight(day + timedelta(days=1)))
+    if balances is None:
+        starts_at = history_starts_at()
+        since = f' before {timezone.localdate(starts_at).isoformat()}' if starts_at else ' yet'
+        return JsonResponse({'success': False, 'error': f'No branch inventory history{since}'}, status=400)
+    items = Item.objects.in_bulk({item_id for item_id, _ in balances})
+    variations = ItemVariation.objects.in_bulk({variation_id for _, variation_id in balances if variation_id})
+    rows = [
+        {
+            'item_id': item_id,
+            'item_code': items[item_id].item_code if item_id in items else None,
+            'item_name': items[item_id].name if item_id in items else None,
+            'variation_id': variation_id,
+            'variation_name': variations[variation_id].variation_name if variation_id in variations else None,
+            'quantity': str(qty),
+        }
+        for (item_id, variation_id), qty in balances.items()
+    ]
+    rows.sort(key=lambda row: (row['item_code'] or '', row['variation_name'] or ''))
+    return JsonResponse({'success': True, 'branch_id': branch.id, 'date': day.isoformat(), 'items': rows})
+
+
 @login_required
 def branch_cancel_packaging_draft(request, branch_id):
-    """Cancel the define-rules step and clear draft from session. Procurement managers and branch users can access."""
+    """Cancel the define-rules step and delete its draft. Procurement managers and branch users can access."""
     from django.http import HttpResponseForbidden
     from .context_processors import get_branch_user_info
 
@@ -4402,10 +4215,10 @@ def branch_cancel_packaging_draft(request, branch_id):
         if is_branch_user and (not user_branch_ids or branch.id not in user_branch_ids):
             return HttpResponseForbidden('You do not have access to this branch.')
     
-    draft_key = f'branch_packaging_draft_{branch_id}'
-    if draft_key in request.session:
-        del request.session[draft_key]
-        request.session.modified = True
+    draft = _session_packaging_draft(request, branch_id)
+    if draft:
+        draft.delete()
+        del request.session[f'branch_packaging_draft_{branch_id}']
     messages.info(request, 'Draft cancelled. Upload a new file to define rules.')
     return redirect('branch_packaging', branch_id=branch_id)
 
@@ -4413,15 +4226,14 @@ def branch_cancel_packaging_draft(request, branch_id):
 @login_required
 def branch_process_packaging_csv(request, branch_id):
     """
-    Process CSV with Product + Quantity, match to packaging rules, and deduct from this branch's
-    available items (items delivered to the branch, shown on /branches/). Does NOT touch warehouse.
-    Branch managers only, for their own branch.
+    Queue a CSV with Product + Quantity to be matched to packaging rules and deducted from this
+    branch's available items (items delivered to the branch, shown on /branches/) by the
+    process_import_jobs worker. Does NOT touch warehouse. Uploading a file that was already
+    processed for this branch does nothing. Branch managers only, for their own branch.
     """
-    from django.http import HttpResponseForbidden
-    from django.db import transaction
-    from django.utils import timezone
     from .context_processors import get_branch_user_info
-    from .models import ItemConsumptionDaily
+    from .imports import start_import
+    from .models import ImportJob
 
     if request.method != 'POST':
         return redirect('branches')
@@ -4439,103 +4251,14 @@ def branch_process_packaging_csv(request, branch_id):
         return redirect('branches')
 
     try:
-        products_data = _parse_products_file(uploaded_file)
-    except Exception as e:
-        messages.error(request, f'Error reading file: {e}')
-        return redirect('branches')
-
-    if not products_data:
-        messages.warning(request, 'No valid products found in the file.')
-        return redirect('branches')
-
-    # Build deduction plan: which items and how much to deduct at this branch
-    deduction_plan = {}
-    unmatched_products = []
-
-    for product_data in products_data:
-        product_name = product_data.get('product_name', '').strip()
-        try:
-            product_qty = Decimal(str(product_data.get('qty', 0) or 0))
-        except Exception:
-            product_qty = Decimal('0')
-        if product_qty <= 0:
-            continue
-
-        rule = BranchPackagingRule.objects.filter(
-            branch=branch,
-            product_name__iexact=product_name
-        ).prefetch_related('rule_items__inventory_item').first()
-
-        if not rule or not rule.rule_items.exists():
-            unmatched_products.append(product_name)
-            continue
-
-        for rule_item in rule.rule_items.all():
-            if not rule_item.inventory_item:
-                continue
-            item = rule_item.inventory_item
-            qty_needed = product_qty * rule_item.quantity_per_unit
-            if item.id not in deduction_plan:
-                deduction_plan[item.id] = {'item': item, 'total_qty': Decimal('0')}
-            deduction_plan[item.id]['total_qty'] += qty_needed
-
-    if unmatched_products:
-        messages.warning(request, f'No packaging rules found for: {", ".join(unmatched_products[:5])}{"..." if len(unmatched_products) > 5 else ""}. Configure rules for these products first.')
-
-    if not deduction_plan:
-        messages.warning(request, 'No packaging items to deduct from the uploaded file.')
+        job, created = start_import(ImportJob.KindType.SALES_DEDUCTION, uploaded_file, request.user, branch)
+    except ValueError as e:
+        messages.error(request, str(e))
         return redirect('branches')
-
-    # Current quantity at branch from branches_inventory (source of truth for Branches page)
-    branch_inv_by_item = {
-        r['item_id']: r['quantity']
-        for r in BranchInventory.objects.filter(branch=branch).values('item_id').annotate(quantity=Sum('quantity'))
-    }
-
-    insufficient = []
-    for item_id, plan in deduction_plan.items():
-        item = plan['item']
-        qty_needed = plan['total_qty']
-        available = branch_inv_by_item.get(item_id) or Decimal('0')
-        if available < qty_needed:
-            insufficient.append(f'{item.name} (need {qty_needed}, available at branch {available})')
-
-    if insufficient:
-        messages.error(request, f'Insufficient quantity at your branch: {"; ".join(insufficient[:3])}{"..." if len(insufficient) > 3 else ""}')
+    if not created:
+        messages.info(request, f'This sales file was already uploaded for {branch.name} (import #{job.id}); nothing was deducted again.')
         return redirect('branches')
 
-    today = timezone.now().date()
-    source = ItemConsumptionDaily.SourceType.PACKAGING_CSV
-
-    try:
-        with transaction.atomic():
-            for item_id, plan in deduction_plan.items():
-                item = plan['item']
-                qty_to_deduct = plan['total_qty']
-                rec, created = ItemConsumptionDaily.objects.get_or_create(
-                    date=today,
-                    branch=branch,
-                    item=item,
-                    variation=None,
-                    source=source,
-                    defaults={'qty_consumed': qty_to_deduct}
-                )
-                if not created:
-                    rec.qty_consumed += qty_to_deduct
-                    rec.save(update_fields=['qty_consumed'])
-
-                # Decrement branches_inventory (Branches page source of truth)
-                inv = BranchInventory.objects.filter(
-                    branch=branch, item=item, variation__isnull=True
-                ).first()
-                if inv:
-                    inv.quantity = max(Decimal('0'), inv.quantity - qty_to_deduct)
-                    inv.save(update_fields=['quantity', 'updated_at'])
-
-        messages.success(request, f'Deducted from your branch ({branch.name}): {len(deduction_plan)} item types. Quantities on the Branches page have been updated.')
-        return redirect('branches')
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        messages.error(request, f'Error processing packaging: {str(e)}')
-        return redirect('branches')
\ No newline at end of file
+    request.session['branch_sales_import_job'] = job.id
+    messages.info(request, f'Sales file received for {branch.name}. Quantities will be deducted once it has been processed.')
+    return redirect('branches')